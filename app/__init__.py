@@ -5,6 +5,7 @@ import os
 from flask import Flask
 from .config import Config
 from .models import init_db
+from . import db, ingest, metrics, sql_profiler, request_profiler
 
 
 def create_app():
@@ -24,9 +25,14 @@ def create_app():
         os.makedirs(app.config['UPLOAD_FOLDER'])
         
     init_db()
+    db.init_app(app)
+    ingest.init_app(app)
+    metrics.init_app(app)
+    sql_profiler.init_app(app)
+    request_profiler.init_app(app)
     
     # Register blueprints
-    from .routes import auth_bp, dashboard_bp, hardware_bp, reports_bp, analytics_bp, profile_bp, search_bp, management_bp
+    from .routes import auth_bp, dashboard_bp, hardware_bp, reports_bp, analytics_bp, profile_bp, search_bp, management_bp, events_bp, monitoring_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -36,5 +42,7 @@ def create_app():
     app.register_blueprint(profile_bp)
     app.register_blueprint(search_bp)
     app.register_blueprint(management_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(monitoring_bp)
     
     return app
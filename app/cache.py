@@ -0,0 +1,147 @@
+"""
+Result cache for aggregate queries
+
+Functions decorated with @cached('attendance') keep their results in a small
+LRU map keyed by function and arguments. An entry is served until its TTL runs
+out or until the generation of its tag moves on: bump('attendance') is called
+whenever attendance is written or deleted, which makes every cached aggregate
+over it stale at once. Cached values are shared between callers and must not
+be modified.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from .config import Config
+
+
+class ResultCache:
+    """Thread-safe LRU map of (function, args) -> result with TTL and per-tag generations"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries if max_entries is not None else Config.CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTL_S
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, generation, value)
+        self._generations = {}
+        # Striped locks so concurrent misses on one key compute it only once
+        self._compute_locks = [threading.Lock() for _ in range(32)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def compute_lock(self, key):
+        return self._compute_locks[hash(key) % len(self._compute_locks)]
+
+    def generation(self, tag):
+        with self._lock:
+            return self._generations.get(tag, 0)
+
+    def bump(self, tag):
+        """Make every entry under tag stale"""
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.invalidations += 1
+
+    def get(self, key, tag):
+        """(True, value) for a live entry, else (False, None); counted as a hit or miss"""
+        with self._lock:
+            hit, value = self._lookup(key, tag)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return hit, value
+
+    def peek(self, key, tag):
+        """Like get, without touching the counters"""
+        with self._lock:
+            return self._lookup(key, tag)
+
+    def _lookup(self, key, tag):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, generation, value = entry
+        if expires_at > time.monotonic() and generation == self._generations.get(tag, 0):
+            self._entries.move_to_end(key)
+            return True, value
+        del self._entries[key]
+        return False, None
+
+    def put(self, key, generation, value, ttl=None):
+        """Store a value computed while tag was at `generation`"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'generations': dict(self._generations),
+                'keys': [key[0] for key in self._entries],
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide result cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def bump(tag):
+    """Invalidate every cached result that depends on tag"""
+    get_cache().bump(tag)
+
+
+def cached(tag, ttl=None):
+    """Cache a function's result per arguments until tag is bumped or ttl expires"""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Config.CACHE_ENABLED:
+                return func(*args, **kwargs)
+            cache = get_cache()
+            key = (name, args, tuple(sorted(kwargs.items())))
+            hit, value = cache.get(key, tag)
+            if hit:
+                return value
+            with cache.compute_lock(key):
+                # Whoever held the lock may have just filled the entry
+                hit, value = cache.peek(key, tag)
+                if hit:
+                    return value
+                # Read the generation first: a write landing mid-computation leaves
+                # the entry already stale instead of caching a pre-write result
+                generation = cache.generation(tag)
+                value = func(*args, **kwargs)
+                cache.put(key, generation, value, ttl)
+                return value
+        return wrapper
+    return decorator
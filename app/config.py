@@ -2,11 +2,111 @@
 Configuration settings for the application
 """
 import os
+import threading
+import time
+from .events import publish
+
+# Device ID assumed for firmware that does not identify itself
+DEFAULT_DEVICE = 'default'
 
 class Config:
     """Application configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'thiagarajar_polytechnic_secret_key_2024')
     DATABASE = os.environ.get('DATABASE', 'attendance.db')
+    # SQLite connection pool and per-connection tuning
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_CACHE_SIZE = int(os.environ.get('DB_CACHE_SIZE', -16000))  # negative = KiB
+    DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+    # Write-behind attendance ingestion (group commit from a single writer thread)
+    INGEST_WRITE_BEHIND = os.environ.get('INGEST_WRITE_BEHIND', 'true').lower() == 'true'
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 100))
+    INGEST_MAX_LATENCY_MS = int(os.environ.get('INGEST_MAX_LATENCY_MS', 200))
+    INGEST_MAX_RETRIES = int(os.environ.get('INGEST_MAX_RETRIES', 5))
+    INGEST_FLUSH_ON_READ = os.environ.get('INGEST_FLUSH_ON_READ', 'true').lower() == 'true'
+    # Rows that still fail after the retries are appended here and written on the writer's next start
+    INGEST_SPILL_FILE = os.environ.get('INGEST_SPILL_FILE', DATABASE + '-spill.csv')
+    # Wake-on-LAN dispatcher
+    WOL_BROADCAST_IP = os.environ.get('WOL_BROADCAST_IP', '255.255.255.255')
+    WOL_PORT = int(os.environ.get('WOL_PORT', 9))
+    WOL_BURST = int(os.environ.get('WOL_BURST', 3))  # packets per wake request
+    WOL_BURST_INTERVAL_MS = int(os.environ.get('WOL_BURST_INTERVAL_MS', 100))
+    WOL_RETRIES = int(os.environ.get('WOL_RETRIES', 2))  # retries after the first attempt
+    # Bulk wake pacing - keeps the switch and the lab breaker happy
+    WOL_BULK_PPS = float(os.environ.get('WOL_BULK_PPS', 50))
+    WOL_BULK_WAVE_SIZE = int(os.environ.get('WOL_BULK_WAVE_SIZE', 10))
+    WOL_BULK_WAVE_PAUSE_S = float(os.environ.get('WOL_BULK_WAVE_PAUSE_S', 5))
+    # LAN scan used to discover MAC addresses (CIDR defaults to this host's /24)
+    NETWORK_SCAN_CIDR = os.environ.get('NETWORK_SCAN_CIDR')
+    NETWORK_SCAN_CONCURRENCY = int(os.environ.get('NETWORK_SCAN_CONCURRENCY', 64))
+    NETWORK_SCAN_TIMEOUT_S = float(os.environ.get('NETWORK_SCAN_TIMEOUT_S', 1))
+    # Longest a /get_mode long-poll may be held open
+    MODE_LONGPOLL_MAX_S = float(os.environ.get('MODE_LONGPOLL_MAX_S', 30))
+    
+    # finger_id -> user cache for /verify; changes made by other processes are
+    # picked up within USER_CACHE_CHECK_S seconds
+    USER_CACHE = os.environ.get('USER_CACHE', 'True').lower() == 'true'
+    USER_CACHE_CHECK_S = float(os.environ.get('USER_CACHE_CHECK_S', 1))
+    
+    # Where scanner mode/enrollment state lives: 'memory' (single worker) or
+    # 'sqlite' (shared by every worker process through the database)
+    HARDWARE_STATE_BACKEND = os.environ.get('HARDWARE_STATE_BACKEND', 'memory')
+    # How often a device's last-seen time is written to the state store
+    DEVICE_SEEN_INTERVAL_S = float(os.environ.get('DEVICE_SEEN_INTERVAL_S', 30))
+    
+    # Server-sent events: per-client queue bound (slower clients are dropped),
+    # replay history for reconnects, open stream limit and keep-alive interval
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+    EVENTS_HISTORY = int(os.environ.get('EVENTS_HISTORY', 200))
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 200))
+    EVENTS_HEARTBEAT_S = float(os.environ.get('EVENTS_HEARTBEAT_S', 15))
+    
+    # Aggregate result cache: entries expire after CACHE_TTL_S and are dropped
+    # as soon as this process writes or deletes attendance; other workers'
+    # writes show up once the TTL runs out
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'True').lower() == 'true'
+    CACHE_TTL_S = float(os.environ.get('CACHE_TTL_S', 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))
+    
+    # Streaming exports fetch this many rows per round trip to SQLite
+    EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 1000))
+    # XLSX exports are assembled in memory up to this size, then on disk
+    EXPORT_SPOOL_MAX_MB = float(os.environ.get('EXPORT_SPOOL_MAX_MB', 16))
+    
+    # Attendance search: largest page, and how many matches are counted exactly
+    # before the total becomes an estimate (?count=exact always counts them all)
+    SEARCH_MAX_PER_PAGE = int(os.environ.get('SEARCH_MAX_PER_PAGE', 100))
+    SEARCH_COUNT_CAP = int(os.environ.get('SEARCH_COUNT_CAP', 1000))
+    # Match names and register numbers through the users_fts trigram index
+    # when the database has one; false forces the LIKE fallback
+    SEARCH_FULLTEXT = os.environ.get('SEARCH_FULLTEXT', 'True').lower() == 'true'
+    # Rows per page of the attendance report
+    REPORT_PAGE_SIZE = int(os.environ.get('REPORT_PAGE_SIZE', 50))
+    
+    # Request metrics served at /metrics: latency percentiles cover the last
+    # METRICS_RECENT_S seconds, up to METRICS_RECENT_SAMPLES requests per route.
+    # A scraper can send METRICS_TOKEN as a bearer token instead of logging in.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_RECENT_S = float(os.environ.get('METRICS_RECENT_S', 300))
+    METRICS_RECENT_SAMPLES = int(os.environ.get('METRICS_RECENT_SAMPLES', 2048))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Per-request SQL profiler (opt-in): summary headers on every response, a
+    # log line for statement shapes run SQL_PROFILER_REPEAT or more times in one
+    # request, and the query plan of statements slower than SQL_SLOW_MS
+    SQL_PROFILER = os.environ.get('SQL_PROFILER', 'False').lower() == 'true'
+    SQL_PROFILER_REPEAT = int(os.environ.get('SQL_PROFILER_REPEAT', 5))
+    SQL_SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 100))
+    # On-demand request profiler: admins add ?_profile=1 (or X-Profile: 1) to
+    # any route; PROFILER_SAMPLE_RATE also profiles that share of all requests.
+    # Only the newest PROFILE_MAX_COUNT profiles within PROFILE_MAX_MB are kept.
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'True').lower() == 'true'
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 2))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.getcwd(), 'profiles'))
+    PROFILE_MAX_COUNT = int(os.environ.get('PROFILE_MAX_COUNT', 50))
+    PROFILE_MAX_MB = float(os.environ.get('PROFILE_MAX_MB', 20))
     DEBUG = os.environ.get('DEBUG', True)
     HOST = '0.0.0.0'
     # Use absolute path for upload folder to avoid confusion
@@ -17,23 +117,109 @@ class Config:
 
 # Global hardware state (shared across requests)
 class HardwareState:
-    """Manages hardware mode and enrollment status"""
-    mode = {"action": "attendance", "id": None}
-    enrollment = {"status": "idle", "finger_id": None, "message": ""}
+    """Scanner mode and enrollment status, kept per device in the configured state store"""
+    _store = None
+    _store_lock = threading.Lock()
+    # Last time each device's contact was written to the store by this process
+    _touched = {}
+    
+    @classmethod
+    def store(cls):
+        """The state store selected by HARDWARE_STATE_BACKEND, created on first use"""
+        with cls._store_lock:
+            if cls._store is None:
+                from .device_state import create_store
+                cls._store = create_store(Config.HARDWARE_STATE_BACKEND)
+            return cls._store
+    
+    @classmethod
+    def get(cls, device_id=DEFAULT_DEVICE):
+        """Full DeviceState for a device"""
+        return cls.store().get(device_id)
+    
+    @classmethod
+    def devices(cls):
+        """Every device that has reported in or been given a mode"""
+        return cls.store().devices()
     
     @classmethod
-    def set_enroll_mode(cls, finger_id):
-        """Set to enrollment mode"""
-        cls.mode = {"action": "enroll", "id": finger_id}
-        cls.enrollment = {"status": "pending", "finger_id": finger_id, "message": "Waiting for ESP32..."}
+    def get_mode(cls, device_id=DEFAULT_DEVICE):
+        """Current (mode, mode_version) pair"""
+        state = cls.get(device_id)
+        return state.mode, state.mode_version
     
     @classmethod
-    def set_attendance_mode(cls):
-        """Reset to attendance mode"""
-        cls.mode = {"action": "attendance", "id": None}
-        cls.enrollment = {"status": "idle", "finger_id": None, "message": ""}
+    def get_enrollment(cls, device_id=DEFAULT_DEVICE):
+        return cls.get(device_id).enrollment
     
     @classmethod
-    def update_enrollment(cls, status, finger_id, message):
-        """Update enrollment status"""
-        cls.enrollment = {"status": status, "finger_id": finger_id, "message": message}
+    def wait_for_mode_change(cls, version, timeout, device_id=DEFAULT_DEVICE):
+        """Block until the mode version differs from `version` or timeout expires; returns (mode, version)"""
+        state = cls.store().wait_for_mode_change(device_id, version, timeout)
+        return state.mode, state.mode_version
+    
+    @classmethod
+    def touch(cls, device_id):
+        """Note that a device called in (written at most once per DEVICE_SEEN_INTERVAL_S)"""
+        now = time.monotonic()
+        if now - cls._touched.get(device_id, float('-inf')) >= Config.DEVICE_SEEN_INTERVAL_S:
+            cls._touched[device_id] = now
+            cls.store().touch(device_id)
+    
+    @classmethod
+    def _update(cls, device_id, change):
+        """
+        Apply change(state) -> (mode, enrollment) or None with compare-and-set,
+        re-reading and retrying if another writer got in first. Returns the new
+        state, or None if change() declined.
+        """
+        from .device_state import StaleStateError
+        store = cls.store()
+        while True:
+            state = store.get(device_id)
+            update = change(state)
+            if update is None:
+                return None
+            try:
+                state = store.compare_and_set(device_id, state.version, *update)
+            except StaleStateError:
+                continue
+            publish("enrollment", dict(state.enrollment, device_id=device_id))
+            return state
+    
+    @classmethod
+    def set_enroll_mode(cls, finger_id, device_id=DEFAULT_DEVICE):
+        """Set to enrollment mode; raises DeviceBusyError if the device is already enrolling"""
+        def change(state):
+            if state.mode["action"] == "enroll":
+                raise DeviceBusyError(device_id, state.mode["id"])
+            return ({"action": "enroll", "id": finger_id},
+                    {"status": "pending", "finger_id": finger_id, "message": "Waiting for ESP32..."})
+        return cls._update(device_id, change)
+    
+    @classmethod
+    def set_attendance_mode(cls, device_id=DEFAULT_DEVICE, finger_id=None):
+        """Reset to attendance mode (only if still enrolling `finger_id`, when given)"""
+        def change(state):
+            if finger_id is not None and state.mode["id"] != finger_id:
+                return None
+            return {"action": "attendance", "id": None}, {"status": "idle", "finger_id": None, "message": ""}
+        return cls._update(device_id, change)
+    
+    @classmethod
+    def update_enrollment(cls, status, finger_id, message, device_id=DEFAULT_DEVICE):
+        """Record enrollment progress reported by a device - ignored unless it is enrolling that finger"""
+        def change(state):
+            if state.mode != {"action": "enroll", "id": finger_id}:
+                return None
+            return state.mode, {"status": status, "finger_id": finger_id, "message": message}
+        return cls._update(device_id, change)
+
+
+class DeviceBusyError(Exception):
+    """Raised when enrollment is requested on a device that is already enrolling"""
+    
+    def __init__(self, device_id, finger_id):
+        super().__init__(f"Scanner '{device_id}' is already enrolling finger ID {finger_id}")
+        self.device_id = device_id
+        self.finger_id = finger_id
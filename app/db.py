@@ -0,0 +1,260 @@
+"""
+SQLite connection management - pooled, tuned connections shared per request/thread
+"""
+import sqlite3
+import threading
+import time
+from flask import g, has_app_context
+from .config import Config
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that adds its statements and the time spent running them to its
+    connection's totals, and to the connection's SQL profile when one is attached
+    """
+
+    def _note(self, started, sql=None, parameters=None):
+        """Count the time since `started`; `sql` marks the start of a new statement"""
+        seconds = time.perf_counter() - started
+        conn = self.connection
+        conn.query_seconds += seconds
+        if sql is not None:
+            conn.queries += 1
+        if conn.profile is not None:
+            if sql is not None:
+                self._run = conn.profile.statement(sql, parameters)
+            run = getattr(self, '_run', None)
+            if run is not None:
+                run[2] += seconds
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._note(started, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._note(started, sql)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._note(started, sql_script)
+
+    # execute() steps to the first row; the rest of a result set is read here
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._note(started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._note(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._note(started)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.holds = 0
+        self.request_bound = False
+        # Statements run and seconds spent in them since the connection was checked out
+        self.queries = 0
+        self.query_seconds = 0.0
+        # sql_profiler.RequestProfile of the request using the connection, if profiling
+        self.profile = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts run on a C-level cursor; route them through TimedCursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        """Release one hold; the last hold outside a request returns the connection to the pool"""
+        if self.pool is None:
+            super().close()
+        elif not self.request_bound:
+            self.holds -= 1
+            if self.holds <= 0:
+                _local.conn = None
+                self.pool.release(self)
+
+    def discard(self):
+        """Really close the underlying SQLite handle"""
+        super().close()
+
+
+def connect(database=None):
+    """Open a new tuned connection (not pooled - close() really closes it)"""
+    conn = sqlite3.connect(database or Config.DATABASE,
+                           timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False,
+                           cached_statements=Config.DB_STATEMENT_CACHE,
+                           factory=PooledConnection)
+    conn.row_factory = sqlite3.Row
+    # Pragmas are per connection, so they are applied once here rather than per query
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {int(Config.DB_BUSY_TIMEOUT_MS)}')
+    conn.execute(f'PRAGMA mmap_size = {int(Config.DB_MMAP_SIZE)}')
+    conn.execute(f'PRAGMA cache_size = {int(Config.DB_CACHE_SIZE)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of tuned connections to a single database file"""
+
+    def __init__(self, database, size, timeout):
+        self.database = database
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        """Check out a connection, waiting up to `timeout` seconds for a free slot"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError('database connection pool exhausted')
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            try:
+                conn = connect(self.database)
+            except Exception:
+                self._slots.release()
+                raise
+            conn.pool = self
+        conn.holds = 0
+        conn.request_bound = False
+        conn.queries = 0
+        conn.query_seconds = 0.0
+        conn.profile = None
+        return conn
+
+    def release(self, conn):
+        """Return a connection, rolling back anything its last user left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reusable = True
+        except sqlite3.Error:
+            reusable = False
+        with self._lock:
+            if reusable and not self._closed:
+                self._idle.append(conn)
+            else:
+                conn.discard()
+        self._slots.release()
+
+    def close(self):
+        """Close all idle connections; checked-out ones are closed when released"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    """Get the pool for the configured database, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.database != Config.DATABASE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(Config.DATABASE, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+        return _pool
+
+
+def close_pool():
+    """Close the pool (used on shutdown and by scripts that switch databases)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_db_connection():
+    """
+    Get a database connection with row factory.
+    Inside a Flask app context every call shares one pooled connection that is
+    released when the context tears down; elsewhere the connection is shared per
+    thread and released when every caller has closed it.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = get_pool().acquire()
+            conn.request_bound = True
+            g._db_conn = conn
+        conn.profile = g.get('_sql_profile')
+        return conn
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = get_pool().acquire()
+        _local.conn = conn
+    conn.holds += 1
+    return conn
+
+
+def iter_rows(cursor, chunk_size=None):
+    """Yield a cursor's rows, fetched Config.EXPORT_CHUNK_ROWS at a time"""
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_ROWS
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def release_request_connection(exception=None):
+    """Teardown handler - return the request's connection to the pool"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.request_bound = False
+        conn.profile = None
+        conn.pool.release(conn)
+
+
+def init_app(app):
+    """Register the connection teardown with the Flask app"""
+    app.teardown_appcontext(release_request_connection)
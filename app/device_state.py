@@ -0,0 +1,219 @@
+"""
+Per-device scanner state - operating mode and enrollment progress keyed by device ID
+
+MemoryStateStore keeps the state in this process, which is enough for a single
+worker. SQLiteStateStore keeps it in the attendance database so every worker
+process sees the same mode. Both update through compare-and-set on a
+per-device version, so two writers can never silently overwrite each other.
+
+Long-polls wait on a condition. compare_and_set wakes it directly; with the
+SQLite store, one watcher thread per process also wakes it when another
+worker changes a mode.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from flask import has_app_context
+from .db import connect, get_db_connection, release_request_connection
+
+IDLE_MODE = {"action": "attendance", "id": None}
+IDLE_ENROLLMENT = {"status": "idle", "finger_id": None, "message": ""}
+
+# version changes on every update; mode_version only when the mode itself changes
+DeviceState = namedtuple('DeviceState', 'device_id mode enrollment version mode_version last_seen')
+
+
+class StaleStateError(Exception):
+    """A compare-and-set lost to a concurrent update"""
+
+
+def _initial(device_id):
+    return DeviceState(device_id, dict(IDLE_MODE), dict(IDLE_ENROLLMENT), 0, 0, None)
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class MemoryStateStore:
+    """State held in this process (single worker deployments)"""
+
+    def __init__(self):
+        # Restarting loses the state, so tags from before a restart must not match
+        self.instance_id = uuid.uuid4().hex[:8]
+        self._states = {}
+        self._changed = threading.Condition()
+
+    def get(self, device_id):
+        with self._changed:
+            return self._states.get(device_id) or _initial(device_id)
+
+    def devices(self):
+        with self._changed:
+            return sorted(self._states.values(), key=lambda s: s.device_id)
+
+    def compare_and_set(self, device_id, version, mode, enrollment):
+        """Store mode/enrollment if the device is still at `version`; returns the new state"""
+        with self._changed:
+            current = self._states.get(device_id) or _initial(device_id)
+            if current.version != version:
+                raise StaleStateError(device_id)
+            mode_version = current.mode_version + (mode != current.mode)
+            state = current._replace(mode=mode, enrollment=enrollment, version=version + 1,
+                                     mode_version=mode_version)
+            self._states[device_id] = state
+            self._changed.notify_all()
+            return state
+
+    def touch(self, device_id):
+        """Record that the device has just been in contact"""
+        with self._changed:
+            current = self._states.get(device_id) or _initial(device_id)
+            self._states[device_id] = current._replace(last_seen=_now())
+
+    def wait_for_mode_change(self, device_id, mode_version, timeout):
+        """Block until the device's mode_version differs or timeout expires; returns the state"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.get(device_id).mode_version != mode_version, timeout)
+            return self.get(device_id)
+
+
+class SQLiteStateStore:
+    """State kept in the device_state table, shared by every worker process"""
+
+    # Versions survive restarts in the database, so a fixed id keeps device ETags valid
+    instance_id = 'db'
+
+    def __init__(self, poll_interval=0.25):
+        self.poll_interval = poll_interval
+        self._changed = threading.Condition()
+        # Bumped on every mode change seen by this process; waiters compare it to what they read
+        self._generation = 0
+        self._waiters = 0
+        self._watcher = None
+
+    def _run(self, func):
+        """Run func(conn) on the caller's connection (the request's, inside a request)"""
+        conn = get_db_connection()
+        try:
+            return func(conn)
+        finally:
+            conn.close()
+
+    def _notify(self):
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+
+    @staticmethod
+    def _row_to_state(row):
+        return DeviceState(row['device_id'], json.loads(row['mode']), json.loads(row['enrollment']),
+                           row['version'], row['mode_version'], row['last_seen'])
+
+    def get(self, device_id):
+        row = self._run(lambda conn: conn.execute(
+            'SELECT * FROM device_state WHERE device_id = ?', (device_id,)).fetchone())
+        return self._row_to_state(row) if row else _initial(device_id)
+
+    def devices(self):
+        rows = self._run(lambda conn: conn.execute(
+            'SELECT * FROM device_state ORDER BY device_id').fetchall())
+        return [self._row_to_state(row) for row in rows]
+
+    def compare_and_set(self, device_id, version, mode, enrollment):
+        """Store mode/enrollment if the device is still at `version`; returns the new state"""
+        def cas(conn):
+            with conn:
+                if version == 0:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO device_state (device_id, mode, enrollment, version, mode_version)
+                        VALUES (?, ?, ?, 0, 0)
+                    ''', (device_id, json.dumps(IDLE_MODE), json.dumps(IDLE_ENROLLMENT)))
+                cursor = conn.execute('''
+                    UPDATE device_state
+                    SET mode_version = mode_version + (mode != ?), mode = ?, enrollment = ?,
+                        version = version + 1
+                    WHERE device_id = ? AND version = ?
+                ''', (json.dumps(mode), json.dumps(mode), json.dumps(enrollment), device_id, version))
+                if cursor.rowcount != 1:
+                    raise StaleStateError(device_id)
+                return conn.execute('SELECT * FROM device_state WHERE device_id = ?', (device_id,)).fetchone()
+        state = self._row_to_state(self._run(cas))
+        self._notify()
+        return state
+
+    def touch(self, device_id):
+        """Record that the device has just been in contact"""
+        def upsert(conn):
+            with conn:
+                conn.execute('''
+                    INSERT INTO device_state (device_id, mode, enrollment, version, mode_version, last_seen)
+                    VALUES (?, ?, ?, 0, 0, ?)
+                    ON CONFLICT(device_id) DO UPDATE SET last_seen = excluded.last_seen
+                ''', (device_id, json.dumps(IDLE_MODE), json.dumps(IDLE_ENROLLMENT), _now()))
+        self._run(upsert)
+
+    def wait_for_mode_change(self, device_id, mode_version, timeout):
+        """Block until the device's mode_version differs or timeout expires; returns the state"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            self._waiters += 1
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='device-state-watcher', daemon=True)
+                self._watcher.start()
+        try:
+            while True:
+                with self._changed:
+                    generation = self._generation
+                state = self.get(device_id)
+                remaining = deadline - time.monotonic()
+                if state.mode_version != mode_version or remaining <= 0:
+                    return state
+                # A waiting long-poll holds no connection: the request's goes back to the pool
+                if has_app_context():
+                    release_request_connection()
+                with self._changed:
+                    self._changed.wait_for(lambda: self._generation != generation, remaining)
+        finally:
+            with self._changed:
+                self._waiters -= 1
+
+    def _watch(self):
+        """
+        Wake waiters when another worker process changes a mode. One query per
+        poll_interval for the whole process, on its own connection, and only
+        while a long-poll is waiting.
+        """
+        conn = connect()
+        try:
+            # The first reading also wakes waiters, in case a change landed before the watcher started
+            seen = None
+            while True:
+                with self._changed:
+                    if not self._waiters:
+                        self._watcher = None
+                        return
+                total = conn.execute('SELECT COALESCE(SUM(mode_version), 0) FROM device_state').fetchone()[0]
+                if total != seen:
+                    self._notify()
+                seen = total
+                time.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+
+STORES = {
+    'memory': MemoryStateStore,
+    'sqlite': SQLiteStateStore,
+}
+
+
+def create_store(backend):
+    """Instantiate the state store named by HARDWARE_STATE_BACKEND"""
+    try:
+        return STORES[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown hardware state backend '{backend}'; choose from {', '.join(STORES)}")
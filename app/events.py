@@ -0,0 +1,129 @@
+"""
+In-process pub/sub bus behind the /events server-sent event stream
+
+Publishers (enrollment state, the attendance writer, the WOL sender) call
+publish() and never block: every subscriber has a bounded queue, and one that
+falls behind is disconnected instead of slowing everyone else down. Its
+browser reconnects with Last-Event-ID and replays what it missed from a short
+history, or reloads if the gap is too large.
+"""
+import collections
+import threading
+
+# Topics the public home page may subscribe to without logging in
+PUBLIC_TOPICS = {'attendance'}
+TOPICS = {'attendance', 'enrollment', 'wake'}
+
+
+class Subscription:
+    """One client's bounded event queue"""
+
+    def __init__(self, topics, max_queue):
+        self.topics = topics
+        self.max_queue = max_queue
+        self.closed = False
+        # Set when events were lost and the client has to reload its state
+        self.resync = False
+        self._events = collections.deque()
+        self._ready = threading.Condition()
+
+    def offer(self, event):
+        """Queue an event; a full queue closes the subscription and returns False"""
+        with self._ready:
+            if self.closed:
+                return False
+            if len(self._events) >= self.max_queue:
+                self.closed = True
+                self._events.clear()
+                self._ready.notify_all()
+                return False
+            self._events.append(event)
+            self._ready.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Next event, or None on timeout or once the subscription is closed"""
+        with self._ready:
+            self._ready.wait_for(lambda: self._events or self.closed, timeout)
+            if self._events:
+                return self._events.popleft()
+            return None
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class EventBus:
+    """Fan-out of published events to every subscriber of their topic"""
+
+    def __init__(self, max_queue=100, history=200, max_subscribers=200):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._history = collections.deque(maxlen=history)
+        self._last_id = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        """Send data to every subscriber of topic without blocking; returns the event id"""
+        with self._lock:
+            self._last_id += 1
+            event = {'id': self._last_id, 'topic': topic, 'data': data}
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if topic in s.topics]
+        for sub in subscribers:
+            if not sub.offer(event):
+                self.unsubscribe(sub)
+        return event['id']
+
+    def subscribe(self, topics, last_event_id=None):
+        """
+        Register a subscriber, or return None if the subscriber limit is reached.
+        With last_event_id the events it missed are queued first; if they are no
+        longer in the history the subscription is flagged for resync.
+        """
+        sub = Subscription(set(topics), self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None and last_event_id != self._last_id:
+                oldest = self._history[0]['id'] if self._history else self._last_id + 1
+                missed = [e for e in self._history if e['id'] > last_event_id and e['topic'] in sub.topics]
+                # An id ahead of ours comes from before a restart
+                if last_event_id < oldest - 1 or last_event_id > self._last_id or len(missed) > self.max_queue:
+                    sub.resync = True
+                else:
+                    for event in missed:
+                        sub.offer(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+        sub.close()
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    """Process-wide bus, created on first use"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            from .config import Config
+            _bus = EventBus(Config.EVENTS_QUEUE_SIZE, Config.EVENTS_HISTORY, Config.EVENTS_MAX_SUBSCRIBERS)
+        return _bus
+
+
+def publish(topic, data):
+    """Publish on the process-wide bus"""
+    return get_bus().publish(topic, data)
@@ -0,0 +1,49 @@
+"""
+XLSX export engine
+
+Rows go from the cursor straight into an openpyxl write-only workbook, which
+serialises each row as it is appended instead of keeping a cell grid. The
+finished file is assembled in a spooled temporary file: in memory for small
+results, moved to disk once it passes EXPORT_SPOOL_MAX_MB.
+"""
+import tempfile
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from .config import Config
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def write_xlsx(rows, columns, sheet_title):
+    """
+    Write rows (sequences in column order) under a bold header and return the
+    file object, rewound. `columns` is a list of (header, width) pairs; widths,
+    the frozen header row and the autofilter are set once for the sheet rather
+    than per cell.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    for index, (_, width) in enumerate(columns, start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+    sheet.freeze_panes = 'A2'
+
+    bold = Font(bold=True)
+    header = []
+    for title, _ in columns:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = bold
+        header.append(cell)
+    sheet.append(header)
+
+    count = 0
+    for row in rows:
+        sheet.append(tuple(row))
+        count += 1
+    sheet.auto_filter.ref = f'A1:{get_column_letter(len(columns))}{count + 1}'
+
+    output = tempfile.SpooledTemporaryFile(max_size=int(Config.EXPORT_SPOOL_MAX_MB * 1024 * 1024))
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,261 @@
+"""
+Write-behind attendance ingestion
+
+/verify queues scans here and replies straight away; a single writer thread
+drains the queue and inserts each batch with executemany() in one transaction,
+so a burst of scans costs one commit instead of one per row.
+
+Rows that still cannot be inserted after INGEST_MAX_RETRIES are appended to
+INGEST_SPILL_FILE and counted as dropped; the writer inserts them once the
+database takes writes again, or on its next start. The writer flushes on
+exit and on SIGTERM.
+"""
+import atexit
+import csv
+import functools
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from datetime import date
+from .config import Config
+from . import db
+from .events import publish
+from .cache import bump
+
+INSERT_ATTENDANCE = '''
+    INSERT INTO attendance (name, reg_no, timestamp, status)
+    VALUES (?, ?, ?, 'Present')
+'''
+
+# Queue markers
+_FLUSH = object()
+_STOP = object()
+
+
+class AttendanceWriter:
+    """Single background writer that group-commits queued attendance rows"""
+
+    def __init__(self, database=None, batch_size=None, max_latency_ms=None, spill_file=None):
+        self.database = database or Config.DATABASE
+        self.spill_file = spill_file or Config.INGEST_SPILL_FILE
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.max_latency = (max_latency_ms if max_latency_ms is not None else Config.INGEST_MAX_LATENCY_MS) / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._committed_cond = threading.Condition(self._lock)
+        self._submitted = 0
+        self._committed = 0
+        # Rows given up on after the retries (spilled to the file, or lost if that failed too)
+        self._dropped = 0
+        self._spilled = os.path.exists(self.spill_file)
+        self._thread = None
+
+    def _ensure_thread(self):
+        """Start the writer thread if it is not running; call with _lock held"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, row):
+        """Queue one (name, reg_no, timestamp) row"""
+        with self._lock:
+            self._ensure_thread()
+            self._submitted += 1
+            self._queue.put(row)
+
+    def pending(self):
+        """Rows queued but not yet committed or dropped"""
+        with self._lock:
+            return self._submitted - self._committed - self._dropped
+
+    def dropped(self):
+        """Rows that could not be inserted after the retries"""
+        with self._lock:
+            return self._dropped
+
+    def flush(self, timeout=None):
+        """Write out everything queued so far; returns False if it timed out"""
+        with self._lock:
+            target = self._submitted
+            if self._committed + self._dropped >= target:
+                return True
+            self._ensure_thread()
+        self._queue.put(_FLUSH)
+        with self._lock:
+            return self._committed_cond.wait_for(lambda: self._committed + self._dropped >= target, timeout)
+
+    def stop(self, timeout=None):
+        """Write out the queue and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        conn = None
+        try:
+            conn = db.connect(self.database)
+            if self._spilled:
+                self._replay_spill(conn)
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [] if item is _FLUSH else [item]
+                # Gather more rows until the batch is full or the oldest row has waited long enough
+                deadline = time.monotonic() + self.max_latency
+                while batch and item is not _FLUSH and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if item is not _FLUSH:
+                        batch.append(item)
+                if batch:
+                    self._write(conn, batch)
+        except Exception as e:
+            print(f"[ATTENDANCE WRITER] Writer stopped: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+            # The next submit() or flush() starts a new writer for whatever is still queued
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _write(self, conn, batch):
+        """Insert a batch in one transaction, retrying while the database is busy"""
+        written = False
+        for attempt in range(Config.INGEST_MAX_RETRIES):
+            try:
+                with conn:
+                    conn.executemany(INSERT_ATTENDANCE, batch)
+                written = True
+                break
+            except sqlite3.Error as e:
+                print(f"[ATTENDANCE WRITER] Batch of {len(batch)} failed (attempt {attempt + 1}): {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 2))
+            except Exception as e:
+                # Not the database being busy; trying again will not help
+                print(f"[ATTENDANCE WRITER] Batch of {len(batch)} failed: {e}")
+                break
+        if not written:
+            self._spill(batch)
+
+        try:
+            if written:
+                bump('attendance')
+                publish_attendance(conn, batch)
+                if self._spilled:
+                    self._replay_spill(conn)
+        finally:
+            with self._lock:
+                if written:
+                    self._committed += len(batch)
+                else:
+                    self._dropped += len(batch)
+                self._committed_cond.notify_all()
+
+    def _spill(self, batch):
+        """Append rows that could not be inserted to the spill file"""
+        try:
+            with open(self.spill_file, 'a', newline='') as f:
+                csv.writer(f).writerows(batch)
+            self._spilled = True
+            print(f"[ATTENDANCE WRITER] Saved {len(batch)} rows to {self.spill_file}")
+        except OSError as e:
+            print(f"[ATTENDANCE WRITER] Could not save rows to {self.spill_file}: {e}")
+            for row in batch:
+                print(f"[ATTENDANCE WRITER] Dropped row: {row}")
+
+    def _replay_spill(self, conn):
+        """Insert the rows in the spill file, then remove it"""
+        try:
+            with open(self.spill_file, newline='') as f:
+                rows = [tuple(row) for row in csv.reader(f) if row]
+            with conn:
+                conn.executemany(INSERT_ATTENDANCE, rows)
+            os.remove(self.spill_file)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"[ATTENDANCE WRITER] Could not write saved rows from {self.spill_file}: {e}")
+            return
+        self._spilled = False
+        bump('attendance')
+        print(f"[ATTENDANCE WRITER] Wrote {len(rows)} saved rows from {self.spill_file}")
+
+
+def publish_attendance(conn, rows):
+    """Push committed (name, reg_no, timestamp) rows and today's totals to live pages"""
+    try:
+        totals = conn.execute('''
+            SELECT COALESCE(SUM(scans), 0), COALESCE(SUM(people), 0) FROM attendance_daily
+            WHERE day = ?
+        ''', (date.today().isoformat(),)).fetchone()
+        publish('attendance', {
+            'rows': [{'name': name, 'reg_no': reg_no, 'timestamp': timestamp} for name, reg_no, timestamp in rows],
+            'today_count': totals[0],
+            'unique_students': totals[1],
+        })
+    except sqlite3.Error as e:
+        # The rows are committed; a missed live update must not look like a failed write
+        print(f"[ATTENDANCE WRITER] Could not publish attendance event: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide writer, created on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AttendanceWriter()
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def _stop_on_sigterm(previous):
+    """SIGTERM handler that writes out the queue, then does whatever was set up before"""
+    def handler(signum, frame):
+        if _writer is not None:
+            _writer.stop(Config.INGEST_MAX_LATENCY_MS / 1000 * 10)
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # atexit hooks do not run on a signal, so end the process the usual way
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+    return handler
+
+
+def init_app(app):
+    """Write out queued scans when the process is told to stop"""
+    # Signal handlers can only be set from the main thread
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _stop_on_sigterm(signal.getsignal(signal.SIGTERM)))
+
+
+def flush_attendance(timeout=None):
+    """Make every queued scan visible to readers"""
+    if _writer is not None:
+        return _writer.flush(timeout)
+    return True
+
+
+def reads_attendance(func):
+    """Decorator for attendance readers - flushes queued scans first when INGEST_FLUSH_ON_READ is on"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if Config.INGEST_FLUSH_ON_READ:
+            flush_attendance(Config.INGEST_MAX_LATENCY_MS / 1000 * 10)
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,212 @@
+"""
+Request metrics
+
+init_app() times every request and records it against its route rule, not
+the raw path, so /profile/<reg_no> is one series. Each series keeps a
+fixed-bucket latency histogram, counts per status code, and the number and
+time of the SQL statements its requests ran. The statement figures come from
+the request's pooled connection, which counts what goes through it (see
+db.TimedCursor). A rolling window of recent latencies gives current
+percentiles alongside the all-time histogram, so a slowdown at peak hours is
+not buried under a quiet morning.
+
+Everything is kept in process memory under one lock: a request costs a few
+dictionary updates. For the output format, see render_prometheus() and
+snapshot().
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from flask import g, request
+from .config import Config
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Requests that matched no route share one series
+UNMATCHED = '<unmatched>'
+
+
+class EndpointSeries:
+    """Running totals for one method and route rule"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.recent = deque(maxlen=Config.METRICS_RECENT_SAMPLES)  # (monotonic, seconds)
+
+    def observe(self, seconds, status, db_queries, db_seconds, now):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.db_queries += db_queries
+        self.db_seconds += db_seconds
+        self.recent.append((now, seconds))
+
+
+class RequestMetrics:
+    """Thread-safe collection of EndpointSeries plus the in-flight gauge"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self.in_flight = 0
+        self.started = time.time()
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe(self, method, endpoint, seconds, status, db_queries=0, db_seconds=0.0):
+        now = time.monotonic()
+        with self._lock:
+            series = self._series.get((method, endpoint))
+            if series is None:
+                series = self._series[(method, endpoint)] = EndpointSeries()
+            series.observe(seconds, status, db_queries, db_seconds, now)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """JSON-ready totals per endpoint, with percentiles over the recent window"""
+        since = time.monotonic() - Config.METRICS_RECENT_S
+        endpoints = {}
+        with self._lock:
+            in_flight = self.in_flight
+            for (method, endpoint), s in sorted(self._series.items(), key=lambda item: item[0][::-1]):
+                recent = sorted(seconds for at, seconds in s.recent if at >= since)
+                endpoints[f'{method} {endpoint}'] = {
+                    'requests': s.count,
+                    'statuses': {str(code): n for code, n in sorted(s.statuses.items())},
+                    'errors': sum(n for code, n in s.statuses.items() if code >= 500),
+                    'avg_ms': round(s.seconds / s.count * 1000, 2),
+                    'db_queries_per_request': round(s.db_queries / s.count, 2),
+                    'db_ms_per_request': round(s.db_seconds / s.count * 1000, 2),
+                    'recent': {
+                        'requests': len(recent),
+                        'p50_ms': _percentile_ms(recent, 0.50),
+                        'p95_ms': _percentile_ms(recent, 0.95),
+                        'p99_ms': _percentile_ms(recent, 0.99),
+                        'max_ms': round(recent[-1] * 1000, 2) if recent else None,
+                    },
+                }
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'in_flight': in_flight,
+            'recent_window_s': Config.METRICS_RECENT_S,
+            'endpoints': endpoints,
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            '# HELP http_requests_in_flight Requests being handled right now.',
+            '# TYPE http_requests_in_flight gauge',
+        ]
+        with self._lock:
+            lines.append(f'http_requests_in_flight {self.in_flight}')
+            series = sorted(self._series.items())
+            lines += ['# HELP http_request_duration_seconds Time from routing to response, per route.',
+                      '# TYPE http_request_duration_seconds histogram']
+            for (method, endpoint), s in series:
+                labels = _labels(method=method, endpoint=endpoint)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float('inf'),), s.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {s.seconds:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {s.count}')
+            lines += ['# HELP http_requests_total Requests by route and status code.',
+                      '# TYPE http_requests_total counter']
+            for (method, endpoint), s in series:
+                for code, count in sorted(s.statuses.items()):
+                    lines.append(f'http_requests_total{{{_labels(method=method, endpoint=endpoint, status=code)}}} '
+                                 f'{count}')
+            lines += ['# HELP http_request_db_queries_total SQL statements run by requests, per route.',
+                      '# TYPE http_request_db_queries_total counter']
+            lines += [f'http_request_db_queries_total{{{_labels(method=method, endpoint=endpoint)}}} {s.db_queries}'
+                      for (method, endpoint), s in series]
+            lines += ['# HELP http_request_db_seconds_total Time spent in SQLite by requests, per route.',
+                      '# TYPE http_request_db_seconds_total counter']
+            lines += [f'http_request_db_seconds_total{{{_labels(method=method, endpoint=endpoint)}}} '
+                      f'{s.db_seconds:.6f}' for (method, endpoint), s in series]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped))
+
+
+def _percentile_ms(ordered, fraction):
+    """Nearest-rank percentile of sorted seconds, in ms"""
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide request metrics"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RequestMetrics()
+        return _metrics
+
+
+def _db_totals():
+    """(statements, seconds) counted so far on this context's connection"""
+    conn = g.get('_db_conn')
+    return (conn.queries, conn.query_seconds) if conn is not None else (0, 0.0)
+
+
+def _begin_request():
+    get_metrics().begin()
+    # A connection already held by an outer app context carries earlier counts
+    g._metrics_db_start = _db_totals()
+    g._metrics_started = time.perf_counter()
+
+
+def _record_response(response):
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        seconds = time.perf_counter() - started
+        (queries, query_seconds), (start_queries, start_seconds) = _db_totals(), g._metrics_db_start
+        rule = request.url_rule.rule if request.url_rule is not None else UNMATCHED
+        get_metrics().observe(request.method, rule, seconds, response.status_code,
+                              queries - start_queries, query_seconds - start_seconds)
+        g._metrics_recorded = True
+    return response
+
+
+def _end_request(exception=None):
+    # Paired with before_request, which every request reaches unless an
+    # earlier before_request handler failed
+    if '_metrics_recorded' in g or '_metrics_started' in g:
+        get_metrics().end()
+
+
+def init_app(app):
+    """Time every request when METRICS_ENABLED is on"""
+    if not Config.METRICS_ENABLED:
+        return
+    app.before_request(_begin_request)
+    app.after_request(_record_response)
+    app.teardown_request(_end_request)
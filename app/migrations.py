@@ -0,0 +1,471 @@
+"""
+Versioned schema migrations
+
+Each migration runs once, in order, inside its own transaction and is recorded
+in the schema_version table. Add new migrations to the end of MIGRATIONS;
+never edit one that has already shipped.
+"""
+import sqlite3
+
+
+def _columns(conn, table):
+    """Column names of a table"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_missing_columns(conn, table, columns):
+    """Add any of the (name, type) columns the table does not have yet"""
+    existing = _columns(conn, table)
+    for name, col_type in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {col_type}')
+
+
+def _base_schema(conn):
+    """Create users, attendance and departments"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            reg_no TEXT UNIQUE NOT NULL,
+            role TEXT NOT NULL,
+            department TEXT,
+            batch_year TEXT,
+            finger_id INTEGER UNIQUE,
+            mac_address TEXT,
+            password TEXT NOT NULL,
+            photo_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            reg_no TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            status TEXT DEFAULT 'Present',
+            department TEXT,
+            batch_year TEXT,
+            session_type TEXT DEFAULT 'Regular',
+            lab_name TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            hod_name TEXT,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _legacy_columns(conn):
+    """Bring databases created by the old setup scripts up to the base schema"""
+    # ALTER TABLE cannot add a column with a non-constant default, so the
+    # timestamp columns come back without CURRENT_TIMESTAMP on old databases
+    _add_missing_columns(conn, 'users', [
+        ('department', 'TEXT'),
+        ('batch_year', 'TEXT'),
+        ('photo_path', 'TEXT'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+    ])
+    _add_missing_columns(conn, 'attendance', [
+        ('status', "TEXT DEFAULT 'Present'"),
+        ('department', 'TEXT'),
+        ('batch_year', 'TEXT'),
+        ('session_type', "TEXT DEFAULT 'Regular'"),
+        ('lab_name', 'TEXT'),
+    ])
+
+
+def _access_path_indexes(conn):
+    """Indexes for the lookups the routes and models actually perform"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_reg_no_timestamp ON attendance(reg_no, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance(timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_department_role ON users(department, role)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_batch_year_role ON users(batch_year, role)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_name ON users(name)')
+
+
+def _attendance_day_column(conn):
+    """Calendar day of each scan as a generated column"""
+    # timestamp is stored as 'YYYY-MM-DD HH:MM:SS', which sorts like an epoch,
+    # so queries filter it with half-open ranges and use `day` only for grouping.
+    # A VIRTUAL column is computed on read, so existing rows need no backfill.
+    if 'day' not in _columns(conn, 'attendance'):
+        conn.execute('''
+            ALTER TABLE attendance
+            ADD COLUMN day TEXT GENERATED ALWAYS AS (substr(timestamp, 1, 10)) VIRTUAL
+        ''')
+
+
+def _wake_events(conn):
+    """Outcome of every Wake-on-LAN request"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS wake_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mac_address TEXT NOT NULL,
+            name TEXT,
+            reg_no TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            packets_sent INTEGER DEFAULT 0,
+            message TEXT,
+            requested_at TEXT NOT NULL,
+            completed_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_wake_events_reg_no ON wake_events(reg_no, id)')
+
+
+def _device_state(conn):
+    """Per-device scanner mode for the SQLite hardware state backend"""
+    # mode and enrollment are small JSON objects; version drives compare-and-set
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS device_state (
+            device_id TEXT PRIMARY KEY,
+            mode TEXT NOT NULL,
+            enrollment TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            mode_version INTEGER NOT NULL DEFAULT 0,
+            last_seen TEXT
+        )
+    ''')
+
+
+def _users_version_counter(conn):
+    """Change counter for users, bumped by triggers so caches can tell when to reload"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('users', 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+            END
+        ''')
+
+
+def _rollup_add(row):
+    """Trigger statements counting attendance row `row` (NEW/OLD) into the rollup"""
+    # A person's scans for a day all count towards the group of their first scan
+    # that day, which attendance_daily_people remembers so deletes undo exactly
+    return f'''
+        INSERT INTO attendance_daily_people (day, reg_no, department, batch_year, role, scans)
+        SELECT substr({row}.timestamp, 1, 10), {row}.reg_no,
+               COALESCE({row}.department, u.department, ''), COALESCE({row}.batch_year, u.batch_year, ''),
+               COALESCE(u.role, ''), 1
+        FROM (SELECT 1) LEFT JOIN users u ON u.reg_no = {row}.reg_no
+        WHERE 1
+        ON CONFLICT(day, reg_no) DO UPDATE SET scans = scans + 1;
+
+        INSERT INTO attendance_daily (day, department, batch_year, role, scans, people)
+        SELECT day, department, batch_year, role, 1, scans = 1
+        FROM attendance_daily_people
+        WHERE day = substr({row}.timestamp, 1, 10) AND reg_no = {row}.reg_no
+        ON CONFLICT(day, department, batch_year, role) DO UPDATE
+        SET scans = scans + 1, people = people + excluded.people;
+    '''
+
+
+def _rollup_remove(row):
+    """Trigger statements taking attendance row `row` back out of the rollup"""
+    return f'''
+        UPDATE attendance_daily
+        SET scans = scans - 1,
+            people = people - (SELECT p.scans = 1 FROM attendance_daily_people p
+                               WHERE p.day = substr({row}.timestamp, 1, 10) AND p.reg_no = {row}.reg_no)
+        WHERE (day, department, batch_year, role) = (
+            SELECT day, department, batch_year, role FROM attendance_daily_people
+            WHERE day = substr({row}.timestamp, 1, 10) AND reg_no = {row}.reg_no);
+
+        UPDATE attendance_daily_people SET scans = scans - 1
+        WHERE day = substr({row}.timestamp, 1, 10) AND reg_no = {row}.reg_no;
+
+        DELETE FROM attendance_daily_people
+        WHERE day = substr({row}.timestamp, 1, 10) AND reg_no = {row}.reg_no AND scans <= 0;
+
+        DELETE FROM attendance_daily WHERE day = substr({row}.timestamp, 1, 10) AND scans <= 0;
+    '''
+
+
+def rebuild_attendance_rollup(conn):
+    """Recompute attendance_daily and attendance_daily_people from the raw attendance table"""
+    conn.execute('DELETE FROM attendance_daily')
+    conn.execute('DELETE FROM attendance_daily_people')
+    conn.execute('''
+        INSERT INTO attendance_daily_people (day, reg_no, department, batch_year, role, scans)
+        SELECT a.day, a.reg_no,
+               COALESCE(f.department, u.department, ''), COALESCE(f.batch_year, u.batch_year, ''),
+               COALESCE(u.role, ''), a.scans
+        FROM (SELECT day, reg_no, COUNT(*) AS scans, MIN(log_id) AS first_id
+              FROM attendance GROUP BY day, reg_no) a
+        JOIN attendance f ON f.log_id = a.first_id
+        LEFT JOIN users u ON u.reg_no = a.reg_no
+    ''')
+    conn.execute('''
+        INSERT INTO attendance_daily (day, department, batch_year, role, scans, people)
+        SELECT day, department, batch_year, role, SUM(scans), COUNT(*)
+        FROM attendance_daily_people
+        GROUP BY day, department, batch_year, role
+    ''')
+
+
+def _attendance_rollup(conn):
+    """Daily attendance rollup kept current by triggers, backfilled from history"""
+    # '' stands for "unknown" in the key columns: NULLs never conflict in a
+    # unique key, so they would defeat the upserts
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            day TEXT NOT NULL,
+            department TEXT NOT NULL DEFAULT '',
+            batch_year TEXT NOT NULL DEFAULT '',
+            role TEXT NOT NULL DEFAULT '',
+            scans INTEGER NOT NULL DEFAULT 0,
+            people INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department, batch_year, role)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_daily_people (
+            day TEXT NOT NULL,
+            reg_no TEXT NOT NULL,
+            department TEXT NOT NULL DEFAULT '',
+            batch_year TEXT NOT NULL DEFAULT '',
+            role TEXT NOT NULL DEFAULT '',
+            scans INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, reg_no)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_rollup_insert AFTER INSERT ON attendance
+        BEGIN {_rollup_add('NEW')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_rollup_delete AFTER DELETE ON attendance
+        BEGIN {_rollup_remove('OLD')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_rollup_update
+        AFTER UPDATE OF timestamp, reg_no, department, batch_year ON attendance
+        BEGIN {_rollup_remove('OLD')} {_rollup_add('NEW')} END
+    ''')
+    rebuild_attendance_rollup(conn)
+
+
+def ensure_users_fulltext(conn):
+    """
+    Trigram FTS5 index over users' name, reg_no and department, kept in step by
+    triggers. Returns False on SQLite builds without FTS5 or the trigram
+    tokenizer (3.34+); search then falls back to LIKE.
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+                name, reg_no, department,
+                content='users', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"[MIGRATIONS] Full-text index unavailable, user search will use LIKE: {e}")
+        return False
+
+    insert = '''
+        INSERT INTO users_fts (rowid, name, reg_no, department)
+        VALUES (new.id, new.name, new.reg_no, new.department);
+    '''
+    delete = '''
+        INSERT INTO users_fts (users_fts, rowid, name, reg_no, department)
+        VALUES ('delete', old.id, old.name, old.reg_no, old.department);
+    '''
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN {insert} END')
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN {delete} END')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, reg_no, department ON users
+        BEGIN {delete} {insert} END
+    ''')
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+    return True
+
+
+def _users_fulltext(conn):
+    """
+    Users full-text index. Being recorded does not mean the index exists: a
+    build without FTS5 skips it, and run_migrations tries again on every start.
+    """
+    ensure_users_fulltext(conn)
+
+
+def _student_stats_select(where):
+    """
+    SELECT computing student_stats rows from raw attendance for the reg_nos
+    matching `where`. The streak is the run of consecutive days ending at the
+    last day present: in that run, julianday(day) - day_number is the same
+    for every day.
+    """
+    return f'''
+        SELECT reg_no, SUM(scans), MIN(first_seen), MAX(last_seen), COUNT(*),
+               SUM(julianday(day) - day_number = julianday(last_day) - days)
+        FROM (
+            SELECT reg_no, substr(timestamp, 1, 10) AS day, COUNT(*) AS scans,
+                   MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen,
+                   ROW_NUMBER() OVER (PARTITION BY reg_no ORDER BY substr(timestamp, 1, 10)) AS day_number,
+                   COUNT(*) OVER (PARTITION BY reg_no) AS days,
+                   MAX(substr(timestamp, 1, 10)) OVER (PARTITION BY reg_no) AS last_day
+            FROM attendance
+            WHERE {where}
+            GROUP BY reg_no, substr(timestamp, 1, 10)
+        )
+        GROUP BY reg_no
+    '''
+
+
+STUDENT_STATS_COLUMNS = 'reg_no, total_sessions, first_seen, last_seen, days_present, streak'
+
+
+def _student_stats_recompute(reg_no):
+    """Trigger statements recomputing one person's student_stats row from attendance"""
+    return f'''
+        DELETE FROM student_stats WHERE reg_no = {reg_no};
+        INSERT INTO student_stats ({STUDENT_STATS_COLUMNS})
+        {_student_stats_select(f'reg_no = {reg_no}')};
+    '''
+
+
+def _student_stats_add(row):
+    """Trigger statements counting attendance row `row` (NEW) into student_stats"""
+    # Scans arriving in time order (the usual case) update the row in place;
+    # an earlier day arriving late can join streaks, so that person is recomputed
+    day = f'substr({row}.timestamp, 1, 10)'
+    return f'''
+        UPDATE student_stats
+        SET total_sessions = total_sessions + 1,
+            first_seen = min(first_seen, {row}.timestamp),
+            last_seen = max(last_seen, {row}.timestamp),
+            days_present = days_present + (substr(last_seen, 1, 10) < {day}),
+            streak = CASE
+                WHEN substr(last_seen, 1, 10) = {day} THEN streak
+                WHEN date(last_seen, '+1 day') = {day} THEN streak + 1
+                ELSE 1
+            END
+        WHERE reg_no = {row}.reg_no AND substr(last_seen, 1, 10) <= {day};
+
+        DELETE FROM student_stats WHERE reg_no = {row}.reg_no AND substr(last_seen, 1, 10) > {day};
+
+        INSERT INTO student_stats ({STUDENT_STATS_COLUMNS})
+        {_student_stats_select(f'reg_no = {row}.reg_no AND NOT EXISTS (SELECT 1 FROM student_stats WHERE reg_no = {row}.reg_no)')};
+    '''
+
+
+def rebuild_student_stats(conn):
+    """Recompute student_stats from the raw attendance table"""
+    conn.execute('DELETE FROM student_stats')
+    conn.execute(f'INSERT INTO student_stats ({STUDENT_STATS_COLUMNS}) {_student_stats_select("1")}')
+
+
+def _student_stats(conn):
+    """Running totals per person kept current by triggers, backfilled from history"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_stats (
+            reg_no TEXT PRIMARY KEY,
+            total_sessions INTEGER NOT NULL DEFAULT 0,
+            first_seen TEXT,
+            last_seen TEXT,
+            days_present INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_student_stats_total ON student_stats(total_sessions)')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_stats_insert AFTER INSERT ON attendance
+        BEGIN {_student_stats_add('NEW')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_stats_delete AFTER DELETE ON attendance
+        BEGIN {_student_stats_recompute('OLD.reg_no')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_stats_update AFTER UPDATE OF timestamp, reg_no ON attendance
+        BEGIN {_student_stats_recompute('OLD.reg_no')} {_student_stats_recompute('NEW.reg_no')} END
+    ''')
+    rebuild_student_stats(conn)
+
+
+# (version, description, function) - append only
+MIGRATIONS = [
+    (1, 'base schema', _base_schema),
+    (2, 'add columns missing from legacy databases', _legacy_columns),
+    (3, 'access path indexes', _access_path_indexes),
+    (4, 'attendance day column', _attendance_day_column),
+    (5, 'wake events', _wake_events),
+    (6, 'device state', _device_state),
+    (7, 'users change counter', _users_version_counter),
+    (8, 'daily attendance rollup', _attendance_rollup),
+    (9, 'users full-text index', _users_fulltext),
+    (10, 'per-student running statistics', _student_stats),
+]
+
+
+def get_schema_version(conn):
+    """Highest applied migration version (0 for a fresh database)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn):
+    """Apply every pending migration in order; returns the list of versions applied"""
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have applied it while we waited for the lock
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    # Retry the full-text index a build without FTS5 skipped, e.g. after SQLite is upgraded
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'").fetchone():
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if ensure_users_fulltext(conn):
+                print("[MIGRATIONS] Built the users full-text index")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    if applied:
+        conn.execute('PRAGMA optimize')
+    return applied
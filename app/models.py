@@ -2,82 +2,40 @@
 Database models and operations
 """
 import sqlite3
-import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from .config import Config
-
-
-def get_db_connection():
-    """Create database connection with row factory"""
-    conn = sqlite3.connect(Config.DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+from .db import get_db_connection, iter_rows
+from .migrations import run_migrations
+from .user_cache import get_fingerprint_cache, invalidate_user_cache
+from .ingest import get_writer, reads_attendance, publish_attendance, INSERT_ATTENDANCE
+from .cache import bump
+from .user_search import match_users
+from .stats import get_department_stats_all, get_batch_stats_all
 
 
 def init_db():
-    """Initialize database if it doesn't exist"""
-    if not os.path.exists(Config.DATABASE):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create users table with enhanced fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                reg_no TEXT UNIQUE NOT NULL,
-                role TEXT NOT NULL,
-                department TEXT,
-                batch_year TEXT,
-                finger_id INTEGER UNIQUE,
-                mac_address TEXT,
-                password TEXT NOT NULL,
-                photo_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create attendance table with enhanced fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance (
-                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                reg_no TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                status TEXT DEFAULT 'Present',
-                department TEXT,
-                batch_year TEXT,
-                session_type TEXT DEFAULT 'Regular',
-                lab_name TEXT
-            )
-        ''')
-        
-        # Create departments table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS departments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                hod_name TEXT,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-
-    # Apply migrations if database exists
+    """Create the database if needed and apply any pending schema migrations"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    # Migrate existing users table if photo_path is missing
     try:
-        cursor.execute('ALTER TABLE users ADD COLUMN photo_path TEXT')
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass # Column already exists
-    conn.close()
+        run_migrations(conn)
+    finally:
+        conn.close()
+
+
+def day_bounds(start_day, end_day=None):
+    """
+    Half-open [start, end) timestamp bounds covering whole days.
+    Timestamps are 'YYYY-MM-DD HH:MM:SS' strings, so `timestamp >= start AND
+    timestamp < end` selects the days start_day..end_day and can seek an index,
+    unlike DATE(timestamp) = ?.
+    """
+    if isinstance(start_day, str):
+        start_day = datetime.strptime(start_day, '%Y-%m-%d').date()
+    if end_day is None:
+        end_day = start_day
+    elif isinstance(end_day, str):
+        end_day = datetime.strptime(end_day, '%Y-%m-%d').date()
+    return start_day.isoformat(), (end_day + timedelta(days=1)).isoformat()
 
 
 # ============================================
@@ -93,64 +51,26 @@ def get_all_departments():
 
 def get_department_stats(department_name):
     """Get statistics for a specific department"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get student count
-    cursor.execute('''
-        SELECT COUNT(*) as student_count
-        FROM users 
-        WHERE department = ? AND role = 'student'
-    ''', (department_name,))
-    student_count = cursor.fetchone()['student_count']
-    
-    # Get today's attendance
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) as attendance_count
-        FROM attendance 
-        WHERE department = ? AND DATE(timestamp) = ?
-    ''', (department_name, today))
-    attendance_count = cursor.fetchone()['attendance_count']
-    
-    conn.close()
-    return {
-        'student_count': student_count,
-        'attendance_count': attendance_count,
-        'attendance_percentage': (attendance_count / student_count * 100) if student_count > 0 else 0
-    }
+    return get_department_stats_all(department_name)[department_name]
 
 # ============================================
 # BATCH OPERATIONS
 # ============================================
 
-def get_batch_stats():
-    """Get statistics by batch year"""
+def get_batch_years():
+    """Batch years that have users, newest first"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT batch_year, COUNT(*) as student_count
-        FROM users 
-        WHERE role = 'student' AND batch_year IS NOT NULL
-        GROUP BY batch_year
+    years = [row['batch_year'] for row in conn.execute('''
+        SELECT DISTINCT batch_year FROM users
+        WHERE batch_year IS NOT NULL AND batch_year != ''
         ORDER BY batch_year DESC
-    ''')
-    batch_stats = cursor.fetchall()
-    
-    # Get attendance for each batch
-    today = datetime.now().strftime('%Y-%m-%d')
-    for batch in batch_stats:
-        cursor.execute('''
-            SELECT COUNT(*) as attendance_count
-            FROM attendance 
-            WHERE batch_year = ? AND DATE(timestamp) = ?
-        ''', (batch['batch_year'], today))
-        batch['attendance_count'] = cursor.fetchone()['attendance_count']
-        batch['attendance_percentage'] = (batch['attendance_count'] / batch['student_count'] * 100) if batch['student_count'] > 0 else 0
-    
+    ''').fetchall()]
     conn.close()
-    return [dict(row) for row in batch_stats]
+    return years
+
+def get_batch_stats():
+    """Get statistics by batch year"""
+    return get_batch_stats_all()
 
 # ============================================
 # ENHANCED USER OPERATIONS
@@ -185,6 +105,7 @@ def add_user(name, reg_no, role, password=None, department=None, batch_year=None
         
         user_id = cursor.lastrowid
         conn.commit()
+        invalidate_user_cache()
         return {'success': True, 'user_id': user_id}
     except sqlite3.IntegrityError as e:
         error_msg = str(e)
@@ -250,14 +171,17 @@ def get_user_by_credentials(username, password):
 
 
 def get_user_by_finger_id(finger_id):
-    """Get user by fingerprint ID"""
+    """Get id, name, reg_no, mac_address and finger_id of the user with a fingerprint ID (served from memory)"""
+    if Config.USER_CACHE:
+        user = get_fingerprint_cache().get(finger_id)
+        return user._asdict() if user else None
     conn = get_db_connection()
     user = conn.execute('''
-        SELECT * FROM users 
+        SELECT id, name, reg_no, mac_address, finger_id FROM users 
         WHERE finger_id = ?
     ''', (finger_id,)).fetchone()
     conn.close()
-    return user
+    return dict(user) if user else None
 
 
 def get_next_finger_id():
@@ -282,6 +206,7 @@ def delete_user(user_id):
     conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
     conn.commit()
     conn.close()
+    invalidate_user_cache()
 
 
 def update_user_mac(user_id, mac_address):
@@ -294,6 +219,7 @@ def update_user_mac(user_id, mac_address):
     ''', (mac_address, user_id))
     conn.commit()
     conn.close()
+    invalidate_user_cache()
 
 
 def clear_user_fingerprint(user_id):
@@ -302,12 +228,14 @@ def clear_user_fingerprint(user_id):
     conn.execute('UPDATE users SET finger_id = NULL WHERE id = ?', (user_id,))
     conn.commit()
     conn.close()
+    invalidate_user_cache()
 
 
 # ============================================
 # ATTENDANCE OPERATIONS
 # ============================================
 
+@reads_attendance
 def get_all_attendance():
     """Get all attendance logs"""
     conn = get_db_connection()
@@ -319,6 +247,98 @@ def get_all_attendance():
     return logs
 
 
+def people_filter(department=None, batch_year=None, role=None, name=None, reg_no=None):
+    """
+    A condition on attendance (aliased a) and its parameters, keeping the scans
+    of the people the filters pick; ('', []) when none is set. Department, batch
+    and role are matched against users, and so are name and reg_no when the
+    full-text index can serve them; otherwise those two are LIKE matches on
+    the scans themselves.
+    """
+    people, params = [], []
+    for column, value in (('department', department), ('batch_year', batch_year), ('role', role)):
+        if value:
+            people.append(f'u.{column} = ?')
+            params.append(value)
+    terms = [((column,), text) for column, text in (('name', name), ('reg_no', reg_no)) if text]
+    matched = match_users(terms)
+    if matched:
+        people.append(matched[0])
+        params.extend(matched[1])
+
+    clauses = []
+    if people:
+        clauses.append(f"a.reg_no IN (SELECT u.reg_no FROM users u WHERE {' AND '.join(people)})")
+    if not matched:
+        for (column,), text in terms:
+            clauses.append(f'a.{column} LIKE ?')
+            params.append(f'%{text}%')
+    return ' AND '.join(clauses), params
+
+
+def _attendance_query(date_from=None, date_to=None, department=None, batch_year=None, name=None):
+    """
+    SELECT over attendance with the report filters; callers add ORDER BY/LIMIT.
+    Department, batch and name pick people, see people_filter.
+    """
+    query = '''
+        SELECT a.log_id, a.name, a.reg_no, a.timestamp, a.status
+        FROM attendance a
+        WHERE 1=1
+    '''
+    params = []
+    if date_from:
+        query += ' AND a.timestamp >= ?'
+        params.append(day_bounds(date_from)[0])
+    if date_to:
+        query += ' AND a.timestamp < ?'
+        params.append(day_bounds(date_to)[1])
+
+    people, people_params = people_filter(department=department, batch_year=batch_year, name=name)
+    if people:
+        query += f' AND {people}'
+        params.extend(people_params)
+    return query, params
+
+
+@reads_attendance
+def iter_attendance(**filters):
+    """
+    Yield attendance logs newest first, fetched Config.EXPORT_CHUNK_ROWS at a
+    time so only one chunk is in memory however long the history is.
+    """
+    query, params = _attendance_query(**filters)
+    query += ' ORDER BY a.timestamp DESC, a.log_id DESC'
+
+    conn = get_db_connection()
+    try:
+        yield from iter_rows(conn.execute(query, params))
+    finally:
+        conn.close()
+
+
+@reads_attendance
+def get_attendance_page(after=None, limit=50, **filters):
+    """
+    One page of attendance logs newest first, starting below `after` (a
+    (timestamp, log_id) pair). Returns (logs, more). The page seeks on the
+    timestamp index and stops after `limit` rows, so it costs the same
+    however deep it is or however long the history.
+    """
+    query, params = _attendance_query(**filters)
+    if after:
+        query += ' AND (a.timestamp, a.log_id) < (?, ?)'
+        params.extend(after)
+    query += ' ORDER BY a.timestamp DESC, a.log_id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    conn = get_db_connection()
+    logs = conn.execute(query, params).fetchall()
+    conn.close()
+    return logs[:limit], len(logs) > limit
+
+
+@reads_attendance
 def get_recent_attendance(limit=10):
     """Get recent attendance logs"""
     conn = get_db_connection()
@@ -331,27 +351,30 @@ def get_recent_attendance(limit=10):
     return logs
 
 
+@reads_attendance
 def get_today_attendance_count():
     """Get count of today's attendance"""
-    today = datetime.now().strftime('%Y-%m-%d')
     conn = get_db_connection()
     count = conn.execute('''
-        SELECT COUNT(*) as count FROM attendance 
-        WHERE DATE(timestamp) = ?
-    ''', (today,)).fetchone()['count']
+        SELECT COALESCE(SUM(scans), 0) as count FROM attendance_daily 
+        WHERE day = ?
+    ''', (date.today().isoformat(),)).fetchone()['count']
     conn.close()
     return count
 
 
 def log_attendance(name, reg_no):
-    """Log attendance entry"""
+    """Log attendance entry (queued for the background writer when write-behind is on)"""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    row = (name, reg_no, timestamp)
+    if Config.INGEST_WRITE_BEHIND:
+        get_writer().submit(row)
+        return
     conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO attendance (name, reg_no, timestamp, status)
-        VALUES (?, ?, ?, 'Present')
-    ''', (name, reg_no, timestamp))
+    conn.execute(INSERT_ATTENDANCE, row)
     conn.commit()
+    bump('attendance')
+    publish_attendance(conn, [row])
     conn.close()
 
 
@@ -361,3 +384,4 @@ def delete_attendance(log_id):
     conn.execute('DELETE FROM attendance WHERE log_id = ?', (log_id,))
     conn.commit()
     conn.close()
+    bump('attendance')
@@ -0,0 +1,27 @@
+"""
+Keyset pagination cursors
+
+Attendance lists are ordered by (timestamp, log_id) newest first. A cursor
+names the boundary row of a page and which way to go from it; it is
+base64-encoded JSON so clients pass it back without reading it.
+"""
+import base64
+import binascii
+import json
+
+
+def encode_cursor(row, direction):
+    """Opaque token for the page after ('next') or before ('prev') a result row"""
+    raw = json.dumps([row['timestamp'], row['log_id'], direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(timestamp, log_id, direction) from encode_cursor; ValueError if the token is malformed"""
+    try:
+        timestamp, log_id, direction = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(timestamp, str) or not isinstance(log_id, int) or direction not in ('next', 'prev'):
+        raise ValueError('Invalid cursor')
+    return timestamp, log_id, direction
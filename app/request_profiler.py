@@ -0,0 +1,237 @@
+"""
+On-demand request profiler
+
+A request is profiled when an admin adds ?_profile=1 or an X-Profile: 1
+header to any route, or when it is picked at random at PROFILER_SAMPLE_RATE.
+A sampler thread then reads the request thread's stack every
+PROFILER_INTERVAL_MS until the response is ready. Time spent waiting in
+SQLite shows up under the function that ran the query, in TimedCursor.
+
+Once the request ends, the sampler writes the collapsed stacks
+("outer;inner;leaf count" lines, as used by flame graph tools) to
+PROFILE_DIR as JSON. The file also records the route, arguments, status
+and timing. Only the newest PROFILE_MAX_COUNT profiles within PROFILE_MAX_MB
+are kept. The /profiles pages list them and draw each as a call tree.
+
+A request that is not profiled costs one before_request hook that looks at
+the raw query string and headers. PROFILER_ENABLED=false removes even that.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import request, session, after_this_request
+from .config import Config
+
+# Distinct stacks kept per profile; the rarest are folded into one entry
+MAX_STACKS = 5000
+# Timestamp to the microsecond first, so ids sort oldest to newest
+PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[0-9a-f]{4}$')
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_store_lock = threading.Lock()
+_labels = {}
+
+
+def _label(code):
+    """'function (file:line)' for a code object, with the path shortened"""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(_ROOT):
+            path = os.path.relpath(path, _ROOT)
+        elif 'site-packages' in path:
+            path = path.split('site-packages', 1)[1].lstrip(os.sep)
+        else:
+            path = os.path.basename(path)
+        name = getattr(code, 'co_qualname', code.co_name)
+        label = _labels[code] = f'{name} ({path}:{code.co_firstlineno})'.replace(';', ':')
+    return label
+
+
+class Sampler(threading.Thread):
+    """Samples one thread's stack until stopped, then hands the profile to on_done"""
+
+    def __init__(self, thread_id, interval, on_done):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.on_done = on_done
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            # Start at the WSGI entry; the server loop above it is the same every time.
+            # No WSGI entry means the request has ended.
+            for depth in range(len(stack) - 1, -1, -1):
+                if stack[depth].co_name == 'wsgi_app':
+                    stack = stack[:depth + 1]
+                    break
+            else:
+                # Also how a request that failed before after_request ends its sampler
+                break
+            key = ';'.join(_label(code) for code in reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+        self.on_done(self)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _trigger(environ):
+    """Why this request should be profiled, or None"""
+    # Raw WSGI values first: an ordinary request is turned away without
+    # parsing its query string or touching the session
+    if environ.get('HTTP_X_PROFILE') == '1' or '_profile=1' in environ.get('QUERY_STRING', ''):
+        if request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1':
+            # Only admins may ask; anyone else's request runs as usual
+            return 'admin' if session.get('role') == 'admin' else None
+    if Config.PROFILER_SAMPLE_RATE and random.random() < Config.PROFILER_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def _begin_request():
+    trigger = _trigger(request.environ)
+    if trigger is None:
+        return
+    record = {
+        'id': f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}",
+        'trigger': trigger,
+        'method': request.method,
+        'path': request.path,
+        'route': request.url_rule.rule if request.url_rule is not None else None,
+        'args': {key: value for key, value in request.args.items() if key != '_profile'},
+        'user': session.get('username'),
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'interval_ms': Config.PROFILER_INTERVAL_MS,
+    }
+    started = time.perf_counter()
+
+    def finish(sampler):
+        record['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        record['samples'] = sampler.samples
+        record['stacks'] = _fold(sampler.stacks)
+        try:
+            save_profile(record)
+        except OSError as e:
+            print(f"[PROFILER] Could not save profile {record['id']}: {e}")
+
+    sampler = Sampler(threading.get_ident(), Config.PROFILER_INTERVAL_MS / 1000, finish)
+
+    # Registered for this request only, so unprofiled requests skip it entirely
+    @after_this_request
+    def note_response(response):
+        record['status'] = response.status_code
+        response.headers['X-Profile-Id'] = record['id']
+        sampler.stop()
+        return response
+
+    sampler.start()
+
+
+def _fold(stacks):
+    """Keep the MAX_STACKS heaviest stacks; the rest become one '(other stacks)' entry"""
+    if len(stacks) <= MAX_STACKS:
+        return stacks
+    ordered = sorted(stacks.items(), key=lambda item: -item[1])
+    kept = dict(ordered[:MAX_STACKS])
+    kept['(other stacks)'] = sum(count for _, count in ordered[MAX_STACKS:])
+    return kept
+
+
+def save_profile(record):
+    """Write a profile, then drop the oldest ones beyond PROFILE_MAX_COUNT or PROFILE_MAX_MB"""
+    with _store_lock:
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(Config.PROFILE_DIR, f"{record['id']}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(record, f)
+        os.replace(path + '.tmp', path)
+
+        files = sorted((entry for entry in os.scandir(Config.PROFILE_DIR) if entry.name.endswith('.json')),
+                       key=lambda entry: entry.name)
+        total = sum(entry.stat().st_size for entry in files)
+        while files and (len(files) > Config.PROFILE_MAX_COUNT or total > Config.PROFILE_MAX_MB * 1024 * 1024):
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            os.remove(oldest.path)
+
+
+def load_profile(profile_id):
+    """A saved profile, or None if there is no such profile"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(Config.PROFILE_DIR, f'{profile_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles():
+    """Saved profiles without their stacks, newest first"""
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(Config.PROFILE_DIR), reverse=True):
+        if name.endswith('.json'):
+            profile = load_profile(name[:-len('.json')])
+            if profile is not None:
+                profile.pop('stacks', None)
+                profiles.append(profile)
+    return profiles
+
+
+def call_tree(stacks, min_share=0.005):
+    """
+    Nested {name, total, self, children} built from collapsed stacks, children
+    heaviest first. Branches under `min_share` of all samples are merged into
+    one '(smaller calls)' child of their parent.
+    """
+    root = {'name': 'all', 'total': 0, 'self': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['total'] += count
+        node = root
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'name': name, 'total': 0, 'self': 0, 'children': {}})
+            node['total'] += count
+        node['self'] += count
+
+    threshold = root['total'] * min_share
+
+    def finish(node):
+        children = sorted(node['children'].values(), key=lambda child: -child['total'])
+        kept = [finish(child) for child in children if child['total'] >= threshold]
+        small = sum(child['total'] for child in children if child['total'] < threshold)
+        if small:
+            kept.append({'name': '(smaller calls)', 'total': small, 'self': small, 'children': []})
+        node['children'] = kept
+        return node
+    return finish(root)
+
+
+def collapsed_text(stacks):
+    """Collapsed stacks as text, one 'frame;frame;frame count' line each"""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def init_app(app):
+    """Profile requests on demand when PROFILER_ENABLED is on"""
+    if not Config.PROFILER_ENABLED:
+        return
+    app.before_request(_begin_request)
@@ -9,5 +9,7 @@ from .analytics import analytics_bp
 from .profile import profile_bp
 from .search import search_bp
 from .management import management_bp
+from .events import events_bp
+from .monitoring import monitoring_bp
 
-__all__ = ['auth_bp', 'dashboard_bp', 'hardware_bp', 'reports_bp', 'analytics_bp', 'profile_bp', 'search_bp', 'management_bp']
+__all__ = ['auth_bp', 'dashboard_bp', 'hardware_bp', 'reports_bp', 'analytics_bp', 'profile_bp', 'search_bp', 'management_bp', 'events_bp', 'monitoring_bp']
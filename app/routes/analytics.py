@@ -6,57 +6,54 @@ from datetime import datetime, timedelta
 import sqlite3
 from ..models import get_db_connection
 from ..config import Config
+from ..ingest import reads_attendance
+from ..cache import cached, get_cache
+from ..student_stats import get_top_performers
 
 analytics_bp = Blueprint('analytics', __name__)
 
 
+@reads_attendance
+@cached('attendance')
 def get_attendance_stats():
     """Get comprehensive attendance statistics"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get today's attendance
-    today = datetime.now().strftime('%Y-%m-%d')
+    # Today's totals, the past week and role totals come from the daily rollup,
+    # so they cost the same however much history the attendance table holds
+    today = datetime.now().date().isoformat()
     cursor.execute('''
-        SELECT COUNT(*) as today_count,
-               COUNT(DISTINCT reg_no) as unique_students
-        FROM attendance 
-        WHERE DATE(timestamp) = ?
+        SELECT COALESCE(SUM(scans), 0) as today_count,
+               COALESCE(SUM(people), 0) as unique_students
+        FROM attendance_daily 
+        WHERE day = ?
     ''', (today,))
     today_stats = cursor.fetchone()
     
     # Get weekly attendance
     week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
     cursor.execute('''
-        SELECT DATE(timestamp) as date, COUNT(*) as count
-        FROM attendance 
-        WHERE DATE(timestamp) >= ?
-        GROUP BY DATE(timestamp)
+        SELECT day as date, SUM(scans) as count
+        FROM attendance_daily 
+        WHERE day >= ?
+        GROUP BY day
         ORDER BY date
     ''', (week_ago,))
     weekly_data = cursor.fetchall()
     
-    # Get role-wise attendance
+    # Get role-wise attendance (every role, including ones nobody scanned as today)
     cursor.execute('''
-        SELECT u.role, COUNT(a.log_id) as attendance_count
-        FROM users u
-        LEFT JOIN attendance a ON u.reg_no = a.reg_no 
-        AND DATE(a.timestamp) = ?
-        GROUP BY u.role
+        SELECT role, SUM(scans) as attendance_count
+        FROM attendance_daily
+        WHERE day = ?
+        GROUP BY role
     ''', (today,))
-    role_stats = cursor.fetchall()
+    scans_by_role = {row['role']: row['attendance_count'] for row in cursor.fetchall()}
+    cursor.execute('SELECT DISTINCT role FROM users')
+    role_stats = [{'role': row['role'], 'attendance_count': scans_by_role.get(row['role'] or '', 0)}
+                  for row in cursor.fetchall()]
     
-    # Get top performers (highest attendance)
-    cursor.execute('''
-        SELECT u.name, u.reg_no, COUNT(a.log_id) as attendance_count
-        FROM users u
-        LEFT JOIN attendance a ON u.reg_no = a.reg_no
-        WHERE u.role = 'student'
-        GROUP BY u.reg_no, u.name
-        ORDER BY attendance_count DESC
-        LIMIT 10
-    ''')
-    top_performers = cursor.fetchall()
     
     conn.close()
     
@@ -64,23 +61,26 @@ def get_attendance_stats():
         'today_count': today_stats['today_count'] if today_stats else 0,
         'unique_students': today_stats['unique_students'] if today_stats else 0,
         'weekly_data': [dict(row) for row in weekly_data],
-        'role_stats': [dict(row) for row in role_stats],
-        'top_performers': [dict(row) for row in top_performers]
+        'role_stats': role_stats,
+        'top_performers': get_top_performers(10)
     }
 
 
+@reads_attendance
+@cached('attendance')
 def get_monthly_trends():
     """Get monthly attendance trends for the past 6 months"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     six_months_ago = (datetime.now() - timedelta(days=180)).strftime('%Y-%m-%d')
+    # One row per person per day: the window bounds the work, not the history
     cursor.execute('''
-        SELECT strftime('%Y-%m', timestamp) as month,
-               COUNT(*) as count,
+        SELECT substr(day, 1, 7) as month,
+               SUM(scans) as count,
                COUNT(DISTINCT reg_no) as unique_students
-        FROM attendance 
-        WHERE DATE(timestamp) >= ?
+        FROM attendance_daily_people 
+        WHERE day >= ?
         GROUP BY month
         ORDER BY month
     ''', (six_months_ago,))
@@ -133,3 +133,14 @@ def api_daily_stats():
         return jsonify(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@analytics_bp.route('/api/cache-stats')
+def api_cache_stats():
+    """Hit/miss counters of the aggregate result cache (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    stats = get_cache().stats()
+    stats['enabled'] = Config.CACHE_ENABLED
+    return jsonify(stats)
@@ -7,6 +7,7 @@ from ..models import (
     get_total_users, get_today_attendance_count
 )
 from ..config import HardwareState
+from ..wol import get_latest_wake_message
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -21,7 +22,7 @@ def index():
                          today_attendance=get_today_attendance_count(),
                          recent_logs=recent_logs,
                          system_status="Online",
-                         current_mode=HardwareState.mode)
+                         current_mode=HardwareState.get_mode()[0])
 
 
 @auth_bp.route('/home')
@@ -36,7 +37,7 @@ def home():
                          recent_logs=get_recent_attendance(10),
                          total_users=get_total_users(),
                          today_attendance=get_today_attendance_count(),
-                         wake_msg=session.pop('wake_msg', None))
+                         wake_msg=get_latest_wake_message())
 
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
@@ -1,7 +1,14 @@
 """
 Dashboard routes - user management, admin panel
 """
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import (
+    Blueprint, render_template, request, jsonify, session, redirect, url_for, flash,
+    Response, stream_with_context
+)
+import json
+import ipaddress
+from wake_on_lan import iter_live_hosts, resolve_devices
+from ..config import Config, HardwareState, DeviceBusyError, DEFAULT_DEVICE
 from ..models import (
     add_user_enhanced, get_all_users, get_next_finger_id, delete_user, 
     update_user_mac, clear_user_fingerprint, get_all_departments, get_db_connection
@@ -19,12 +26,18 @@ def dashboard():
     if session['role'] not in ['admin', 'hod']:
         return redirect(url_for('auth.index'))
     
+    # Enroll on the chosen scanner, else the only/first one that has reported in
+    devices = HardwareState.devices()
+    device_id = request.args.get('device_id') or (devices[0].device_id if devices else DEFAULT_DEVICE)
+    
     return render_template('dashboard.html', 
                          users=get_all_users(),
                          next_finger_id=get_next_finger_id(),
                          departments=get_all_departments(),
                          role=session['role'],
-                         just_enrolled_id=session.pop('just_enrolled_id', None))
+                         just_enrolled_id=session.pop('just_enrolled_id', None),
+                         devices=devices,
+                         device_id=device_id)
 
 
 @dashboard_bp.route('/add_user', methods=['POST'])
@@ -102,13 +115,17 @@ def add_student_enhanced_route():
             
             # Immediate Enrollment Logic
             if enroll_now:
-                from ..config import HardwareState
-                HardwareState.set_enroll_mode(next_finger_id)
+                device_id = request.form.get('device_id') or DEFAULT_DEVICE
+                try:
+                    HardwareState.set_enroll_mode(next_finger_id, device_id)
+                except DeviceBusyError as e:
+                    return jsonify({'success': True, 'user_id': user_id, 'enroll_error': str(e)})
                 return jsonify({
                     'success': True, 
                     'user_id': user_id, 
                     'enroll_now': True, 
-                    'finger_id': next_finger_id
+                    'finger_id': next_finger_id,
+                    'device_id': device_id
                 })
                 
             return jsonify({'success': True, 'user_id': user_id})
@@ -212,3 +229,27 @@ def api_get_batches_by_department(department):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@dashboard_bp.route('/api/network-scan')
+def api_network_scan():
+    """Stream live hosts on the LAN as they answer, then their MAC addresses (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    cidr = request.args.get('cidr') or Config.NETWORK_SCAN_CIDR
+    if cidr:
+        try:
+            network = ipaddress.ip_network(cidr, strict=False)
+        except ValueError:
+            return jsonify({'error': f'Invalid CIDR: {cidr}'}), 400
+        if network.num_addresses > 4096:
+            return jsonify({'error': 'Network too large to scan (max /20)'}), 400
+    
+    def generate():
+        alive = []
+        for ip in iter_live_hosts(cidr, Config.NETWORK_SCAN_CONCURRENCY, Config.NETWORK_SCAN_TIMEOUT_S):
+            alive.append(ip)
+            yield json.dumps({'ip': ip, 'status': 'online'}) + '\n'
+        yield json.dumps({'done': True, 'devices': resolve_devices(alive)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,54 @@
+"""
+Event stream routes - server-sent events for live pages
+"""
+from flask import Blueprint, request, jsonify, session, Response
+import json
+from ..config import Config
+from ..events import get_bus, TOPICS, PUBLIC_TOPICS
+
+events_bp = Blueprint('events', __name__)
+
+
+@events_bp.route('/events')
+def stream():
+    """
+    Server-sent event stream. ?topics=attendance,enrollment,wake picks what to
+    receive; only the attendance topic is available without logging in.
+    """
+    topics = {t for t in request.args.get('topics', 'attendance').split(',') if t}
+    if not topics or not topics <= TOPICS:
+        return jsonify({'error': f"Unknown topic; choose from {', '.join(sorted(TOPICS))}"}), 400
+    if not topics <= PUBLIC_TOPICS and 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    bus = get_bus()
+
+    def generate():
+        # Subscribing here rather than in the view means a response that is
+        # never iterated never holds a subscription
+        sub = bus.subscribe(topics, last_event_id)
+        if sub is None:
+            # Back off before reconnecting; the stream ends after this
+            yield 'retry: 10000\n\n'
+            yield f"event: error\ndata: {json.dumps({'error': 'Too many open event streams'})}\n\n"
+            return
+        try:
+            # Reconnect quickly if the stream is dropped for falling behind
+            yield 'retry: 2000\n\n'
+            if sub.resync:
+                yield 'event: resync\ndata: {}\n\n'
+            while not sub.closed:
+                event = sub.get(Config.EVENTS_HEARTBEAT_S)
+                if event is None:
+                    # Keep-alive comment; also how a vanished client is noticed
+                    yield ': ping\n\n'
+                    continue
+                yield f"id: {event['id']}\nevent: {event['topic']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            bus.unsubscribe(sub)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,11 +1,14 @@
 """
 Hardware API routes - ESP32 communication, fingerprint enrollment
 """
-from flask import Blueprint, jsonify, request, redirect, url_for, session
+from flask import Blueprint, jsonify, request, redirect, url_for, session, flash, Response
 from datetime import datetime
-from wakeonlan import send_magic_packet
 from ..models import get_user_by_finger_id, log_attendance
-from ..config import HardwareState
+from ..config import Config, HardwareState, DeviceBusyError, DEFAULT_DEVICE
+from ..wol import (
+    get_dispatcher, get_recent_wake_events, get_wake_targets,
+    start_bulk_wake, get_bulk_wake_job, BULK_WAKE_OPTIONS, parse_bulk_option
+)
 
 hardware_bp = Blueprint('hardware', __name__)
 
@@ -25,8 +28,46 @@ ENROLLMENT_MESSAGES = {
 
 @hardware_bp.route('/get_mode', methods=['GET'])
 def get_mode():
-    """ESP32 polls this to know what mode to operate in"""
-    return jsonify(HardwareState.mode)
+    """
+    ESP32 polls this to know what mode to operate in.
+    Old firmware polls it plainly. Newer firmware sends the last ETag in
+    If-None-Match plus ?wait=<seconds>: the request is held until the mode
+    changes or the wait expires, and an unchanged mode costs a bodiless 304.
+    """
+    device_id = get_device_id()
+    HardwareState.touch(device_id)
+    mode, version = HardwareState.get_mode(device_id)
+    wait = min(request.args.get('wait', 0, type=float), Config.MODE_LONGPOLL_MAX_S)
+    
+    if wait > 0 and request.if_none_match.contains(_mode_etag(version)):
+        mode, version = HardwareState.wait_for_mode_change(version, wait, device_id)
+    
+    etag = _mode_etag(version)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(mode)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _mode_etag(version):
+    """ETag for a mode version - includes the store's instance id so a restart never matches an old tag"""
+    return f"{HardwareState.store().instance_id}-{version}"
+
+
+def get_device_id():
+    """
+    Scanner identity from the device_id query parameter, the X-Device-ID header
+    or a device_id JSON field; firmware that sends none is the default device.
+    """
+    device_id = (request.args.get('device_id')
+                 or request.headers.get('X-Device-ID')
+                 or (request.get_json(silent=True) or {}).get('device_id'))
+    if not device_id:
+        return DEFAULT_DEVICE
+    return str(device_id).strip()[:64] or DEFAULT_DEVICE
 
 
 @hardware_bp.route('/activate_enroll/<int:finger_id>', methods=['GET'])
@@ -35,19 +76,24 @@ def activate_enroll(finger_id):
     if 'username' not in session or session['role'] != 'admin':
         return redirect(url_for('auth.login'))
     
-    HardwareState.set_enroll_mode(finger_id)
+    device_id = get_device_id()
+    try:
+        HardwareState.set_enroll_mode(finger_id, device_id)
+    except DeviceBusyError as e:
+        flash(f'{e}. Finish or cancel it first.', 'error')
     
     # Clear any previous enrollment notification
     session.pop('just_enrolled_id', None)
     
-    return redirect(url_for('dashboard.dashboard'))
+    return redirect(url_for('dashboard.dashboard', device_id=device_id))
 
 
 @hardware_bp.route('/cancel_enroll', methods=['GET'])
 def cancel_enroll():
     """Cancel enrollment and return to attendance mode"""
-    HardwareState.set_attendance_mode()
-    return redirect(url_for('dashboard.dashboard'))
+    device_id = get_device_id()
+    HardwareState.set_attendance_mode(device_id)
+    return redirect(url_for('dashboard.dashboard', device_id=device_id))
 
 
 @hardware_bp.route('/enrollment_status', methods=['POST'])
@@ -60,9 +106,11 @@ def enrollment_status():
     if not finger_id or not status:
         return jsonify({"status": "error", "message": "Missing data"}), 400
     
-    # Update global status
+    # Update this device's status (ignored if its enrollment was cancelled meanwhile)
+    device_id = get_device_id()
+    HardwareState.touch(device_id)
     message = ENROLLMENT_MESSAGES.get(status, status)
-    HardwareState.update_enrollment(status, finger_id, message)
+    HardwareState.update_enrollment(status, finger_id, message, device_id)
     
     # Auto-reset to attendance mode when enrollment completes
     if status in ["success", "failed"]:
@@ -74,15 +122,16 @@ def enrollment_status():
                 print(f"[FINGERPRINT ENROLLED] User: {user['name']} (ID: {user['id']}), Finger ID: {finger_id}, Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             else:
                 print(f"[FINGERPRINT ENROLLED] Finger ID: {finger_id} assigned to new user, Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        HardwareState.set_attendance_mode()
+        HardwareState.set_attendance_mode(device_id, finger_id)
     
     return jsonify({"status": "ok"})
 
 
 @hardware_bp.route('/get_enrollment_status', methods=['GET'])
 def get_enrollment_status():
-    """Get current enrollment status for website polling"""
-    return jsonify(HardwareState.enrollment)
+    """Get current enrollment status of a device for the website"""
+    device_id = get_device_id()
+    return jsonify(dict(HardwareState.get_enrollment(device_id), device_id=device_id))
 
 
 @hardware_bp.route('/verify', methods=['POST'])
@@ -94,6 +143,8 @@ def verify():
     if not finger_id:
         return jsonify({"status": "error", "message": "No finger ID provided"})
     
+    HardwareState.touch(get_device_id())
+    
     # Find user by finger ID
     user = get_user_by_finger_id(finger_id)
     
@@ -103,19 +154,66 @@ def verify():
     # Log attendance
     log_attendance(user['name'], user['reg_no'])
     
-    # Wake-on-LAN if MAC address exists
+    # Wake-on-LAN if MAC address exists - sent in the background, outcome lands in wake_events
     wake_message = None
     if user['mac_address']:
-        try:
-            send_magic_packet(user['mac_address'])
-            wake_message = f"🚀 Wake Signal Sent to {user['name']}'s PC ({user['mac_address']})"
-            session['wake_msg'] = wake_message
-        except Exception as e:
-            wake_message = f"⚠️ Failed to send wake signal: {str(e)}"
-            session['wake_msg'] = wake_message
+        get_dispatcher().submit(user['mac_address'], user['name'], user['reg_no'])
+        wake_message = f"🚀 Wake Signal Queued for {user['name']}'s PC ({user['mac_address']})"
     
     return jsonify({
         "status": "success", 
         "message": f"Welcome {user['name']}!",
         "wake_message": wake_message
     })
+
+
+@hardware_bp.route('/api/wake-events', methods=['GET'])
+def api_wake_events():
+    """Recent Wake-on-LAN outcomes for the dashboards"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    reg_no = request.args.get('reg_no')
+    return jsonify(get_recent_wake_events(limit, reg_no))
+
+
+@hardware_bp.route('/api/wake/bulk', methods=['POST'])
+def api_bulk_wake():
+    """Wake every PC in a batch, a department, or the whole lab (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    batch_year = data.get('batch_year')
+    department = data.get('department')
+    if not (batch_year or department or data.get('scope') == 'lab'):
+        return jsonify({'error': 'Give a batch_year, a department or scope "lab"'}), 400
+    
+    options = {}
+    for key in BULK_WAKE_OPTIONS:
+        if data.get(key) is None:
+            continue
+        try:
+            options[key] = parse_bulk_option(key, data[key])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    targets = get_wake_targets(batch_year, department)
+    if not targets:
+        return jsonify({'error': 'No machines with a MAC address match'}), 404
+    
+    job = start_bulk_wake(targets, **options)
+    return jsonify(job.to_dict()), 202
+
+
+@hardware_bp.route('/api/wake/bulk/<int:job_id>', methods=['GET'])
+def api_bulk_wake_status(job_id):
+    """Per-MAC progress of a bulk wake"""
+    if 'username' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = get_bulk_wake_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
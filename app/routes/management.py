@@ -8,6 +8,8 @@ from ..models import (
     get_users_by_department, get_users_by_batch, add_user_enhanced, 
     get_db_connection, get_all_users
 )
+from ..stats import get_department_stats_all, get_batch_stats_all
+from ..user_cache import invalidate_user_cache
 
 management_bp = Blueprint('management', __name__)
 
@@ -26,10 +28,7 @@ def department_management():
         return redirect(url_for('auth.index'))
     
     departments = get_all_departments()
-    department_stats = {}
-    
-    for dept in departments:
-        department_stats[dept['name']] = get_department_stats(dept['name'])
+    department_stats = get_department_stats_all()
     
     return render_template('department_management.html', 
                          departments=departments,
@@ -273,6 +272,7 @@ def edit_user(user_id):
             
             cursor.execute(query, tuple(params))
             conn.commit()
+            invalidate_user_cache()
             flash(f'User {name} updated!', 'success')
             return redirect(url_for('dashboard.dashboard'))
         except Exception as e:
@@ -299,6 +299,20 @@ def api_get_users_by_department(department):
     return jsonify([dict(u) for u in get_users_by_department(department)])
 
 
+@management_bp.route('/api/department-stats')
+def api_all_department_stats():
+    """Stats for every department in one response"""
+    if 'username' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(get_department_stats_all())
+
+
+@management_bp.route('/api/batch-stats')
+def api_batch_stats():
+    """Stats for every batch year in one response"""
+    if 'username' not in session: return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(get_batch_stats_all())
+
+
 @management_bp.route('/api/department-stats/<department_name>')
 def api_department_stats(department_name):
     if 'username' not in session: return jsonify({'error': 'Unauthorized'}), 401
@@ -0,0 +1,104 @@
+"""
+Monitoring routes - request metrics for admins and scrapers, saved request profiles
+"""
+from flask import Blueprint, render_template, request, jsonify, session, Response, redirect, url_for, abort
+import hmac
+from ..config import Config
+from ..metrics import get_metrics
+from ..request_profiler import list_profiles, load_profile, call_tree, collapsed_text
+from ..cache import get_cache
+from .. import ingest
+
+monitoring_bp = Blueprint('monitoring', __name__)
+
+
+def _authorized():
+    """An admin session, or the METRICS_TOKEN bearer token when one is configured"""
+    if session.get('role') == 'admin':
+        return True
+    token = request.headers.get('Authorization', '')
+    return bool(Config.METRICS_TOKEN) and hmac.compare_digest(token, f'Bearer {Config.METRICS_TOKEN}')
+
+
+def _process_gauges():
+    """Result cache counters, write-behind queue depth and dropped scans"""
+    cache = get_cache().stats()
+    writer = ingest._writer
+    return {
+        'cache_hits': cache['hits'],
+        'cache_misses': cache['misses'],
+        'cache_entries': cache['entries'],
+        'ingest_pending': writer.pending() if writer is not None else 0,
+        'ingest_dropped': writer.dropped() if writer is not None else 0,
+    }
+
+
+@monitoring_bp.route('/metrics')
+def metrics():
+    """
+    Request metrics (Admin only). Prometheus text format by default;
+    ?format=json or an Accept: application/json header gives JSON.
+    """
+    if not _authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled (METRICS_ENABLED)'}), 404
+
+    gauges = _process_gauges()
+    wants_json = (request.args.get('format') == 'json'
+                  or request.accept_mimetypes.best_match(['text/plain', 'application/json']) == 'application/json')
+    if wants_json:
+        return jsonify(dict(get_metrics().snapshot(), **gauges))
+
+    lines = [get_metrics().render_prometheus().rstrip('\n')]
+    for name, kind, text in (('cache_hits', 'counter', 'Result cache hits.'),
+                             ('cache_misses', 'counter', 'Result cache misses.'),
+                             ('cache_entries', 'gauge', 'Entries in the result cache.'),
+                             ('ingest_pending', 'gauge', 'Scans queued for the attendance writer.'),
+                             ('ingest_dropped', 'counter', 'Scans the attendance writer could not insert.')):
+        metric = f'attendance_{name}_total' if kind == 'counter' else f'attendance_{name}'
+        lines += [f'# HELP {metric} {text}', f'# TYPE {metric} {kind}', f'{metric} {gauges[name]}']
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@monitoring_bp.route('/profiles')
+def profiles():
+    """Recently saved request profiles (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    return render_template('profiles.html',
+                         profiles=list_profiles(),
+                         enabled=Config.PROFILER_ENABLED,
+                         sample_rate=Config.PROFILER_SAMPLE_RATE,
+                         max_count=Config.PROFILE_MAX_COUNT,
+                         role=session['role'])
+
+
+@monitoring_bp.route('/profiles/<profile_id>')
+def profile_detail(profile_id):
+    """One profile drawn as a call tree (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    profile = load_profile(profile_id)
+    if profile is None:
+        abort(404)
+    return render_template('profile_detail.html',
+                         profile=profile,
+                         tree=call_tree(profile['stacks']),
+                         role=session['role'])
+
+
+@monitoring_bp.route('/profiles/<profile_id>/collapsed.txt')
+def profile_collapsed(profile_id):
+    """A profile's collapsed stacks, for flame graph tools (Admin only)"""
+    if 'username' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    profile = load_profile(profile_id)
+    if profile is None:
+        abort(404)
+    response = Response(collapsed_text(profile['stacks']), mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename=profile-{profile_id}.txt'
+    return response
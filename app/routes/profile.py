@@ -5,10 +5,14 @@ from flask import Blueprint, render_template, request, jsonify, session, redirec
 from datetime import datetime, timedelta
 from ..models import get_db_connection
 from ..config import Config
+from ..ingest import reads_attendance
+from ..user_search import search_users
+from ..student_stats import get_student_stats
 
 profile_bp = Blueprint('profile', __name__)
 
 
+@reads_attendance
 def get_student_details(reg_no):
     """Get detailed student information"""
     conn = get_db_connection()
@@ -36,27 +40,28 @@ def get_student_details(reg_no):
     ''', (reg_no,))
     attendance_history = cursor.fetchall()
     
-    # Get attendance statistics
+    # Running totals come from student_stats; the recent windows read only
+    # the last 30 days of this student's scans off the (reg_no, timestamp) index
+    stats = get_student_stats(reg_no)
     cursor.execute('''
         SELECT 
-            COUNT(*) as total_sessions,
-            COUNT(CASE WHEN DATE(timestamp) = DATE('now') THEN 1 END) as today_sessions,
-            COUNT(CASE WHEN DATE(timestamp) >= DATE('now', '-7 days') THEN 1 END) as weekly_sessions,
-            COUNT(CASE WHEN DATE(timestamp) >= DATE('now', '-30 days') THEN 1 END) as monthly_sessions
+            COUNT(CASE WHEN day = DATE('now') THEN 1 END) as today_sessions,
+            COUNT(CASE WHEN day >= DATE('now', '-7 days') THEN 1 END) as weekly_sessions,
+            COUNT(*) as monthly_sessions
         FROM attendance 
-        WHERE reg_no = ?
+        WHERE reg_no = ? AND timestamp >= DATE('now', '-30 days')
     ''', (reg_no,))
-    stats = cursor.fetchone()
+    stats.update(dict(cursor.fetchone()))
     
     # Get monthly attendance pattern
     cursor.execute('''
         SELECT 
             strftime('%Y-%m', timestamp) as month,
             COUNT(*) as count,
-            COUNT(DISTINCT DATE(timestamp)) as days_present
+            COUNT(DISTINCT day) as days_present
         FROM attendance 
         WHERE reg_no = ?
-        AND DATE(timestamp) >= DATE('now', '-6 months')
+        AND timestamp >= DATE('now', '-6 months')
         GROUP BY strftime('%Y-%m', timestamp)
         ORDER BY month DESC
     ''', (reg_no,))
@@ -67,7 +72,7 @@ def get_student_details(reg_no):
     return {
         'student': dict(student),
         'attendance_history': [dict(row) for row in attendance_history],
-        'stats': dict(stats),
+        'stats': stats,
         'monthly_pattern': [dict(row) for row in monthly_pattern]
     }
 
@@ -102,22 +107,7 @@ def search_students():
     if len(query) < 2:
         return jsonify([])
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT reg_no, name, role
-        FROM users 
-        WHERE (name LIKE ? OR reg_no LIKE ?)
-        AND role = 'student'
-        ORDER BY name
-        LIMIT 10
-    ''', (f'%{query}%', f'%{query}%'))
-    
-    students = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(students)
+    return jsonify(search_users(query, role='student', limit=10))
 
 
 @profile_bp.route('/student-directory')
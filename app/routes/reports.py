@@ -1,56 +1,123 @@
 """
 Reports routes - attendance reports, exports
 """
-from flask import Blueprint, render_template, redirect, url_for, session, send_file
+from flask import Blueprint, render_template, redirect, url_for, session, request, jsonify, Response, stream_with_context
 from datetime import datetime
 import csv
-import io
-from ..models import get_all_attendance, delete_attendance
+from ..config import Config
+from ..models import (
+    get_attendance_page, iter_attendance, day_bounds, delete_attendance,
+    get_all_departments, get_batch_years
+)
+from ..pagination import encode_cursor, decode_cursor
 
 reports_bp = Blueprint('reports', __name__)
 
 
+REPORT_FILTERS = ('date_from', 'date_to', 'department', 'batch_year', 'name')
+
+
+def report_filters(args):
+    """Report filters from a query string, unset ones as None; ValueError for a malformed date"""
+    filters = {key: (args.get(key) or '').strip() or None for key in REPORT_FILTERS}
+    for key in ('date_from', 'date_to'):
+        if filters[key]:
+            day_bounds(filters[key])
+    return filters
+
+
+def report_page(args):
+    """(filters, logs, next_cursor) for the report page a query string asks for"""
+    filters = report_filters(args)
+    after = decode_cursor(args['cursor'])[:2] if args.get('cursor') else None
+    logs, more = get_attendance_page(after, Config.REPORT_PAGE_SIZE, **filters)
+    next_cursor = encode_cursor(logs[-1], 'next') if more else None
+    return filters, logs, next_cursor
+
+
 @reports_bp.route('/attendance_report')
 def attendance_report():
-    """View all attendance logs"""
+    """View attendance logs one page at a time, filtered server-side"""
     if 'username' not in session:
         return redirect(url_for('auth.login'))
     
-    logs = get_all_attendance()
-    return render_template('attendance_report.html', logs=logs, role=session['role'])
+    try:
+        filters, logs, next_cursor = report_page(request.args)
+    except ValueError:
+        return "Invalid date or page", 400
+    
+    active = {key: value for key, value in filters.items() if value}
+    return render_template('attendance_report.html',
+                         logs=logs,
+                         next_cursor=next_cursor,
+                         filters=filters,
+                         active_filters=active,
+                         departments=get_all_departments(),
+                         batch_years=get_batch_years(),
+                         role=session['role'])
+
+
+@reports_bp.route('/api/attendance-report')
+def api_attendance_report():
+    """Next page of the attendance report as JSON, for loading more rows in place"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        _, logs, next_cursor = report_page(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'logs': [dict(log) for log in logs], 'next_cursor': next_cursor})
+
+
+class _LineBuffer:
+    """File-like sink for csv.writer that hands back what was written since the last take()"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+
+    def take(self):
+        text, self._parts = ''.join(self._parts), []
+        return text
 
 
 @reports_bp.route('/download_excel')
 def download_excel():
-    """Download attendance logs as CSV"""
+    """Download attendance logs as CSV, streamed as rows are read"""
     if 'username' not in session:
         return redirect(url_for('auth.login'))
     
-    logs = get_all_attendance()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Name', 'Register No', 'Timestamp', 'Status'])
-    
-    # Write data
-    for log in logs:
-        writer.writerow([log['name'], log['reg_no'], log['timestamp'], log['status']])
+    try:
+        filters = report_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
     
-    # Convert to bytes
-    output.seek(0)
-    bytes_output = io.BytesIO()
-    bytes_output.write(output.getvalue().encode('utf-8'))
-    bytes_output.seek(0)
+    def generate():
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        writer.writerow(['Name', 'Register No', 'Timestamp', 'Status'])
+        # The header goes out before the query runs, so the download starts at once
+        yield buffer.take().encode('utf-8')
+        
+        pending = 0
+        for log in iter_attendance(**filters):
+            writer.writerow([log['name'], log['reg_no'], log['timestamp'], log['status']])
+            pending += 1
+            if pending >= Config.EXPORT_CHUNK_ROWS:
+                yield buffer.take().encode('utf-8')
+                pending = 0
+        if pending:
+            yield buffer.take().encode('utf-8')
     
-    return send_file(
-        bytes_output,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'attendance_report_{datetime.now().strftime("%Y%m%d")}.csv'
-    )
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers.set('Content-Disposition', 'attachment',
+                         filename=f'attendance_report_{datetime.now().strftime("%Y%m%d")}.csv')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @reports_bp.route('/delete_attendance/<int:log_id>')
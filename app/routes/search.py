@@ -1,13 +1,98 @@
 """
 Advanced search and filtering routes
 """
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file
 from datetime import datetime, timedelta
-from ..models import get_db_connection
+from ..config import Config
+from ..models import get_db_connection, day_bounds, people_filter
+from ..pagination import encode_cursor, decode_cursor
+from ..db import iter_rows
+from ..export import write_xlsx, XLSX_MIMETYPE
+from ..ingest import reads_attendance
 
 search_bp = Blueprint('search', __name__)
 
 
+def check_dates(args):
+    """Raise ValueError naming the filter if date_from or date_to is not a YYYY-MM-DD date"""
+    for key in ('date_from', 'date_to'):
+        if args.get(key):
+            try:
+                day_bounds(args[key])
+            except ValueError:
+                raise ValueError(f'{key} must be a date (YYYY-MM-DD)') from None
+
+
+def search_filters(args):
+    """WHERE clauses and parameters for the search filters in a request's query string"""
+    clauses = ['1=1']
+    params = []
+    
+    people, people_params = people_filter(role=args.get('role'), name=args.get('name'), reg_no=args.get('reg_no'))
+    if people:
+        clauses.append(people)
+        params.extend(people_params)
+    
+    if args.get('status'):
+        clauses.append('a.status = ?')
+        params.append(args['status'])
+    
+    if args.get('date_from'):
+        clauses.append('a.timestamp >= ?')
+        params.append(day_bounds(args['date_from'])[0])
+    
+    if args.get('date_to'):
+        clauses.append('a.timestamp < ?')
+        params.append(day_bounds(args['date_to'])[1])
+    
+    return ' AND '.join(clauses), params
+
+
+def search_query(columns, args):
+    """SELECT `columns` over the attendance search, filtered by args; callers add ORDER BY/LIMIT"""
+    where, params = search_filters(args)
+    query = f'''
+        SELECT {columns}
+        FROM attendance a
+        JOIN users u ON a.reg_no = u.reg_no
+        WHERE {where}
+    '''
+    return query, params
+
+
+def count_results(conn, args, exact=False):
+    """
+    (count, kind) for a search. Unless exact is asked for, counting stops at
+    SEARCH_COUNT_CAP matches; past that the daily rollup gives an 'estimate'
+    when only date and role filters are set, otherwise the cap is returned as
+    'at_least'.
+    """
+    query, params = search_query('1', args)
+    if exact:
+        return conn.execute(f'SELECT COUNT(*) FROM ({query})', params).fetchone()[0], 'exact'
+    
+    cap = Config.SEARCH_COUNT_CAP
+    count = conn.execute(f'SELECT COUNT(*) FROM ({query} LIMIT ?)', params + [cap + 1]).fetchone()[0]
+    if count <= cap:
+        return count, 'exact'
+    
+    if any(args.get(key) for key in ('name', 'reg_no', 'status')):
+        return cap, 'at_least'
+    clauses, params = ['1=1'], []
+    if args.get('date_from'):
+        clauses.append('day >= ?')
+        params.append(day_bounds(args['date_from'])[0])
+    if args.get('date_to'):
+        clauses.append('day <= ?')
+        params.append(day_bounds(args['date_to'])[0])
+    if args.get('role'):
+        clauses.append('role = ?')
+        params.append(args['role'])
+    estimate = conn.execute(f'SELECT COALESCE(SUM(scans), 0) FROM attendance_daily WHERE {" AND ".join(clauses)}',
+                            params).fetchone()[0]
+    return max(estimate, cap + 1), 'estimate'
+
+
 @search_bp.route('/advanced-search')
 def advanced_search():
     """Advanced search page with filters"""
@@ -21,163 +106,97 @@ def advanced_search():
 
 
 @search_bp.route('/api/search-attendance')
+@reads_attendance
 def api_search_attendance():
     """API endpoint for advanced attendance search"""
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        # Get search parameters
-        name_query = request.args.get('name', '')
-        reg_no = request.args.get('reg_no', '')
-        role_filter = request.args.get('role', '')
-        status_filter = request.args.get('status', '')
-        date_from = request.args.get('date_from', '')
-        date_to = request.args.get('date_to', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), Config.SEARCH_MAX_PER_PAGE)
+        try:
+            check_dates(request.args)
+            position = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Build query with filters
-        query = '''
-            SELECT a.log_id, a.name, a.reg_no, a.timestamp, a.status, u.role
-            FROM attendance a
-            JOIN users u ON a.reg_no = u.reg_no
-            WHERE 1=1
-        '''
-        params = []
-        
-        if name_query:
-            query += ' AND a.name LIKE ?'
-            params.append(f'%{name_query}%')
-        
-        if reg_no:
-            query += ' AND a.reg_no LIKE ?'
-            params.append(f'%{reg_no}%')
-        
-        if role_filter:
-            query += ' AND u.role = ?'
-            params.append(role_filter)
-        
-        if status_filter:
-            query += ' AND a.status = ?'
-            params.append(status_filter)
-        
-        if date_from:
-            query += ' AND DATE(a.timestamp) >= ?'
-            params.append(date_from)
-        
-        if date_to:
-            query += ' AND DATE(a.timestamp) <= ?'
-            params.append(date_to)
-        
-        # Count total results
-        count_query = query.replace('SELECT a.log_id, a.name, a.reg_no, a.timestamp, a.status, u.role', 'SELECT COUNT(*)')
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()[0]
-        
-        # Add pagination
-        query += ' ORDER BY a.timestamp DESC LIMIT ? OFFSET ?'
-        params.extend([per_page, (page - 1) * per_page])
+        query, params = search_query('a.log_id, a.name, a.reg_no, a.timestamp, a.status, u.role', request.args)
+        
+        # Keyset pagination: seek past the cursor row on the (timestamp, log_id)
+        # index instead of skipping rows with OFFSET, so every page costs the same
+        backward = position is not None and position[2] == 'prev'
+        if position:
+            query += ' AND (a.timestamp, a.log_id) > (?, ?)' if backward else ' AND (a.timestamp, a.log_id) < (?, ?)'
+            params.extend(position[:2])
+        order = 'ASC' if backward else 'DESC'
+        query += f' ORDER BY a.timestamp {order}, a.log_id {order} LIMIT ?'
+        params.append(per_page + 1)
+        
+        results = [dict(row) for row in conn.execute(query, params).fetchall()]
+        more = len(results) > per_page
+        results = results[:per_page]
+        if backward:
+            results.reverse()
+        has_prev, has_next = (more, True) if backward else (position is not None, more)
+        
+        response = {
+            'results': results,
+            'per_page': per_page,
+            'next_cursor': encode_cursor(results[-1], 'next') if has_next and results else None,
+            'prev_cursor': encode_cursor(results[0], 'prev') if has_prev and results else None,
+        }
         
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
+        # The total only changes with the filters, so it is counted for the first page
+        # (or on request) rather than on every page turn
+        if position is None or request.args.get('count') == 'exact':
+            response['total_count'], response['total_kind'] = count_results(
+                conn, request.args, exact=request.args.get('count') == 'exact')
         
         conn.close()
-        
-        return jsonify({
-            'results': results,
-            'total_count': total_count,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total_count + per_page - 1) // per_page
-        })
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Export columns: (header, width)
+EXPORT_COLUMNS = [
+    ('Name', 28),
+    ('Register Number', 18),
+    ('Role', 10),
+    ('Timestamp', 20),
+    ('Status', 10),
+]
+
+
 @search_bp.route('/api/export-search')
+@reads_attendance
 def api_export_search():
     """Export search results to Excel"""
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        import pandas as pd
-        from io import BytesIO
-        import flask
-        
-        # Get same search parameters
-        name_query = request.args.get('name', '')
-        reg_no = request.args.get('reg_no', '')
-        role_filter = request.args.get('role', '')
-        status_filter = request.args.get('status', '')
-        date_from = request.args.get('date_from', '')
-        date_to = request.args.get('date_to', '')
+        check_dates(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        query, params = search_query('a.name, a.reg_no, u.role, a.timestamp, a.status', request.args)
         
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Build query (same as search but without pagination)
-        query = '''
-            SELECT a.name as "Name", a.reg_no as "Register Number", 
-                   u.role as "Role", a.timestamp as "Timestamp", a.status as "Status"
-            FROM attendance a
-            JOIN users u ON a.reg_no = u.reg_no
-            WHERE 1=1
-        '''
-        params = []
-        
-        if name_query:
-            query += ' AND a.name LIKE ?'
-            params.append(f'%{name_query}%')
-        
-        if reg_no:
-            query += ' AND a.reg_no LIKE ?'
-            params.append(f'%{reg_no}%')
-        
-        if role_filter:
-            query += ' AND u.role = ?'
-            params.append(role_filter)
-        
-        if status_filter:
-            query += ' AND a.status = ?'
-            params.append(status_filter)
-        
-        if date_from:
-            query += ' AND DATE(a.timestamp) >= ?'
-            params.append(date_from)
-        
-        if date_to:
-            query += ' AND DATE(a.timestamp) <= ?'
-            params.append(date_to)
-        
-        query += ' ORDER BY a.timestamp DESC'
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        cursor = conn.execute(query + ' ORDER BY a.timestamp DESC, a.log_id DESC', params)
+        output = write_xlsx(iter_rows(cursor), EXPORT_COLUMNS, 'Attendance Search Results')
         conn.close()
         
-        # Create DataFrame
-        df = pd.DataFrame([dict(row) for row in results])
-        
-        # Create Excel file
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Attendance Search Results', index=False)
-        
-        output.seek(0)
-        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'attendance_search_{timestamp}.xlsx'
         
-        return flask.send_file(
+        return send_file(
             output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
             download_name=filename
         )
@@ -0,0 +1,144 @@
+"""
+Per-request SQL profiler
+
+With SQL_PROFILER on, each request gets a RequestProfile that its pooled
+connection feeds through db.TimedCursor: every statement, its parameters,
+and the time spent executing it and fetching its rows. When the response
+is ready, the statements are grouped by shape, that is the SQL with
+literals, whitespace and IN lists normalized. Then:
+  - the response carries a summary in Server-Timing and X-SQL-Profile
+    headers, plus an X-SQL-Repeated header for each shape run at least
+    SQL_PROFILER_REPEAT times (the N+1 pattern: one query per row of an
+    earlier result)
+  - repeated shapes are logged with the route
+  - statements slower than SQL_SLOW_MS are logged with their EXPLAIN QUERY PLAN
+
+It is opt-in because every statement is recorded and normalized. Statements
+run while a streamed response body is being generated come after the
+summary and are not included.
+"""
+import functools
+import re
+import sqlite3
+from flask import g, request
+from .config import Config
+
+# Statements kept per request; later ones still count towards the totals
+MAX_STATEMENTS = 10000
+# Shapes listed in X-SQL-Repeated, and how much of each is shown
+REPEATED_HEADERS = 3
+SHAPE_HEADER_CHARS = 200
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql):
+    """The shape of a statement: literals become ?, IN lists of any length match, whitespace collapses"""
+    shape = _NUMBER.sub('?', _STRING.sub('?', sql))
+    shape = _IN_LIST.sub('(?, ...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class RequestProfile:
+    """Statements run by one request, as [sql, parameters, seconds] lists"""
+
+    def __init__(self):
+        self.runs = []
+        self.dropped = 0
+
+    def statement(self, sql, parameters):
+        """Start recording a statement; the cursor adds its time to the returned run"""
+        run = [sql, parameters, 0.0]
+        if len(self.runs) < MAX_STATEMENTS:
+            self.runs.append(run)
+        else:
+            self.dropped += 1
+        return run
+
+    def shapes(self):
+        """[{shape, count, ms, max_ms}], most total time first"""
+        grouped = {}
+        for sql, _, seconds in self.runs:
+            entry = grouped.setdefault(normalize(sql), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        return [{'shape': shape, 'count': count, 'ms': round(total * 1000, 2), 'max_ms': round(longest * 1000, 2)}
+                for shape, (count, total, longest) in sorted(grouped.items(), key=lambda item: -item[1][1])]
+
+    def summary(self):
+        shapes = self.shapes()
+        return {
+            'statements': len(self.runs) + self.dropped,
+            'shapes': len(shapes),
+            'ms': round(sum(seconds for *_, seconds in self.runs) * 1000, 2),
+            'repeated': [s for s in shapes if s['count'] >= Config.SQL_PROFILER_REPEAT],
+        }
+
+    def slow(self):
+        """Runs that took longer than SQL_SLOW_MS"""
+        threshold = Config.SQL_SLOW_MS / 1000
+        return [run for run in self.runs if run[2] >= threshold]
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN for a statement as indented lines, or None if it cannot be explained"""
+    if parameters is None:
+        return None
+    try:
+        # The plain sqlite3 execute, so the plan is not profiled itself
+        rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def _begin_request():
+    g._sql_profile = RequestProfile()
+    # A connection an outer app context already holds joins this request's profile
+    conn = g.get('_db_conn')
+    if conn is not None:
+        conn.profile = g._sql_profile
+
+
+def _report(response):
+    profile = g.pop('_sql_profile', None)
+    if profile is None:
+        return response
+    conn = g.get('_db_conn')
+    if conn is not None:
+        conn.profile = None
+
+    summary = profile.summary()
+    route = f"{request.method} {request.url_rule.rule if request.url_rule is not None else request.path}"
+    response.headers['Server-Timing'] = f'db;dur={summary["ms"]};desc="{summary["statements"]} statements"'
+    response.headers['X-SQL-Profile'] = (f'statements={summary["statements"]}; shapes={summary["shapes"]}; '
+                                         f'ms={summary["ms"]}; repeated={len(summary["repeated"])}')
+    for shape in summary['repeated'][:REPEATED_HEADERS]:
+        response.headers.add('X-SQL-Repeated', f'{shape["count"]}x {shape["ms"]}ms {shape["shape"][:SHAPE_HEADER_CHARS]}')
+    for shape in summary['repeated']:
+        print(f"[SQL PROFILER] {route} ran {shape['count']}x ({shape['ms']} ms): {shape['shape']}")
+
+    for sql, parameters, seconds in profile.slow():
+        plan = explain(conn, sql, parameters) if conn is not None else None
+        print(f"[SQL PROFILER] Slow statement in {route} ({seconds * 1000:.1f} ms): {_SPACE.sub(' ', sql).strip()}")
+        for line in plan or ['(no plan: statement ran with executemany/executescript or cannot be explained)']:
+            print(f"[SQL PROFILER]     {line}")
+    return response
+
+
+def init_app(app):
+    """Profile every request's SQL when SQL_PROFILER is on"""
+    if not Config.SQL_PROFILER:
+        return
+    app.before_request(_begin_request)
+    app.after_request(_report)
@@ -0,0 +1,75 @@
+"""
+Grouped department and batch statistics
+
+Each function answers for every group in one query over one connection:
+student counts from users, joined to today's scans and distinct students
+present from the daily rollup. The number of statements does not depend on
+how many departments or batches exist.
+"""
+from datetime import date
+from .db import get_db_connection
+from .ingest import reads_attendance
+
+# Today's student totals per group, from the daily rollup
+_TODAY_BY = '''
+    SELECT {column}, SUM(scans) as scans, SUM(people) as attendance_count
+    FROM attendance_daily
+    WHERE day = ? AND role = 'student' {where}
+    GROUP BY {column}
+'''
+
+
+def _with_percentage(row):
+    stats = dict(row)
+    stats['attendance_percentage'] = (stats['attendance_count'] / stats['student_count'] * 100) if stats['student_count'] > 0 else 0
+    return stats
+
+
+@reads_attendance
+def get_department_stats_all(department=None):
+    """{department name: stats} for every department, or just `department` when given"""
+    if department is None:
+        groups, where, params = 'SELECT name FROM departments', '', ()
+    else:
+        groups, where, params = 'SELECT ? as name', 'AND department = ?', (department,)
+
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT d.name as department,
+               COALESCE(s.student_count, 0) as student_count,
+               COALESCE(t.scans, 0) as scans,
+               COALESCE(t.attendance_count, 0) as attendance_count
+        FROM ({groups}) d
+        LEFT JOIN (
+            SELECT department, COUNT(*) as student_count
+            FROM users
+            WHERE role = 'student' {where}
+            GROUP BY department
+        ) s ON s.department = d.name
+        LEFT JOIN ({_TODAY_BY.format(column='department', where=where)}) t ON t.department = d.name
+        ORDER BY d.name
+    ''', params * 2 + (date.today().isoformat(),) + params).fetchall()
+    conn.close()
+    return {row['department']: _with_percentage(row) for row in rows}
+
+
+@reads_attendance
+def get_batch_stats_all():
+    """Stats for every batch year that has students, newest first"""
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT s.batch_year,
+               s.student_count,
+               COALESCE(t.scans, 0) as scans,
+               COALESCE(t.attendance_count, 0) as attendance_count
+        FROM (
+            SELECT batch_year, COUNT(*) as student_count
+            FROM users
+            WHERE role = 'student' AND batch_year IS NOT NULL
+            GROUP BY batch_year
+        ) s
+        LEFT JOIN ({_TODAY_BY.format(column='batch_year', where='')}) t ON t.batch_year = s.batch_year
+        ORDER BY s.batch_year DESC
+    ''', (date.today().isoformat(),)).fetchall()
+    conn.close()
+    return [_with_percentage(row) for row in rows]
@@ -0,0 +1,67 @@
+"""
+Per-student running statistics
+
+student_stats holds one row per person with attendance: total sessions,
+first and last scan, distinct days present and the streak of consecutive days
+ending at the last one. Triggers on attendance keep it current (migration 10),
+so top performers read an index and a profile header reads one row, however
+long the history is.
+"""
+from datetime import date, timedelta
+from .db import get_db_connection
+from .ingest import reads_attendance
+
+
+def _current_streak(stats):
+    """The stored streak counts only while it reaches today or yesterday"""
+    if not stats['last_seen']:
+        return 0
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    return stats['streak'] if stats['last_seen'][:10] >= yesterday else 0
+
+
+@reads_attendance
+def get_top_performers(limit=10):
+    """The `limit` students with the most sessions, most first"""
+    conn = get_db_connection()
+    # CROSS JOIN pins student_stats as the outer loop, so rows come off
+    # idx_student_stats_total in order and the scan stops after `limit` students
+    rows = conn.execute('''
+        SELECT u.name, u.reg_no, s.total_sessions as attendance_count
+        FROM student_stats s
+        CROSS JOIN users u ON u.reg_no = s.reg_no
+        WHERE u.role = 'student'
+        ORDER BY s.total_sessions DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+    top = [dict(row) for row in rows]
+
+    # Students who never scanned still fill the list on a quiet system
+    if len(top) < limit:
+        rows = conn.execute('''
+            SELECT u.name, u.reg_no, 0 as attendance_count
+            FROM users u
+            WHERE u.role = 'student'
+            AND NOT EXISTS (SELECT 1 FROM student_stats s WHERE s.reg_no = u.reg_no)
+            LIMIT ?
+        ''', (limit - len(top),)).fetchall()
+        top.extend(dict(row) for row in rows)
+    conn.close()
+    return top
+
+
+@reads_attendance
+def get_student_stats(reg_no):
+    """Running totals for one person, zeros if they have never scanned"""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT total_sessions, first_seen, last_seen, days_present, streak
+        FROM student_stats
+        WHERE reg_no = ?
+    ''', (reg_no,)).fetchone()
+    conn.close()
+
+    stats = dict(row) if row else {'total_sessions': 0, 'first_seen': None, 'last_seen': None,
+                                   'days_present': 0, 'streak': 0}
+    stats['current_streak'] = _current_streak(stats)
+    return stats
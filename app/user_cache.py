@@ -0,0 +1,115 @@
+"""
+In-memory finger_id -> user map for /verify
+
+The map is loaded with one query the first time a scan needs it. Writes made
+through this process (models and routes) drop it immediately. Writes from
+other processes are noticed through PRAGMA data_version, checked at most every
+USER_CACHE_CHECK_S; when it has moved, the trigger-maintained users counter in
+table_versions decides whether the users table actually changed, so attendance
+commits do not force a reload.
+"""
+import threading
+import time
+from collections import namedtuple
+from .config import Config
+from . import db
+
+CachedUser = namedtuple('CachedUser', 'id name reg_no mac_address finger_id')
+
+
+class FingerprintCache:
+    """Compact finger_id -> CachedUser map kept consistent with the users table"""
+
+    def __init__(self, database=None, check_interval=None):
+        self.database = database or Config.DATABASE
+        self.check_interval = check_interval if check_interval is not None else Config.USER_CACHE_CHECK_S
+        self._lock = threading.Lock()
+        self._conn = None
+        self._users = None
+        self._generation = None
+        self._data_version = None
+        self._next_check = 0
+
+    def get(self, finger_id):
+        """User enrolled with finger_id, or None"""
+        try:
+            key = int(finger_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            if self._users is None or not self._is_current():
+                self._load()
+            return self._users.get(key)
+
+    def invalidate(self):
+        """Drop the map; the next lookup reloads it"""
+        with self._lock:
+            self._users = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._users = None
+
+    def _connection(self):
+        # A dedicated connection: data_version only moves for commits made by
+        # *other* connections, which is every writer in the app
+        if self._conn is None:
+            self._conn = db.connect(self.database)
+        return self._conn
+
+    def _is_current(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return True
+        self._next_check = now + self.check_interval
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return True
+        self._data_version = data_version
+        return self._users_generation(conn) == self._generation
+
+    @staticmethod
+    def _users_generation(conn):
+        row = conn.execute("SELECT version FROM table_versions WHERE name = 'users'").fetchone()
+        return row[0] if row else None
+
+    def _load(self):
+        conn = self._connection()
+        try:
+            # One read transaction so the counter matches the rows read
+            conn.execute('BEGIN')
+            self._generation = self._users_generation(conn)
+            rows = conn.execute('''
+                SELECT id, name, reg_no, mac_address, finger_id FROM users
+                WHERE finger_id IS NOT NULL
+            ''').fetchall()
+            self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        finally:
+            conn.rollback()
+        self._users = {row['finger_id']: CachedUser(*row) for row in rows}
+        self._next_check = time.monotonic() + self.check_interval
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fingerprint_cache():
+    """Process-wide cache for the configured database"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.database != Config.DATABASE:
+            if _cache is not None:
+                _cache.close()
+            _cache = FingerprintCache()
+        return _cache
+
+
+def invalidate_user_cache():
+    """Call after any write to users made in this process"""
+    if _cache is not None:
+        _cache.invalidate()
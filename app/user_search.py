@@ -0,0 +1,71 @@
+"""
+Full-text search over users
+
+Migration 9 builds users_fts, an FTS5 index using the trigram tokenizer over
+users' name, reg_no and department. Triggers keep it in step with the users
+table. A trigram index can answer substring matches, so a '%q%' filter is
+served from the index instead of reading every row. SQLite builds without FTS5
+never get the table, and search falls back to LIKE there. Queries shorter than
+three characters also use LIKE, because they contain no complete trigram.
+"""
+from .config import Config
+from .db import get_db_connection
+
+MIN_QUERY_LENGTH = 3
+
+
+def fts_available():
+    """Whether search should use the users_fts index: enabled, and present in this database"""
+    if not Config.SEARCH_FULLTEXT:
+        return False
+    conn = get_db_connection()
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'").fetchone()
+    conn.close()
+    return row is not None
+
+
+def fts_phrase(columns, text):
+    """FTS5 query matching `text` as a substring of any of `columns`"""
+    quoted = text.replace('"', '""')
+    return f'{{{" ".join(columns)}}} : "{quoted}"'
+
+
+def match_users(terms):
+    """
+    A condition on users (aliased u) and its parameters, requiring every
+    (columns, text) term to occur in one of its columns. Returns None when the
+    index cannot serve the terms; the caller should then use LIKE.
+    """
+    if not terms or any(len(text) < MIN_QUERY_LENGTH for _, text in terms) or not fts_available():
+        return None
+    query = ' AND '.join(fts_phrase(columns, text) for columns, text in terms)
+    return 'u.id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)', [query]
+
+
+def search_users(text, role=None, limit=10):
+    """
+    Users whose name or reg_no contains `text`, best match first. The index
+    ranks by bm25; the fallback orders by name.
+    """
+    conn = get_db_connection()
+    role_clause = 'AND u.role = ?' if role else ''
+    role_params = [role] if role else []
+    if len(text) >= MIN_QUERY_LENGTH and fts_available():
+        rows = conn.execute(f'''
+            SELECT u.reg_no, u.name, u.role
+            FROM users_fts
+            JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ? {role_clause}
+            ORDER BY users_fts.rank
+            LIMIT ?
+        ''', [fts_phrase(('name', 'reg_no'), text)] + role_params + [limit]).fetchall()
+    else:
+        rows = conn.execute(f'''
+            SELECT u.reg_no, u.name, u.role
+            FROM users u
+            WHERE (u.name LIKE ? OR u.reg_no LIKE ?) {role_clause}
+            ORDER BY u.name
+            LIMIT ?
+        ''', [f'%{text}%', f'%{text}%'] + role_params + [limit]).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
@@ -0,0 +1,383 @@
+"""
+Wake-on-LAN dispatcher - sends magic packets off the request path and records the outcome
+"""
+import atexit
+import math
+import queue
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from wake_on_lan import build_magic_packet
+from .config import Config
+from . import db
+from .db import get_db_connection
+from .events import publish
+
+_STOP = object()
+
+
+class WakeDispatcher:
+    """Background magic-packet sender sharing one long-lived UDP socket"""
+
+    def __init__(self, target_ip=None, port=None, burst=None, interval_ms=None, retries=None, database=None):
+        self.target_ip = target_ip or Config.WOL_BROADCAST_IP
+        self.port = port or Config.WOL_PORT
+        self.burst = burst if burst is not None else Config.WOL_BURST
+        self.interval = (interval_ms if interval_ms is not None else Config.WOL_BURST_INTERVAL_MS) / 1000
+        self.retries = retries if retries is not None else Config.WOL_RETRIES
+        if self.burst < 1:
+            raise ValueError(f'burst must be at least 1, got {self.burst}')
+        if self.retries < 0:
+            raise ValueError(f'retries must be 0 or more, got {self.retries}')
+        self.database = database or Config.DATABASE
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+
+    def submit(self, mac_address, name=None, reg_no=None):
+        """Queue a wake request; returns immediately"""
+        job = {
+            'mac_address': mac_address,
+            'name': name,
+            'reg_no': reg_no,
+            'requested_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='wol-dispatcher', daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+
+    def join(self):
+        """Block until every queued request has been sent and recorded"""
+        self._queue.join()
+
+    def stop(self, timeout=None):
+        """Finish the queue, stop the worker and close the socket"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._close_socket()
+
+    def send(self, mac_address):
+        """
+        Send a burst of magic packets, retrying up to `retries` times with
+        backoff on socket errors. Returns a dict with status ('sent', 'failed' or 'invalid'), attempts,
+        packets_sent and message.
+        """
+        try:
+            packet = build_magic_packet(mac_address)
+        except ValueError as e:
+            return {'status': 'invalid', 'attempts': 0, 'packets_sent': 0, 'message': str(e)}
+
+        error = None
+        sent = 0
+        attempts = self.retries + 1
+        for attempt in range(1, attempts + 1):
+            sent = 0
+            try:
+                sock = self._socket()
+                for i in range(self.burst):
+                    if i:
+                        time.sleep(self.interval)
+                    sock.sendto(packet, (self.target_ip, self.port))
+                    sent += 1
+                return {'status': 'sent', 'attempts': attempt, 'packets_sent': sent,
+                        'message': f"Wake signal sent to {mac_address}"}
+            except OSError as e:
+                error = e
+                self._close_socket()
+                if attempt < attempts:
+                    time.sleep(self.interval * 2 ** attempt)
+        return {'status': 'failed', 'attempts': attempts, 'packets_sent': sent,
+                'message': f"Failed to send wake signal: {error}"}
+
+    def send_packet(self, packet):
+        """Send one prepared packet on the shared socket (no retry - callers pace and repeat)"""
+        try:
+            self._socket().sendto(packet, (self.target_ip, self.port))
+        except OSError:
+            self._close_socket()
+            raise
+
+    def _socket(self):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+                self._sock = sock
+            return self._sock
+
+    def _close_socket(self):
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+    def _run(self):
+        conn = db.connect(self.database)
+        try:
+            while True:
+                job = self._queue.get()
+                try:
+                    if job is _STOP:
+                        break
+                    result = self.send(job['mac_address'])
+                    record_wake_event(conn, job, result)
+                except Exception as e:
+                    print(f"[WOL] Could not process wake request: {e}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            conn.close()
+
+
+def record_wake_event(conn, job, result):
+    """Store the outcome of one wake request and push it to live pages"""
+    completed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with conn:
+        cursor = conn.execute('''
+            INSERT INTO wake_events (mac_address, name, reg_no, status, attempts, packets_sent,
+                                     message, requested_at, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job['mac_address'], job.get('name'), job.get('reg_no'), result['status'],
+              result['attempts'], result['packets_sent'], result['message'],
+              job['requested_at'], completed_at))
+    publish('wake', {'id': cursor.lastrowid, 'mac_address': job['mac_address'], 'name': job.get('name'),
+                     'reg_no': job.get('reg_no'), 'completed_at': completed_at, **result})
+    return cursor.lastrowid
+
+
+def get_recent_wake_events(limit=20, reg_no=None):
+    """Most recent wake outcomes, newest first"""
+    conn = get_db_connection()
+    if reg_no:
+        rows = conn.execute('''
+            SELECT * FROM wake_events WHERE reg_no = ? ORDER BY id DESC LIMIT ?
+        ''', (reg_no, limit)).fetchall()
+    else:
+        rows = conn.execute('SELECT * FROM wake_events ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_latest_wake_message(max_age_minutes=5):
+    """Message of the newest wake event if it completed recently, else None"""
+    since = (datetime.now() - timedelta(minutes=max_age_minutes)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT name, status, message, completed_at FROM wake_events ORDER BY id DESC LIMIT 1
+    ''').fetchone()
+    conn.close()
+    if not row or row['completed_at'] < since:
+        return None
+    if row['status'] != 'sent':
+        return f"⚠️ {row['message']}"
+    if row['name']:
+        return f"🚀 Wake Signal Sent to {row['name']}'s PC"
+    return f"🚀 {row['message']}"
+
+
+# ============================================
+# BULK WAKE
+# ============================================
+
+# Bulk wake pacing a caller may override: (parse, valid, what is expected)
+BULK_WAKE_OPTIONS = {
+    'packets_per_second': (float, lambda value: value > 0, 'a number above 0'),
+    'wave_size': (int, lambda value: value >= 1, 'a whole number, 1 or more'),
+    'wave_pause': (float, lambda value: value >= 0, 'a number of seconds, 0 or more'),
+}
+
+
+def parse_bulk_option(key, value):
+    """`value` parsed and checked as the bulk wake option `key`; ValueError says what was expected"""
+    parse, valid, expected = BULK_WAKE_OPTIONS[key]
+    try:
+        parsed = parse(value)
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None or not math.isfinite(parsed) or not valid(parsed):
+        raise ValueError(f'{key} must be {expected}')
+    return parsed
+
+
+class RateLimiter:
+    """Spaces calls to wait() so they run at most `rate` times per second (0 = unlimited)"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def get_wake_targets(batch_year=None, department=None):
+    """Users with a MAC address in a batch and/or department (no filter = the whole lab)"""
+    query = "SELECT name, reg_no, mac_address FROM users WHERE mac_address IS NOT NULL AND mac_address != ''"
+    params = []
+    if batch_year:
+        query += ' AND batch_year = ?'
+        params.append(batch_year)
+    if department:
+        query += ' AND department = ?'
+        params.append(department)
+    query += ' ORDER BY reg_no'
+
+    conn = get_db_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def bulk_wake(targets, dispatcher=None, packets_per_second=None, wave_size=None, wave_pause=None,
+              burst=None, conn=None, on_result=None):
+    """
+    Wake many machines without flooding the switch or powering them all on at once.
+    Machines are woken in waves of `wave_size`, with `wave_pause` seconds between
+    waves; within a wave every machine gets `burst` packets, sent round-robin and
+    capped at `packets_per_second`. Returns one result dict per target; outcomes
+    are also stored in wake_events when `conn` is given.
+    """
+    dispatcher = dispatcher or get_dispatcher()
+    pps = packets_per_second if packets_per_second is not None else Config.WOL_BULK_PPS
+    wave_size = wave_size if wave_size is not None else Config.WOL_BULK_WAVE_SIZE
+    wave_pause = wave_pause if wave_pause is not None else Config.WOL_BULK_WAVE_PAUSE_S
+    burst = burst if burst is not None else dispatcher.burst
+    if burst < 1:
+        raise ValueError(f'burst must be at least 1, got {burst}')
+    if wave_size < 1:
+        raise ValueError(f'wave_size must be at least 1, got {wave_size}')
+    limiter = RateLimiter(pps)
+    requested_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    results = []
+    sendable = []
+    for target in targets:
+        job = dict(target, requested_at=requested_at)
+        try:
+            sendable.append((job, build_magic_packet(target['mac_address'])))
+        except ValueError as e:
+            results.append(_finish(conn, job, {'status': 'invalid', 'attempts': 0, 'packets_sent': 0,
+                                               'message': str(e)}, on_result))
+
+    waves = [sendable[i:i + wave_size] for i in range(0, len(sendable), wave_size)]
+    for index, wave in enumerate(waves):
+        if index and wave_pause:
+            time.sleep(wave_pause)
+        sent = [0] * len(wave)
+        errors = [None] * len(wave)
+        for _ in range(burst):
+            for i, (job, packet) in enumerate(wave):
+                limiter.wait()
+                try:
+                    dispatcher.send_packet(packet)
+                    sent[i] += 1
+                except OSError as e:
+                    errors[i] = e
+        for i, (job, _) in enumerate(wave):
+            if sent[i]:
+                result = {'status': 'sent', 'attempts': burst, 'packets_sent': sent[i],
+                          'message': f"Wake signal sent to {job['mac_address']}"}
+            else:
+                result = {'status': 'failed', 'attempts': burst, 'packets_sent': 0,
+                          'message': f"Failed to send wake signal: {errors[i]}"}
+            results.append(_finish(conn, job, result, on_result))
+    return results
+
+
+def _finish(conn, job, result, on_result):
+    """Record and report one bulk wake outcome"""
+    if conn is not None:
+        record_wake_event(conn, job, result)
+    outcome = {'name': job.get('name'), 'reg_no': job.get('reg_no'),
+               'mac_address': job['mac_address'], **result}
+    if on_result:
+        on_result(outcome)
+    return outcome
+
+
+class BulkWakeJob:
+    """A bulk wake running in its own thread, with per-MAC progress for the API"""
+
+    def __init__(self, job_id, targets, **options):
+        self.id = job_id
+        self.targets = targets
+        self.options = options
+        self.results = []
+        self.status = 'running'
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.finished_at = None
+        self._thread = threading.Thread(target=self._run, name=f'bulk-wake-{job_id}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        conn = db.connect()
+        try:
+            bulk_wake(self.targets, conn=conn, on_result=self.results.append, **self.options)
+            self.status = 'done'
+        except Exception as e:
+            print(f"[WOL] Bulk wake {self.id} failed: {e}")
+            self.status = 'error'
+        finally:
+            conn.close()
+            self.finished_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': len(self.targets),
+            'completed': len(self.results),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'results': list(self.results),
+        }
+
+
+_bulk_jobs = {}
+_bulk_lock = threading.Lock()
+_MAX_BULK_JOBS = 20
+
+
+def start_bulk_wake(targets, **options):
+    """Start a bulk wake in the background and return its job"""
+    with _bulk_lock:
+        job_id = max(_bulk_jobs, default=0) + 1
+        job = BulkWakeJob(job_id, targets, **options)
+        _bulk_jobs[job_id] = job
+        # Keep only the most recent jobs
+        for old_id in sorted(_bulk_jobs)[:-_MAX_BULK_JOBS]:
+            del _bulk_jobs[old_id]
+    return job.start()
+
+
+def get_bulk_wake_job(job_id):
+    with _bulk_lock:
+        return _bulk_jobs.get(job_id)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Process-wide dispatcher, created on first use"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = WakeDispatcher()
+            atexit.register(_dispatcher.stop, 5)
+        return _dispatcher
@@ -23,6 +23,9 @@ const char* WIFI_SSID = "ProjectWiFi";
 const char* WIFI_PASSWORD = "12345678";
 const char* SERVER_URL = "http://192.168.137.1:5000";
 
+// Seconds the server may hold a /get_mode long-poll open
+const int MODE_WAIT_S = 25;
+
 // ========================================
 // HARDWARE SETUP
 // ========================================
@@ -36,6 +39,13 @@ String currentMode = "attendance";
 int enrollID = -1;
 int lastFingerID = -1;
 
+// Set by the mode task when the server asks for an enrollment, consumed by loop()
+volatile int pendingEnrollID = -1;
+String modeETag = "";
+
+// Identifies this scanner to the server (the WiFi MAC, set in setup())
+String deviceID = "";
+
 void setup() {
   Serial.begin(115200);
   delay(1000);
@@ -75,12 +85,20 @@ void setup() {
     Serial.println("\n✗ WiFi failed!");
   }
 
+  deviceID = WiFi.macAddress();
+  Serial.println("Device ID: " + deviceID);
+
+  // Mode changes are long-polled on the other core so scanning never waits on HTTP
+  xTaskCreatePinnedToCore(modeTask, "modeTask", 8192, NULL, 1, NULL, 0);
+
   Serial.println("\n✅ System Ready!\n");
 }
 
 void loop() {
-  if (WiFi.status() == WL_CONNECTED) {
-    checkServerMode();
+  if (pendingEnrollID >= 0) {
+    enrollID = pendingEnrollID;
+    pendingEnrollID = -1;
+    currentMode = "enroll";
   }
 
   if (currentMode == "enroll") {
@@ -93,27 +111,48 @@ void loop() {
   delay(500);
 }
 
+void modeTask(void* param) {
+  for (;;) {
+    if (WiFi.status() == WL_CONNECTED) {
+      checkServerMode();
+    } else {
+      delay(1000);
+    }
+  }
+}
+
+// Long-poll /get_mode: the server answers as soon as the mode changes,
+// or with an empty 304 after MODE_WAIT_S if it has not
 void checkServerMode() {
-  static unsigned long lastCheck = 0;
-  if (millis() - lastCheck < 500) return;
-  lastCheck = millis();
+  const char* headerKeys[] = {"ETag"};
 
   HTTPClient http;
-  http.begin(String(SERVER_URL) + "/get_mode");
+  http.begin(String(SERVER_URL) + "/get_mode?wait=" + String(MODE_WAIT_S));
+  http.setTimeout((MODE_WAIT_S + 5) * 1000);
+  http.collectHeaders(headerKeys, 1);
+  http.addHeader("X-Device-ID", deviceID);
+  if (modeETag.length() > 0) {
+    http.addHeader("If-None-Match", modeETag);
+  }
   int httpCode = http.GET();
 
   if (httpCode == 200) {
+    modeETag = http.header("ETag");
+
     StaticJsonDocument<200> doc;
     deserializeJson(doc, http.getString());
 
     const char* action = doc["action"];
-    if (strcmp(action, "enroll") == 0) {
-      currentMode = "enroll";
-      enrollID = doc["id"];
-      Serial.println("\n📝 ENROLLMENT MODE - ID: " + String(enrollID));
-    } else {
-      currentMode = "attendance";
+    if (action && strcmp(action, "enroll") == 0) {
+      pendingEnrollID = doc["id"];
+      Serial.println("\n📝 ENROLLMENT MODE - ID: " + String(pendingEnrollID));
     }
+  } else if (httpCode != 304) {
+    // Server down or unreachable - back off before trying again
+    modeETag = "";
+    http.end();
+    delay(2000);
+    return;
   }
   http.end();
 }
@@ -204,9 +243,11 @@ void sendToServer(int fingerID) {
   HTTPClient http;
   http.begin(String(SERVER_URL) + "/verify");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", deviceID);
 
   StaticJsonDocument<200> doc;
   doc["finger_id"] = fingerID;
+  doc["device_id"] = deviceID;
   String json;
   serializeJson(doc, json);
 
@@ -223,9 +264,11 @@ void reportEnrollmentStatus(String status, int fingerID) {
   HTTPClient http;
   http.begin(String(SERVER_URL) + "/enrollment_status");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", deviceID);
 
   StaticJsonDocument<200> doc;
   doc["finger_id"] = fingerID;
+  doc["device_id"] = deviceID;
   doc["status"] = status;
   String json;
   serializeJson(doc, json);
@@ -0,0 +1,362 @@
+"""
+ESP32 scanner fleet simulator and load test
+
+Runs N virtual scanners concurrently with asyncio. Each one behaves like
+esp32_firmware.ino:
+  - mode polling on its own task. By default this is the plain 500 ms
+    /get_mode poll of the older firmware; --poll long switches to the
+    current firmware's ?wait=25 long-poll with If-None-Match.
+  - fingerprint scans posted to /verify. Between scans a device waits the
+    firmware's fixed 3.5 s plus an exponential idle time averaging
+    --scan-interval seconds.
+  - when the server puts the device into enroll mode, the firmware's
+    enrollment sequence is posted to /enrollment_status step by step, with
+    human-speed pauses. An admin session triggers an enrollment on a random
+    idle device every --enroll-every seconds.
+Like the firmware's HTTPClient, every request opens a new connection and
+times out after 5 s.
+
+Without --url, the app is started locally with `flask run`, on a scratch
+database filled by scripts/generate_data.py. Wake-on-LAN goes to a
+discard port on localhost instead of the LAN broadcast address.
+
+With --ramp, the fleet grows step by step, for example 5 10 20 40 80 160
+devices, each step running --duration seconds. For every step and endpoint
+it reports p50/p95/p99 latency, error rate and achieved requests per second.
+The throughput ceiling is the highest rate an endpoint reached while its p99
+stayed under --slo-ms and under 1% of its requests failed.
+
+Usage:
+    python scripts/bench_scanners.py --devices 3 --duration 60
+    python scripts/bench_scanners.py --ramp 5 10 20 40 80 160 --duration 30 --json scanners.json
+    python scripts/bench_scanners.py --url http://192.168.137.1:5000 --finger-ids 120 --devices 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HTTP_TIMEOUT_S = 5           # HTTPClient's default
+MODE_WAIT_S = 25             # firmware MODE_WAIT_S
+AFTER_SCAN_S = 3.5           # delay(3000) after a match plus loop()'s delay(500)
+ENROLL_STEPS = ['started', 'waiting_finger_1', 'got_finger_1', 'remove_finger',
+                'waiting_finger_2', 'got_finger_2', 'processing']
+ERROR_BUDGET = 0.01
+
+
+class Recorder:
+    """Latencies and failures per endpoint for one step of the run"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        result = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+            result[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors[endpoint],
+                'error_rate': round(self.errors[endpoint] / len(samples), 4),
+                'rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(cuts[49] * 1000, 1),
+                'p95_ms': round(cuts[94] * 1000, 1),
+                'p99_ms': round(cuts[98] * 1000, 1),
+            }
+        return result
+
+
+class Client:
+    """Minimal HTTP/1.1 client: one connection per request, as HTTPClient does"""
+
+    def __init__(self, url, recorder):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+
+    async def request(self, method, path, endpoint, headers=None, body=None, timeout=HTTP_TIMEOUT_S, ok=(200,)):
+        """(status, headers, body); status 0 for a connection failure or timeout"""
+        started = time.perf_counter()
+        try:
+            status, response_headers, payload = await asyncio.wait_for(
+                self._exchange(method, path, headers or {}, body), timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            status, response_headers, payload = 0, {}, b''
+        self.recorder.record(endpoint, time.perf_counter() - started, status in ok)
+        return status, response_headers, payload
+
+    async def _exchange(self, method, path, headers, body):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: close']
+            lines += [f'{name}: {value}' for name, value in headers.items()]
+            if body is not None:
+                lines.append(f'Content-Length: {len(body)}')
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, payload = raw.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            response_headers.setdefault(name.strip().lower(), value.strip())
+        return int(status_line.split()[1]), response_headers, payload
+
+    async def post_json(self, path, endpoint, device_id, data):
+        return await self.request('POST', path, endpoint, {
+            'Content-Type': 'application/json', 'X-Device-ID': device_id,
+        }, json.dumps(data).encode())
+
+
+class Scanner:
+    """One virtual ESP32"""
+
+    def __init__(self, device_id, client, options, finger_ids, rng):
+        self.device_id = device_id
+        self.client = client
+        self.options = options
+        self.finger_ids = finger_ids
+        self.rng = rng
+        self.pending_enroll = None
+        self.enrolling = False
+        self.etag = None
+
+    async def run(self, stop):
+        await asyncio.gather(self.mode_task(stop), self.main_loop(stop))
+
+    async def mode_task(self, stop):
+        headers = {'X-Device-ID': self.device_id}
+        while not stop.is_set():
+            if self.options.poll == 'long':
+                if self.etag:
+                    headers['If-None-Match'] = self.etag
+                status, response_headers, body = await self.client.request(
+                    'GET', f'/get_mode?wait={MODE_WAIT_S}', 'GET /get_mode?wait', headers,
+                    timeout=MODE_WAIT_S + 5, ok=(200, 304))
+            else:
+                status, response_headers, body = await self.client.request(
+                    'GET', '/get_mode', 'GET /get_mode', headers)
+            if status == 200:
+                self.etag = response_headers.get('etag')
+                mode = json.loads(body or b'{}')
+                if mode.get('action') == 'enroll' and not self.enrolling:
+                    self.pending_enroll = mode.get('id')
+            elif status != 304:
+                # Firmware backs off after a failure
+                self.etag = None
+                await _sleep(stop, 2)
+                continue
+            if self.options.poll != 'long':
+                await _sleep(stop, self.options.poll_interval)
+
+    async def main_loop(self, stop):
+        await _sleep(stop, self.rng.uniform(0, self.options.scan_interval))
+        while not stop.is_set():
+            if self.pending_enroll is not None:
+                await self.enroll(self.pending_enroll, stop)
+                continue
+            await self.client.post_json('/verify', 'POST /verify', self.device_id, {
+                'finger_id': self.rng.choice(self.finger_ids), 'device_id': self.device_id,
+            })
+            await _sleep(stop, AFTER_SCAN_S + self.rng.expovariate(1 / self.options.scan_interval))
+
+    async def enroll(self, finger_id, stop):
+        """The firmware's enrollment sequence, with a person placing and lifting a finger"""
+        self.enrolling, self.pending_enroll = True, None
+        pauses = {'waiting_finger_1': (1, 3), 'remove_finger': (2, 3), 'waiting_finger_2': (1, 3),
+                  'processing': (0.3, 0.8)}
+        for status in ENROLL_STEPS + ['success' if self.rng.random() > 0.05 else 'failed']:
+            await self.client.post_json('/enrollment_status', 'POST /enrollment_status', self.device_id, {
+                'finger_id': finger_id, 'device_id': self.device_id, 'status': status,
+            })
+            if status in pauses:
+                await _sleep(stop, self.rng.uniform(*pauses[status]))
+        self.enrolling = False
+
+
+async def _sleep(stop, seconds):
+    """Sleep that ends early when the run stops"""
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def admin_session(client):
+    """Cookie header for an admin session (the login page's master key)"""
+    _, headers, _ = await client.request('POST', '/login', 'POST /login',
+                                         {'Content-Type': 'application/x-www-form-urlencoded'},
+                                         b'username=admin&password=admin123', ok=(302,))
+    cookie = headers.get('set-cookie', '').split(';', 1)[0]
+    return {'Cookie': cookie} if cookie else {}
+
+
+async def enrollments(client, scanners, options, rng, stop):
+    """Start an enrollment on a random idle scanner every --enroll-every seconds"""
+    if not options.enroll_every:
+        return
+    cookie = await admin_session(client)
+    next_id = 100_000
+    while not stop.is_set():
+        await _sleep(stop, options.enroll_every)
+        idle = [s for s in scanners if not s.enrolling and s.pending_enroll is None]
+        if stop.is_set() or not idle:
+            continue
+        scanner = rng.choice(idle)
+        next_id += 1
+        await client.request('GET', f'/activate_enroll/{next_id}?device_id={scanner.device_id}',
+                             'GET /activate_enroll', cookie, ok=(302,))
+
+
+async def run_step(url, devices, options, finger_ids, seed):
+    recorder = Recorder()
+    client = Client(url, recorder)
+    rng = random.Random(seed)
+    scanners = [Scanner(f'SIM-{n:04d}', client, options, finger_ids, random.Random(rng.random()))
+                for n in range(devices)]
+    stop = asyncio.Event()
+    tasks = [asyncio.ensure_future(s.run(stop)) for s in scanners]
+    tasks.append(asyncio.ensure_future(enrollments(client, scanners, options, rng, stop)))
+    await asyncio.sleep(options.duration)
+    stop.set()
+    # In-flight requests (long polls included) finish on their own timeouts
+    await asyncio.gather(*tasks)
+    return recorder.summary()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(users, attendance):
+    """Generate a scratch database and serve the app on it; returns (url, process, finger_ids, log path)"""
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE=os.path.join(workdir, 'scanners.db'),
+               WOL_BROADCAST_IP='127.0.0.1', WOL_PORT='9')
+    subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'generate_data.py'), '--users', str(users),
+                    '--attendance', str(attendance)], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    port = free_port()
+    log_path = os.path.join(workdir, 'server.log')
+    log = open(log_path, 'w')
+    server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'run', 'run', '--host', '127.0.0.1',
+                               '--port', str(port), '--with-threads'],
+                              cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    else:
+        server.terminate()
+        raise SystemExit(f'the app did not start; see {log_path}')
+    return f'http://127.0.0.1:{port}', server, list(range(1, users + 1)), log_path
+
+
+def print_step(devices, summary):
+    print(f"\n{devices} device(s)")
+    print(f"  {'endpoint':<28} {'requests':>9} {'req/s':>8} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, s in summary.items():
+        print(f"  {endpoint:<28} {s['requests']:>9} {s['rps']:>8.1f} {s['error_rate'] * 100:>7.1f}% "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+
+
+def ceilings(steps, slo_ms):
+    """Per endpoint: the highest req/s reached within the SLO, and the fleet size it first broke at"""
+    result = {}
+    for devices, summary in steps:
+        for endpoint, s in summary.items():
+            # A long-poll is held open on purpose; its latency is not a service time
+            if endpoint.endswith('?wait') or endpoint == 'POST /login':
+                continue
+            entry = result.setdefault(endpoint, {'ceiling_rps': 0.0, 'at_devices': None, 'broke_at_devices': None})
+            within = s['p99_ms'] <= slo_ms and s['error_rate'] < ERROR_BUDGET
+            if within and entry['broke_at_devices'] is None and s['rps'] > entry['ceiling_rps']:
+                entry['ceiling_rps'], entry['at_devices'] = s['rps'], devices
+            elif not within and entry['broke_at_devices'] is None:
+                entry['broke_at_devices'] = devices
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a fleet of ESP32 scanners against the server')
+    fleet = parser.add_mutually_exclusive_group()
+    fleet.add_argument('--devices', type=int, default=3, help='scanners in a single run')
+    fleet.add_argument('--ramp', type=int, nargs='+', help='fleet sizes to step through')
+    parser.add_argument('--duration', type=float, default=60, help='seconds per step')
+    parser.add_argument('--poll', choices=['plain', 'long'], default='plain',
+                        help='plain: /get_mode every --poll-interval s (older firmware); long: ?wait long-poll')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between plain polls')
+    parser.add_argument('--scan-interval', type=float, default=5, help='mean idle seconds between scans per device')
+    parser.add_argument('--enroll-every', type=float, default=60, help='seconds between enrollments (0 = none)')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p99 latency that counts as keeping up')
+    parser.add_argument('--url', help='server to test (default: start the app locally)')
+    parser.add_argument('--finger-ids', type=int, default=2000, help='enrolled finger IDs 1..N on --url')
+    parser.add_argument('--users', type=int, default=2000, help='students in the local scratch database')
+    parser.add_argument('--attendance', type=int, default=100_000, help='attendance rows in the local database')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url, finger_ids = args.url.rstrip('/'), list(range(1, args.finger_ids + 1))
+    else:
+        url, server, finger_ids, log_path = start_local_server(args.users, args.attendance)
+        print(f"Serving a scratch database at {url} (server log: {log_path})")
+
+    steps = []
+    try:
+        for devices in args.ramp or [args.devices]:
+            summary = asyncio.run(run_step(url, devices, args, finger_ids, args.seed))
+            steps.append((devices, summary))
+            print_step(devices, summary)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    limits = ceilings(steps, args.slo_ms)
+    print(f"\nThroughput ceiling (p99 <= {args.slo_ms:.0f} ms, errors < {ERROR_BUDGET:.0%})")
+    for endpoint, entry in sorted(limits.items()):
+        broke = f"first broke at {entry['broke_at_devices']} devices" if entry['broke_at_devices'] else 'never broke'
+        at = f"at {entry['at_devices']} devices" if entry['at_devices'] else 'never within the SLO'
+        print(f"  {endpoint:<28} {entry['ceiling_rps']:>8.1f} req/s {at}; {broke}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': vars(args), 'url': url,
+                       'steps': [{'devices': d, 'endpoints': s} for d, s in steps],
+                       'ceilings': limits}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Query benchmark suite
+
+For each size (10k, 100k and 1M attendance rows by default), fills a fresh
+scratch database with scripts/generate_data.py, using a fixed seed. History
+ends today unless --today pins it. It then times:
+  - every public function in app.models, app.stats and app.student_stats,
+    called directly inside an app context
+  - every GET endpoint, through the Flask test client as an admin, with path
+    parameters filled from the generated data
+
+Each entry is called once untimed, then timed until it has --runs samples
+or has used --budget seconds. A function or endpoint with no sample
+arguments is listed as skipped rather than left out, as are the ones in SKIP
+and endpoints that answer with a server error.
+The result cache is off so the queries themselves are timed. Each size runs
+in its own process.
+
+Results are written as JSON:
+  {"meta": {...}, "sizes": {"100000": {"attendance_rows": ..., "generate_s": ...,
+   "results": {"GET /analytics": {"median_ms": ..., "min_ms": ..., ...}}, "skipped": {...}}}}
+
+Usage:
+    python scripts/bench_suite.py [--sizes 10000 100000 1000000] [--out bench.json]
+    python scripts/bench_suite.py --compare before.json after.json
+"""
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Entries left out on purpose, with the reason
+SKIP = {
+    'models.init_db': 'runs migrations',
+    'models.day_bounds': 'pure function, no query',
+    'models.add_user': 'writes users',
+    'models.add_user_enhanced': 'writes users',
+    'models.delete_user': 'deletes users',
+    'models.update_user_mac': 'writes users',
+    'models.clear_user_fingerprint': 'writes users',
+    'models.delete_attendance': 'deletes attendance',
+    'GET /logout': 'ends the session',
+    'GET /events': 'event stream never ends',
+    'GET /delete_user/<int:user_id>': 'deletes a user',
+    'GET /delete_fingerprint/<int:user_id>': 'changes a user',
+    'GET /delete_attendance/<int:log_id>': 'deletes attendance',
+    'GET /activate_enroll/<int:finger_id>': 'changes the scanner mode',
+    'GET /cancel_enroll': 'changes the scanner mode',
+    'GET /api/network-scan': 'scans the local network',
+    'GET /static/<path:filename>': 'static file',
+}
+
+# Query strings for endpoints whose cost depends on them
+QUERIES = {
+    '/api/search-attendance': '?name={name}',
+    '/api/export-search': '?date_from={week_ago}&date_to={today}',
+    '/download_excel': '?date_from={week_ago}&date_to={today}',
+    '/search-students': '?q={surname}',
+}
+
+
+def sample_values(conn, today):
+    """Argument values taken from the generated data"""
+    student = conn.execute("SELECT * FROM users WHERE role = 'student' ORDER BY id LIMIT 1").fetchone()
+    return {
+        'department': student['department'],
+        'department_name': student['department'],
+        'batch_year': student['batch_year'],
+        'reg_no': student['reg_no'],
+        'user_id': student['id'],
+        'finger_id': student['finger_id'],
+        'name': student['name'],
+        'surname': student['name'].split()[-1],
+        'password': student['password'],
+        'job_id': 1,
+        'today': today.isoformat(),
+        'week_ago': (today - timedelta(days=7)).isoformat(),
+    }
+
+
+def model_calls(values):
+    """{label: zero-argument callable} for every public function in the model modules"""
+    from app import models, stats, student_stats
+    arguments = {
+        'get_department_stats': (values['department'],),
+        'get_department_stats_all': (),
+        'get_users_by_department': (values['department'],),
+        'get_users_by_batch': (values['batch_year'],),
+        'get_user_by_credentials': (values['name'], values['password']),
+        'get_user_by_finger_id': (values['finger_id'],),
+        'get_student_stats': (values['reg_no'],),
+        'log_attendance': (values['name'], values['reg_no']),
+    }
+    calls, skipped = {}, {}
+    for module in (models, stats, student_stats):
+        prefix = module.__name__.rsplit('.', 1)[1]
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            label = f'{prefix}.{name}'
+            if name.startswith('_') or func.__module__ != module.__name__:
+                continue
+            if label in SKIP:
+                skipped[label] = SKIP[label]
+                continue
+            required = [p for p in inspect.signature(func).parameters.values()
+                        if p.default is p.empty and p.kind is p.POSITIONAL_OR_KEYWORD]
+            if required and name not in arguments:
+                skipped[label] = 'no sample arguments'
+                continue
+            calls[label] = (lambda func=func, args=arguments.get(name, ()): func(*args))
+    return calls, skipped
+
+
+def endpoint_paths(app, values):
+    """{label: request path} for every GET route"""
+    paths, skipped = {}, {}
+    adapter = app.url_map.bind('localhost')
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods:
+            continue
+        label = f'GET {rule.rule}'
+        if label in SKIP:
+            skipped[label] = SKIP[label]
+            continue
+        missing = [arg for arg in rule.arguments if arg not in values]
+        if missing:
+            skipped[label] = f"no sample value for {', '.join(missing)}"
+            continue
+        path = adapter.build(rule.endpoint, {arg: values[arg] for arg in rule.arguments}, method='GET')
+        paths[label] = path + QUERIES.get(rule.rule, '').format(**values)
+    return paths, skipped
+
+
+def measure(func, runs, budget):
+    """Timing summary for func: one untimed call, then up to `runs` timed ones within `budget` seconds"""
+    started = time.perf_counter()
+    func()
+    first = time.perf_counter() - started
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < runs and (not samples or time.perf_counter() < deadline):
+        if first > budget and not samples:
+            samples.append(first)
+            break
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {
+        'first_ms': round(first * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'min_ms': round(min(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+        'runs': len(samples),
+    }
+
+
+def run_size(rows, seed, users, today, runs, budget, results):
+    """Child process: generate `rows` of attendance and time everything against it"""
+    os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'bench_suite.db')
+    os.environ['INGEST_WRITE_BEHIND'] = 'false'
+    os.environ['CACHE_ENABLED'] = 'false'
+    from app import create_app
+    from app.config import Config
+    from app.db import get_db_connection
+    from generate_data import generate
+
+    app = create_app()
+    started = time.perf_counter()
+    conn = get_db_connection()
+    counts = generate(conn, users=users, attendance=rows, seed=seed, today=today)
+    conn.execute('ANALYZE')
+    values = sample_values(conn, today)
+    conn.close()
+    generate_s = time.perf_counter() - started
+
+    timings = {}
+    calls, skipped = model_calls(values)
+    for label, call in calls.items():
+        def in_context(call=call):
+            with app.app_context():
+                result = call()
+                if inspect.isgenerator(result):
+                    for _ in result:
+                        pass
+        timings[label] = measure(in_context, runs, budget)
+        print(f"  {rows:>9}  {label:<48} {timings[label]['median_ms']:>10.2f} ms", flush=True)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+    paths, skipped_paths = endpoint_paths(app, values)
+    skipped.update(skipped_paths)
+    for label, path in paths.items():
+        status = {}
+
+        def get(path=path, status=status):
+            response = client.get(path)
+            status['code'], status['bytes'] = response.status_code, len(response.get_data())
+            response.close()
+        # A failing endpoint is recorded once; timing its error page says nothing
+        get()
+        if status['code'] >= 500:
+            skipped[label] = f"responds {status['code']}"
+            print(f"  {rows:>9}  {label:<48} {'failed':>13}  ({status['code']})", flush=True)
+            continue
+        timings[label] = measure(get, runs, budget)
+        timings[label].update(path=path, status=status['code'], bytes=status['bytes'])
+        print(f"  {rows:>9}  {label:<48} {timings[label]['median_ms']:>10.2f} ms  ({status['code']})", flush=True)
+
+    results.put({
+        'attendance_rows': counts['attendance'],
+        'users': counts['users'],
+        'generate_s': round(generate_s, 1),
+        'database_mb': round(os.path.getsize(Config.DATABASE) / 1024 / 1024, 1),
+        'results': timings,
+        'skipped': skipped,
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(before_path, after_path):
+    """Print the medians of two result files side by side"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before_path} ({before['meta'].get('commit')}) -> {after_path} ({after['meta'].get('commit')})")
+    for size in sorted(set(before['sizes']) & set(after['sizes']), key=int):
+        old, new = before['sizes'][size]['results'], after['sizes'][size]['results']
+        print(f"\n{size} attendance rows")
+        print(f"{'entry':<50} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+        for label in sorted(set(old) | set(new)):
+            if label not in old or label not in new:
+                print(f"{label:<50} {'only in ' + ('after' if label in new else 'before'):>29}")
+                continue
+            a, b = old[label]['median_ms'], new[label]['median_ms']
+            ratio = b / a if a else float('inf')
+            # Sub-0.1 ms differences are timer noise whatever the ratio
+            noticeable = abs(b - a) >= 0.1
+            flag = '  slower' if noticeable and ratio > 1.2 else '  faster' if noticeable and ratio < 1 / 1.2 else ''
+            print(f"{label:<50} {a:>10.2f} {b:>10.2f} {ratio:>6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every model function and GET endpoint at several data sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='attendance rows per run')
+    parser.add_argument('--users', type=int, default=2000, help='students in the generated data')
+    parser.add_argument('--seed', type=int, default=1, help='generator seed')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='last day of generated history, YYYY-MM-DD')
+    parser.add_argument('--runs', type=int, default=10, help='timed runs per entry')
+    parser.add_argument('--budget', type=float, default=5.0, help='seconds of timed runs per entry')
+    parser.add_argument('--out', default=f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+                        help='JSON file to write')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {
+        'meta': {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'users': args.users,
+            'today': args.today.isoformat(),
+            'runs': args.runs,
+            'budget_s': args.budget,
+        },
+        'sizes': {},
+    }
+    context = multiprocessing.get_context('spawn')
+    for rows in args.sizes:
+        results = context.Queue()
+        child = context.Process(target=run_size, args=(rows, args.seed, args.users, args.today,
+                                                            args.runs, args.budget, results))
+        child.start()
+        report['sizes'][str(rows)] = results.get()
+        child.join()
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+User search benchmark
+
+Seeds a scratch database with 50,000 users and 2,000,000 attendance rows,
+then times /search-students and the first page of /api/search-attendance for
+a set of name and register number queries. Each query runs twice: once
+through the users_fts trigram index and once through the LIKE fallback
+(SEARCH_FULLTEXT off). The attendance pages from the two paths must match.
+
+Usage: python scripts/bench_user_search.py [users] [attendance_rows]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'user_search_bench.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+os.environ['CACHE_ENABLED'] = 'false'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+
+FIRST = ['Aarav', 'Diya', 'Ishaan', 'Kavya', 'Rohan', 'Ananya', 'Vikram', 'Meera', 'Arjun', 'Priya',
+         'Karthik', 'Lakshmi', 'Nikhil', 'Sneha', 'Rahul', 'Divya', 'Siddharth', 'Pooja', 'Aditya', 'Nisha']
+LAST = ['Sharma', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Menon', 'Rao', 'Kumar', 'Das',
+        'Pillai', 'Joshi', 'Verma', 'Bose', 'Khan', 'Singh', 'Mehta', 'Chopra', 'Bhat', 'Kulkarni']
+DEPARTMENTS = ['CSE', 'ECE', 'EEE', 'MECH', 'CIVIL', 'IT']
+START = datetime(2022, 1, 1, 8, 0, 0)
+RUNS = 20
+
+
+def seed(users, rows):
+    rng = random.Random(19)
+    people = []
+    for n in range(users):
+        department = DEPARTMENTS[n % len(DEPARTMENTS)]
+        batch = str(2021 + n % 4)
+        name = f'{rng.choice(FIRST)} {rng.choice(LAST)} {n}'
+        people.append((name, f'{batch[2:]}{department}{n:05d}', department, batch))
+
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password, department, batch_year) "
+                     "VALUES (?, ?, 'student', '', ?, ?)", people)
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     ((people[i % users][0], people[i % users][1],
+                       (START + timedelta(seconds=15 * i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(rows)))
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return people
+
+
+def timed(client, path):
+    """(median ms, JSON of the last run)"""
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        data = client.get(path).get_json()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), data
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+    app = create_app()
+    started = time.perf_counter()
+    people = seed(users, rows)
+    print(f'seeded {users} users and {rows} attendance rows in {time.perf_counter() - started:.1f} s')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+
+    one_name, one_reg_no = people[users // 2][0], people[users // 2][1]
+    cases = [
+        ('student lookup, full name', f'/search-students?q={one_name}'),
+        ('student lookup, reg_no fragment', f'/search-students?q={one_reg_no[-6:]}'),
+        ('student lookup, common surname', '/search-students?q=Kulkarni'),
+        ('attendance, one student by name', f'/api/search-attendance?name={one_name}'),
+        ('attendance, one student by reg_no', f'/api/search-attendance?reg_no={one_reg_no}'),
+        ('attendance, common surname', '/api/search-attendance?name=Kulkarni'),
+        ('attendance, surname + date range',
+         '/api/search-attendance?name=Kulkarni&date_from=2022-03-01&date_to=2022-03-31'),
+    ]
+
+    failures = []
+    print(f"{'query':<36} {'fts ms':>9} {'like ms':>9} {'speedup':>8}")
+    for label, path in cases:
+        Config.SEARCH_FULLTEXT = True
+        fts_ms, fts_data = timed(client, path)
+        Config.SEARCH_FULLTEXT = False
+        like_ms, like_data = timed(client, path)
+        if path.startswith('/api/') and fts_data['results'] != like_data['results']:
+            failures.append(label)
+        print(f'{label:<36} {fts_ms:>9.2f} {like_ms:>9.2f} {like_ms / fts_ms:>7.1f}x')
+    Config.SEARCH_FULLTEXT = True
+
+    if failures:
+        print('results differ between the index and LIKE for: ' + ', '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
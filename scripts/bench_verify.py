@@ -0,0 +1,105 @@
+"""
+/verify per-scan latency benchmark
+
+Seeds a scratch database with enrolled users and times fingerprint scans with
+the finger_id cache off (one SELECT per scan, as before) and on, both for the
+bare lookup and for a full POST /verify through the Flask test client. Also
+counts the statements the verify path runs per scan.
+
+Usage: python scripts/bench_verify.py [users] [scans]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'bench_verify.db')
+
+from flask import json
+from app import create_app, models
+from app.config import Config
+from app.db import get_db_connection
+from app.ingest import flush_attendance
+from app.user_cache import get_fingerprint_cache
+
+
+def seed(users):
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO users (name, reg_no, role, finger_id, password) VALUES (?, ?, 'student', ?, '')
+    ''', [(f'Student {i}', f'R{i:05d}', i) for i in range(1, users + 1)])
+    conn.commit()
+    conn.close()
+
+
+def uncached_lookup(finger_id):
+    """The lookup /verify used to do"""
+    conn = get_db_connection()
+    user = conn.execute('SELECT * FROM users WHERE finger_id = ?', (finger_id,)).fetchone()
+    conn.close()
+    return user
+
+
+def time_per_call(func, finger_ids):
+    started = time.perf_counter()
+    for finger_id in finger_ids:
+        func(finger_id)
+    return (time.perf_counter() - started) / len(finger_ids) * 1e6
+
+
+def statements_per_scan(app, finger_id):
+    """Statements run by one /verify on the request connection and the cache connection"""
+    statements = []
+    cache = get_fingerprint_cache()
+    cache.get(finger_id)  # make sure the cache connection exists
+    cache._conn.set_trace_callback(statements.append)
+    with app.test_request_context('/verify', method='POST', json={'finger_id': finger_id}):
+        conn = get_db_connection()
+        conn.set_trace_callback(statements.append)
+        app.view_functions['hardware.verify']()
+        conn.set_trace_callback(None)
+    cache._conn.set_trace_callback(None)
+    return [s for s in statements if not s.startswith('PRAGMA')]
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    app = create_app()
+    seed(users)
+    client = app.test_client()
+    finger_ids = [random.randint(1, users) for _ in range(scans)]
+
+    def verify(finger_id):
+        client.post('/verify', data=json.dumps({'finger_id': finger_id}), content_type='application/json')
+
+    print(f'{users} enrolled users, {scans} scans\n')
+    print(f"{'':<22}{'lookup':>12}{'POST /verify':>16}")
+    results = {}
+    for enabled in (False, True):
+        Config.USER_CACHE = enabled
+        get_fingerprint_cache().invalidate()
+        lookup = time_per_call(models.get_user_by_finger_id if enabled else uncached_lookup, finger_ids)
+        request = time_per_call(verify, finger_ids)
+        flush_attendance(10)
+        label = 'cache on' if enabled else 'cache off (before)'
+        results[enabled] = (lookup, request)
+        print(f'{label:<22}{lookup:>9.1f} us{request:>13.1f} us')
+
+    print(f'\nlookup {results[False][0] / results[True][0]:.1f}x faster, '
+          f'/verify {results[False][1] / results[True][1]:.2f}x faster')
+
+    for enabled in (False, True):
+        Config.USER_CACHE = enabled
+        statements = statements_per_scan(app, finger_ids[0])
+        flush_attendance(10)
+        print(f"statements per scan with cache {'on' if enabled else 'off'}: {len(statements)}"
+              + ''.join(f'\n    {" ".join(s.split())}' for s in statements))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Wake-on-LAN throughput benchmark
+
+Sends magic packets for synthetic MAC addresses through bulk_wake() to a UDP
+listener on the loopback interface and reports packets per second, both
+unthrottled and at the configured pacing.
+
+Usage: python scripts/bench_wol.py [machines]
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.wol import WakeDispatcher, bulk_wake
+
+
+class Listener:
+    """Counts packets arriving on a loopback UDP port"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+        self.count = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                data = self.sock.recv(256)
+            except socket.timeout:
+                continue
+            if len(data) == 102:
+                self.count += 1
+
+    def close(self):
+        time.sleep(0.2)
+        self._running = False
+        self._thread.join()
+        self.sock.close()
+
+
+def run(machines, burst, pps, wave_size, wave_pause):
+    listener = Listener()
+    dispatcher = WakeDispatcher('127.0.0.1', listener.port, burst=burst)
+    targets = [{'name': f'PC{i}', 'reg_no': f'B{i:05d}',
+                'mac_address': ':'.join(f'{b:02X}' for b in (0x02, 0, i >> 16 & 255, i >> 8 & 255, i & 255, 1))}
+               for i in range(machines)]
+
+    start = time.perf_counter()
+    results = bulk_wake(targets, dispatcher, packets_per_second=pps, wave_size=wave_size, wave_pause=wave_pause)
+    elapsed = time.perf_counter() - start
+    dispatcher.stop()
+    listener.close()
+
+    sent = sum(r['packets_sent'] for r in results)
+    label = f"pps={pps or 'unlimited'} wave={wave_size} pause={wave_pause}s"
+    print(f"{label:<40} {sent:>7} sent {listener.count:>7} received "
+          f"{elapsed:8.3f}s {sent / elapsed:>10.0f} packets/s")
+
+
+def main():
+    machines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{machines} machines, burst {Config.WOL_BURST}\n")
+    run(machines, Config.WOL_BURST, 0, machines, 0)
+    run(min(machines, 60), Config.WOL_BURST, Config.WOL_BULK_PPS, Config.WOL_BULK_WAVE_SIZE, 0.5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+XLSX export benchmark
+
+Seeds scratch databases with synthetic attendance and times /api/export-search
+for each size, with the streaming openpyxl engine and, when pandas is
+installed, with the old DataFrame path. Each export runs in a fresh process
+so its peak RSS is measured on its own; the figure reported is the growth in
+peak RSS over the process before the export started. SQLite's mmap is turned
+off so that pages of the database file read through it do not count.
+
+Usage: python scripts/bench_xlsx_export.py [rows ...]   (default 100000 1000000)
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+STUDENTS = 400
+START = datetime(2020, 1, 1, 8, 0, 0)
+QUERY = '/api/export-search?role=student'
+
+
+def seed(database, rows):
+    os.environ['DATABASE'] = database
+    from app import create_app
+    from app.db import get_db_connection, close_pool
+    create_app()
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password, department, batch_year) "
+                     "VALUES (?, ?, 'student', '', 'CS', '2024')",
+                     [(f'Student {n}', f'R{n:04d}') for n in range(STUDENTS)])
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     ((f'Student {i % STUDENTS}', f'R{i % STUDENTS:04d}',
+                       (START + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(rows)))
+    conn.commit()
+    conn.close()
+    close_pool()
+
+
+def pandas_export(get_db_connection):
+    """The export as it was before the streaming engine: fetchall -> DataFrame -> ExcelWriter"""
+    import pandas as pd
+    from io import BytesIO
+    conn = get_db_connection()
+    results = conn.execute('''
+        SELECT a.name as "Name", a.reg_no as "Register Number",
+               u.role as "Role", a.timestamp as "Timestamp", a.status as "Status"
+        FROM attendance a
+        JOIN users u ON a.reg_no = u.reg_no
+        WHERE 1=1 AND u.role = ?
+        ORDER BY a.timestamp DESC
+    ''', ('student',)).fetchall()
+    df = pd.DataFrame([dict(row) for row in results])
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Attendance Search Results', index=False)
+    return len(output.getvalue())
+
+
+def run_export(database, engine, results):
+    """Child process: one export, reporting (seconds, RSS growth in MB, file size)"""
+    os.environ['DATABASE'] = database
+    os.environ['INGEST_WRITE_BEHIND'] = 'false'
+    os.environ['DB_MMAP_SIZE'] = '0'
+    from app import create_app
+    from app.db import get_db_connection
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if engine == 'openpyxl':
+        response = client.get(QUERY)
+        size = len(response.data)
+    else:
+        with app.test_request_context(QUERY):
+            size = pandas_export(get_db_connection)
+    elapsed = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, (after - before) / 1024, size))
+
+
+def measure(database, engine):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    child = context.Process(target=run_export, args=(database, engine, results))
+    child.start()
+    result = results.get()
+    child.join()
+    return result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    try:
+        import pandas  # noqa: F401
+        engines = ['openpyxl', 'pandas']
+    except ImportError:
+        engines = ['openpyxl']
+        print('pandas not installed - timing the streaming engine only')
+
+    print(f"{'rows':>9}  {'engine':<9} {'seconds':>8} {'peak RSS +MB':>13} {'file MB':>8}")
+    for rows in sizes:
+        database = os.path.join(tempfile.mkdtemp(), 'xlsx_bench.db')
+        context = multiprocessing.get_context('spawn')
+        seeder = context.Process(target=seed, args=(database, rows))
+        seeder.start()
+        seeder.join()
+        for engine in engines:
+            elapsed, rss, size = measure(database, engine)
+            print(f'{rows:>9}  {engine:<9} {elapsed:>8.1f} {rss:>13.1f} {size / 1024 / 1024:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
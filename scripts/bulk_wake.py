@@ -0,0 +1,75 @@
+"""
+Bulk Wake-on-LAN from the command line
+
+Wakes every PC that belongs to a batch, a department, or the whole lab,
+paced in waves so the switch and the lab breaker are not hit all at once.
+
+Usage:
+    python scripts/bulk_wake.py --batch 2023-2024
+    python scripts/bulk_wake.py --department "Computer Science" --pps 20 --wave-size 5
+    python scripts/bulk_wake.py --all --dry-run
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.db import get_db_connection
+from app.models import init_db
+from app.wol import WakeDispatcher, get_wake_targets, bulk_wake, parse_bulk_option
+
+
+def pacing(key):
+    """An argparse type that checks `key` the way the bulk wake API does"""
+    def parse(value):
+        try:
+            return parse_bulk_option(key, value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wake every PC in a batch, a department or the lab')
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument('--batch', help='batch year, e.g. 2023-2024')
+    scope.add_argument('--department', help='department name')
+    scope.add_argument('--all', action='store_true', help='every PC with a MAC address')
+    parser.add_argument('--pps', type=pacing('packets_per_second'), default=Config.WOL_BULK_PPS,
+                        help='packets per second')
+    parser.add_argument('--wave-size', type=pacing('wave_size'), default=Config.WOL_BULK_WAVE_SIZE,
+                        help='machines per wave')
+    parser.add_argument('--wave-pause', type=pacing('wave_pause'), default=Config.WOL_BULK_WAVE_PAUSE_S,
+                        help='seconds between waves')
+    parser.add_argument('--broadcast', default=Config.WOL_BROADCAST_IP, help='broadcast address')
+    parser.add_argument('--port', type=int, default=Config.WOL_PORT, help='UDP port')
+    parser.add_argument('--dry-run', action='store_true', help='list the machines without sending anything')
+    args = parser.parse_args()
+
+    init_db()
+    targets = get_wake_targets(args.batch, args.department)
+    print(f"{len(targets)} machine(s) selected")
+
+    if args.dry_run:
+        for target in targets:
+            print(f"  {target['reg_no']:<12} {target['name']:<25} {target['mac_address']}")
+        return
+
+    dispatcher = WakeDispatcher(args.broadcast, args.port)
+    conn = get_db_connection()
+    try:
+        results = bulk_wake(targets, dispatcher, args.pps, args.wave_size, args.wave_pause, conn=conn,
+                            on_result=lambda r: print(f"  {r['status']:<8} {r['mac_address']:<18} "
+                                                      f"{r['reg_no'] or '':<12} {r['message']}"))
+    finally:
+        conn.close()
+        dispatcher.stop()
+
+    sent = sum(1 for r in results if r['status'] == 'sent')
+    print(f"\n{sent}/{len(results)} machine(s) sent a wake signal")
+
+
+if __name__ == '__main__':
+    main()
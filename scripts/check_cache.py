@@ -0,0 +1,190 @@
+"""
+Aggregate result cache check
+
+Checks that a ResultCache:
+  - serves an entry until its TTL runs out
+  - evicts the least recently used entry when full
+  - makes every entry under a tag stale when the tag is bumped, and leaves
+    other tags alone
+  - counts hits and misses, and a result computed while its tag was bumped
+    is not served afterwards
+Then, against a scratch database with the SQL profiler on, checks that:
+  - log_attendance, delete_attendance and the write-behind flush each bump
+    'attendance'
+  - /api/cache-stats reports the hit and miss counters (Admin only)
+  - ten /analytics hits run the aggregate queries once, and once more after
+    a log_attendance: one aggregation per change, not one per request
+
+Usage: python scripts/check_cache.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'cache_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+os.environ['CACHE_ENABLED'] = 'true'
+os.environ['SQL_PROFILER'] = 'true'
+
+from flask import g
+from app import create_app
+from app.cache import ResultCache, cached, get_cache
+from app.config import Config
+from app.db import get_db_connection
+from app.ingest import flush_attendance
+from app.models import log_attendance, delete_attendance
+
+# Tables the cached analytics aggregates read
+AGGREGATE_TABLES = ('attendance_daily', 'attendance_daily_people')
+HITS = 10
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def check_result_cache(failures):
+    cache = ResultCache(max_entries=2, ttl=0.05)
+    cache.put('a', cache.generation('t'), 1)
+    check(failures, cache.get('a', 't') == (True, 1), 'a fresh entry is served')
+    time.sleep(0.06)
+    check(failures, cache.get('a', 't') == (False, None), 'an entry is not served after its TTL')
+
+    cache = ResultCache(max_entries=2, ttl=60)
+    cache.put('a', 0, 1)
+    cache.put('b', 0, 2)
+    cache.get('a', 't')
+    cache.put('c', 0, 3)
+    check(failures, cache.peek('b', 't')[0] is False and cache.peek('a', 't')[0] and cache.peek('c', 't')[0]
+          and cache.evictions == 1, 'the least recently used entry is evicted when full')
+
+    cache = ResultCache(max_entries=8, ttl=60)
+    cache.put('x', cache.generation('attendance'), 1)
+    cache.put('y', cache.generation('users'), 2)
+    cache.bump('attendance')
+    check(failures, cache.peek('x', 'attendance')[0] is False and cache.peek('y', 'users')[0],
+          "bump('attendance') makes its entries stale and leaves other tags alone")
+
+    cache = ResultCache(max_entries=8, ttl=60)
+    cache.put('a', 0, 1)
+    for _ in range(3):
+        cache.get('a', 't')
+    cache.get('missing', 't')
+    stats = cache.stats()
+    check(failures, (stats['hits'], stats['misses'], stats['hit_rate']) == (3, 1, 0.75),
+          f"hits and misses are counted ({stats['hits']} hits, {stats['misses']} misses)")
+
+    # A bump that lands while a result is being computed leaves that result stale
+    calls = []
+    computing, bumped = threading.Event(), threading.Event()
+
+    @cached('check-tag')
+    def slow_total():
+        calls.append(1)
+        if len(calls) == 1:
+            computing.set()
+            bumped.wait(2)
+        return len(calls)
+
+    worker = threading.Thread(target=slow_total)
+    worker.start()
+    computing.wait(2)
+    get_cache().bump('check-tag')
+    bumped.set()
+    worker.join()
+    check(failures, slow_total() == 2 and slow_total() == 2,
+          'a result computed across a bump is recomputed once, then served')
+
+
+def aggregate_statements(app):
+    """Count the statements each request runs against the aggregate tables"""
+    counts = []
+
+    @app.after_request
+    def count(response):
+        profile = g.get('_sql_profile')
+        if profile is not None:
+            counts.append(sum(1 for sql, *_ in profile.runs if any(table in sql for table in AGGREGATE_TABLES)))
+        return response
+    return counts
+
+
+def check_invalidation(failures):
+    cache = get_cache()
+    generation = cache.generation('attendance')
+    log_attendance('Cache Check', 'C001')
+    check(failures, cache.generation('attendance') == generation + 1, 'log_attendance bumps attendance')
+
+    conn = get_db_connection()
+    log_id = conn.execute("SELECT MAX(log_id) FROM attendance WHERE reg_no = 'C001'").fetchone()[0]
+    conn.close()
+    generation = cache.generation('attendance')
+    delete_attendance(log_id)
+    check(failures, cache.generation('attendance') == generation + 1, 'delete_attendance bumps attendance')
+
+    Config.INGEST_WRITE_BEHIND = True
+    try:
+        generation = cache.generation('attendance')
+        log_attendance('Cache Check', 'C002')
+        queued = cache.generation('attendance')
+        flush_attendance(5)
+        check(failures, queued == generation and cache.generation('attendance') == generation + 1,
+              'a queued scan bumps attendance when the writer flushes it, not before')
+    finally:
+        Config.INGEST_WRITE_BEHIND = False
+
+
+def check_routes(failures, app, counts):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'Check admin'
+        session['role'] = 'admin'
+
+    get_cache().clear()
+    before = get_cache().stats()
+    for _ in range(HITS):
+        client.get('/analytics')
+    first = list(counts)
+    log_attendance('Cache Check', 'C003')
+    counts.clear()
+    for _ in range(HITS):
+        client.get('/analytics')
+    check(failures, first[0] > 0 and not any(first[1:]),
+          f'{HITS} /analytics hits run the aggregates once ({first[0]} statements, then {sum(first[1:])})')
+    check(failures, counts[0] == first[0] and not any(counts[1:]),
+          f'after a log_attendance they run once more ({counts[0]} statements, then {sum(counts[1:])})')
+
+    stats = client.get('/api/cache-stats').get_json()
+    # Two cached aggregates per page: each fresh page is two misses, each repeat two hits
+    check(failures, stats['misses'] - before['misses'] == 4 and stats['hits'] - before['hits'] == 4 * (HITS - 1),
+          f"/api/cache-stats counts {stats['hits'] - before['hits']} hits and "
+          f"{stats['misses'] - before['misses']} misses")
+    check(failures, stats['enabled'] and 'attendance' in stats['generations'],
+          '/api/cache-stats shows the cache is on and the attendance generation')
+
+    with client.session_transaction() as session:
+        session['role'] = 'staff'
+    check(failures, client.get('/api/cache-stats').status_code == 401, '/api/cache-stats is for admins only')
+
+
+def main():
+    failures = []
+    check_result_cache(failures)
+    app = create_app()
+    counts = aggregate_statements(app)
+    with app.app_context():
+        check_invalidation(failures)
+    check_routes(failures, app, counts)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
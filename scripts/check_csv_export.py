@@ -0,0 +1,142 @@
+"""
+Streaming CSV export check
+
+Fills a scratch database with synthetic attendance (a million rows by
+default), then downloads /download_excel through the test client without
+buffering and checks that:
+  - every row arrives, in order, under a header
+  - the first bytes arrive before the export has read the table
+  - Python memory allocated while streaming stays under a ceiling, however
+    many rows there are
+  - the date, department and batch filters select the expected rows
+
+Usage: python scripts/check_csv_export.py [rows] [ceiling_mb]
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'csv_export_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+
+from app import create_app
+from app.db import get_db_connection
+
+STUDENTS = 400
+START = datetime(2020, 1, 1, 8, 0, 0)
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def seed(rows):
+    """Two departments and batches of students, scanning one a minute from START"""
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password, department, batch_year) "
+                     "VALUES (?, ?, ?, '', ?, ?)",
+                     [(f'Student {n}', f'R{n:04d}', 'student', ('CS', 'EEE')[n % 2], ('2023', '2024')[n // 200])
+                      for n in range(STUDENTS)])
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     ((f'Student {i % STUDENTS}', f'R{i % STUDENTS:04d}',
+                       (START + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def download(client, query=''):
+    """Stream the export; returns (body chunks iterator, response)"""
+    response = client.get('/download_excel' + query, buffered=False)
+    return response.response, response
+
+
+def stream_all(client, failures, rows, ceiling_mb):
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks, response = download(client)
+    first = next(iter(chunks))
+    first_byte = time.perf_counter() - started
+
+    count = 0
+    previous = None
+    ordered = True
+    tail = b''
+    header = first.decode('utf-8').splitlines()[0]
+    for chunk in chunks:
+        lines = (tail + chunk).split(b'\r\n')
+        tail = lines.pop()
+        for line in lines:
+            timestamp = line.rsplit(b',', 2)[1]
+            if previous is not None and timestamp > previous:
+                ordered = False
+            previous = timestamp
+            count += 1
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    disposition = response.headers.get('Content-Disposition', '')
+    check(failures, response.mimetype == 'text/csv' and disposition.startswith('attachment; filename=attendance_report_'),
+          f'served as a CSV attachment ({disposition})')
+    check(failures, header == 'Name,Register No,Timestamp,Status', 'header row comes first')
+    check(failures, count == rows and not tail, f'{count} of {rows} rows streamed in {elapsed:.1f} s')
+    check(failures, ordered, 'rows are newest first')
+    check(failures, first_byte < 0.5, f'first byte after {first_byte * 1000:.0f} ms')
+    check(failures, peak < ceiling_mb * 1024 * 1024,
+          f'peak Python allocations {peak / 1024 / 1024:.1f} MB (ceiling {ceiling_mb} MB)')
+
+
+def filtered(client, failures):
+    def rows(query):
+        chunks, response = download(client, query)
+        body = b''.join(chunks).decode('utf-8')
+        response.close()
+        return list(csv.reader(io.StringIO(body)))[1:]
+
+    day = rows('?date_from=2020-01-02&date_to=2020-01-02')
+    check(failures, len(day) == 1440 and all(r[2].startswith('2020-01-02') for r in day),
+          f'date range selects one day of scans ({len(day)} rows)')
+    cs = rows('?date_from=2020-01-02&date_to=2020-01-02&department=CS')
+    check(failures, len(cs) == 720 and all(int(r[1][1:]) % 2 == 0 for r in cs),
+          f'department filter falls back to the user record ({len(cs)} rows)')
+    batch = rows('?date_from=2020-01-02&date_to=2020-01-02&batch_year=2024')
+    check(failures, batch and all(int(r[1][1:]) >= 200 for r in batch),
+          f'batch filter selects that batch ({len(batch)} rows)')
+    response = client.get('/download_excel?date_from=yesterday')
+    check(failures, response.status_code == 400, 'a malformed date is rejected')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ceiling_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    app = create_app()
+    started = time.perf_counter()
+    seed(rows)
+    print(f'seeded {rows} rows in {time.perf_counter() - started:.1f} s')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+
+    failures = []
+    stream_all(client, failures, rows, ceiling_mb)
+    filtered(client, failures)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
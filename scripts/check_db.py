@@ -13,10 +13,9 @@ cursor.execute('SELECT COUNT(*) FROM departments')
 dept_count = cursor.fetchone()[0]
 print('Department count:', dept_count)
 
-# Check if classes table exists and has data
-cursor.execute('SELECT COUNT(*) FROM classes')
-class_count = cursor.fetchone()[0]
-print('Class count:', class_count)
+# Check applied schema migrations
+cursor.execute('SELECT MAX(version) FROM schema_version')
+print('Schema version:', cursor.fetchone()[0])
 
 # Check if users table has new columns
 cursor.execute('PRAGMA table_info(users)')
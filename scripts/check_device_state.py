@@ -0,0 +1,142 @@
+"""
+Hardware state store check
+
+For each backend, checks that:
+  - devices keep independent modes
+  - of several admins starting an enrollment at once, exactly one wins
+  - progress reports for a cancelled or different enrollment are ignored
+  - a long-poll wakes when the mode changes
+For the SQLite backend it also changes the mode from a second process and
+checks that this process sees it, as another server worker would, and that
+long-polls waiting inside requests hold no pooled connection.
+
+Usage: python scripts/check_device_state.py
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'state_check.db')
+
+from flask import Flask
+from app.config import Config, HardwareState, DeviceBusyError
+from app import db
+from app.db import get_pool, get_db_connection
+from app.models import init_db
+
+
+def use_backend(backend):
+    Config.HARDWARE_STATE_BACKEND = backend
+    HardwareState._store = None
+    HardwareState._touched.clear()
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def enroll_from_other_process(device_id, finger_id):
+    """Runs in a child process, like a second server worker"""
+    use_backend('sqlite')
+    HardwareState.set_enroll_mode(finger_id, device_id)
+
+
+def run_checks(backend, failures):
+    use_backend(backend)
+    print(f'\n[{backend}]')
+
+    HardwareState.set_enroll_mode(1, 'lab-a')
+    check(failures, HardwareState.get_mode('lab-b')[0]['action'] == 'attendance',
+          'enrolling on lab-a leaves lab-b in attendance mode')
+
+    # Eight admins race to start an enrollment on the same scanner
+    results = []
+    barrier = threading.Barrier(8)
+
+    def race(finger_id):
+        barrier.wait()
+        try:
+            HardwareState.set_enroll_mode(finger_id, 'lab-b')
+            results.append(finger_id)
+        except DeviceBusyError:
+            pass
+
+    threads = [threading.Thread(target=race, args=(i,)) for i in range(10, 18)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    winner = HardwareState.get_mode('lab-b')[0]['id']
+    check(failures, len(results) == 1 and results[0] == winner,
+          f'{len(results)} of 8 concurrent enrollments won (finger {winner})')
+
+    HardwareState.update_enrollment('waiting_finger_1', 999, 'stale', 'lab-b')
+    check(failures, HardwareState.get_enrollment('lab-b')['status'] == 'pending',
+          'progress for a different finger is ignored')
+    HardwareState.update_enrollment('waiting_finger_1', winner, 'Place finger', 'lab-b')
+    check(failures, HardwareState.get_enrollment('lab-b')['status'] == 'waiting_finger_1',
+          'progress for the active enrollment is recorded')
+    HardwareState.set_attendance_mode('lab-b')
+    HardwareState.update_enrollment('success', winner, 'done', 'lab-b')
+    check(failures, HardwareState.get_enrollment('lab-b')['status'] == 'idle',
+          'a report after cancel does not resurrect the enrollment')
+
+    _, version = HardwareState.get_mode('lab-c')
+    started = time.monotonic()
+    threading.Timer(0.3, HardwareState.set_enroll_mode, args=(5, 'lab-c')).start()
+    mode, new_version = HardwareState.wait_for_mode_change(version, 5, 'lab-c')
+    waited = time.monotonic() - started
+    check(failures, mode['id'] == 5 and new_version != version and waited < 1,
+          f'long-poll woke {waited * 1000:.0f} ms after the change')
+
+    if backend == 'sqlite':
+        _, version = HardwareState.get_mode('lab-d')
+        child = multiprocessing.Process(target=enroll_from_other_process, args=('lab-d', 42))
+        child.start()
+        mode, _ = HardwareState.wait_for_mode_change(version, 10, 'lab-d')
+        child.join()
+        check(failures, mode == {'action': 'enroll', 'id': 42}, 'mode set by another process is visible')
+
+        # More long-polls than the pool has connections, each inside a request
+        app = Flask(__name__)
+        db.init_app(app)
+        _, version = HardwareState.get_mode('lab-e')
+
+        def long_poll():
+            with app.test_request_context('/get_mode'):
+                get_db_connection()
+                HardwareState.wait_for_mode_change(version, 5, 'lab-e')
+
+        pollers = [threading.Thread(target=long_poll) for _ in range(Config.DB_POOL_SIZE * 2)]
+        for t in pollers:
+            t.start()
+        time.sleep(0.3)
+        started = time.monotonic()
+        conn = get_pool().acquire()
+        acquired = time.monotonic() - started
+        get_pool().release(conn)
+        HardwareState.set_enroll_mode(6, 'lab-e')
+        for t in pollers:
+            t.join()
+        check(failures, acquired < 0.1,
+              f'{len(pollers)} waiting long-polls leave the pool free ({acquired * 1000:.0f} ms to get a connection)')
+
+
+def main():
+    init_db()
+    failures = []
+    for backend in ('memory', 'sqlite'):
+        run_checks(backend, failures)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
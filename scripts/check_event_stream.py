@@ -0,0 +1,166 @@
+"""
+Event stream check
+
+Runs the app on a local port, connects to /events like a browser would and
+checks that:
+  - attendance, enrollment and wake events arrive within a second
+  - the enrollment and wake topics require a login
+  - a reconnect with Last-Event-ID replays exactly the missed events
+  - a subscriber that stops reading is dropped without blocking publishers
+  - a stream that is never read holds no subscription, and one over the
+    subscriber limit gets an error event
+
+Usage: python scripts/check_event_stream.py
+"""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'events_check.db')
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+from app import create_app, models
+from app.config import HardwareState
+from app.events import EventBus, get_bus
+from app.ingest import flush_attendance
+from app.wol import record_wake_event
+from app.db import get_db_connection
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class StreamClient:
+    """Minimal SSE client collecting (id, event, data, received_at) tuples"""
+
+    def __init__(self, port, topics, headers=None):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        self.conn.request('GET', f'/events?topics={topics}', headers=headers or {})
+        self.response = self.conn.getresponse()
+        self.events = []
+        self._arrived = threading.Condition()
+        if self.response.status == 200:
+            threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        event = {}
+        try:
+            for raw in self.response:
+                line = raw.decode().rstrip('\n')
+                if not line:
+                    if 'data' in event:
+                        with self._arrived:
+                            self.events.append((event.get('id'), event.get('event', 'message'),
+                                                json.loads(event['data']), time.monotonic()))
+                            self._arrived.notify_all()
+                    event = {}
+                elif not line.startswith(':'):
+                    field, _, value = line.partition(': ')
+                    event[field] = value
+        except (OSError, ValueError):
+            pass
+
+    def wait_for(self, count, timeout=2):
+        with self._arrived:
+            self._arrived.wait_for(lambda: len(self.events) >= count, timeout)
+            return list(self.events)
+
+    def close(self):
+        self.conn.close()
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main():
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.port
+    failures = []
+
+    # Log in as admin to get a session cookie for the private topics
+    login = http.client.HTTPConnection('127.0.0.1', port)
+    login.request('POST', '/login', body='username=admin&password=admin123',
+                  headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    cookie = login.getresponse().getheader('Set-Cookie', '').split(';')[0]
+    login.close()
+
+    denied = StreamClient(port, 'enrollment')
+    check(failures, denied.response.status == 401, 'enrollment topic needs a login')
+    denied.close()
+
+    client = StreamClient(port, 'attendance,enrollment,wake', {'Cookie': cookie})
+    check(failures, client.response.status == 200, 'logged-in client subscribes to every topic')
+    time.sleep(0.2)
+
+    sent_at = time.monotonic()
+    models.log_attendance('Alice', 'R001')
+    flush_attendance(5)
+    HardwareState.set_enroll_mode(7)
+    conn = get_db_connection()
+    record_wake_event(conn, {'mac_address': 'AA:BB:CC:DD:EE:FF', 'name': 'Alice', 'reg_no': 'R001',
+                             'requested_at': '2024-01-01 09:00:00'},
+                      {'status': 'sent', 'attempts': 1, 'packets_sent': 3, 'message': 'ok'})
+    conn.close()
+
+    events = client.wait_for(3)
+    topics = [e[1] for e in events]
+    check(failures, topics == ['attendance', 'enrollment', 'wake'], f'received {topics}')
+    if events:
+        latency = max(e[3] for e in events) - sent_at
+        check(failures, latency < 1, f'all events delivered in {latency * 1000:.0f} ms')
+        check(failures, events[0][2].get('today_count') == 1, 'attendance event carries today_count')
+    client.close()
+
+    # Reconnect from the first event and expect the two that followed
+    last_id = events[0][0] if events else '0'
+    replay = StreamClient(port, 'attendance,enrollment,wake', {'Cookie': cookie, 'Last-Event-ID': last_id})
+    replayed = [e[1] for e in replay.wait_for(2)]
+    check(failures, replayed == ['enrollment', 'wake'], f'Last-Event-ID replays {replayed}')
+    replay.close()
+
+    # A reader that never drains its queue is dropped and publishing stays fast
+    bus = EventBus(max_queue=10, history=50)
+    stuck = bus.subscribe({'attendance'})
+    started = time.monotonic()
+    for i in range(1000):
+        bus.publish('attendance', {'n': i})
+    elapsed = time.monotonic() - started
+    check(failures, stuck.closed and bus.subscriber_count() == 0, 'slow subscriber is disconnected')
+    check(failures, elapsed < 0.5, f'1000 publishes with a stuck subscriber took {elapsed * 1000:.0f} ms')
+    late = bus.subscribe({'attendance'}, last_event_id=1)
+    check(failures, late.resync, 'reconnect past the history asks the page to resync')
+
+    # The subscription belongs to the running stream, not to the response object
+    before = get_bus().subscriber_count()
+    with app.test_request_context('/events?topics=attendance'):
+        unread = app.view_functions['events.stream']()
+    check(failures, get_bus().subscriber_count() == before, 'an unread stream holds no subscription')
+    unread.close()
+
+    get_bus().max_subscribers = before
+    refused = app.test_client().get('/events?topics=attendance', buffered=False)
+    body = b''.join(refused.response).decode()
+    check(failures, 'event: error' in body and 'Too many open event streams' in body,
+          'a stream over the subscriber limit gets an error event')
+    check(failures, get_bus().subscriber_count() == before, 'the refused stream left nothing behind')
+
+    server.shutdown()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
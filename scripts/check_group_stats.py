@@ -0,0 +1,109 @@
+"""
+Grouped statistics check
+
+Seeds a scratch database with a few departments and batches, then with many
+more, and checks that:
+  - the all-departments and all-batches stats each run the same number of
+    statements whatever the number of groups (no query per group)
+  - every group's numbers match a direct count over users and attendance
+
+Usage: python scripts/check_group_stats.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'group_stats_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+
+from app import create_app, models
+from app.db import get_db_connection
+from app.stats import get_department_stats_all, get_batch_stats_all
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def seed(start, count):
+    """Add departments and batches start..start+count-1, each with three students, two present today"""
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO departments (name, hod_name) VALUES (?, ?)',
+                     [(f'DEPT{i:03d}', 'HOD') for i in range(start, start + count)])
+    conn.commit()
+    conn.close()
+    for i in range(start, start + count):
+        for n in range(3):
+            reg_no = f'R{i:03d}{n}'
+            models.add_user(f'Student {i}-{n}', reg_no, 'student', None, f'DEPT{i:03d}', str(2000 + i))
+            if n < 2:
+                models.log_attendance(f'Student {i}-{n}', reg_no)
+                models.log_attendance(f'Student {i}-{n}', reg_no)
+
+
+def statements(app, func):
+    """Result of func and the statements it ran on the request connection"""
+    executed = []
+    with app.test_request_context('/'):
+        conn = get_db_connection()
+        conn.set_trace_callback(executed.append)
+        try:
+            result = func()
+        finally:
+            conn.set_trace_callback(None)
+    return result, [sql for sql in executed if not sql.startswith('PRAGMA')]
+
+
+def expected(group_column, group):
+    """Stats for one group counted straight from users and attendance"""
+    conn = get_db_connection()
+    students = conn.execute(f"SELECT COUNT(*) FROM users WHERE role = 'student' AND {group_column} = ?",
+                            (group,)).fetchone()[0]
+    scans, present = conn.execute(f'''
+        SELECT COUNT(*), COUNT(DISTINCT a.reg_no) FROM attendance a JOIN users u ON u.reg_no = a.reg_no
+        WHERE u.role = 'student' AND u.{group_column} = ? AND a.timestamp >= date('now', 'localtime')
+    ''', (group,)).fetchone()
+    conn.close()
+    return students, scans, present
+
+
+def run_checks(app, failures, groups):
+    departments, dept_sql = statements(app, get_department_stats_all)
+    batches, batch_sql = statements(app, get_batch_stats_all)
+    check(failures, len(departments) == groups and len(batches) == groups,
+          f'{groups} departments and {groups} batches reported')
+
+    for name, stats in departments.items():
+        actual = (stats['student_count'], stats['scans'], stats['attendance_count'])
+        if actual != expected('department', name):
+            check(failures, False, f'department {name}: {actual} != {expected("department", name)}')
+    for stats in batches:
+        actual = (stats['student_count'], stats['scans'], stats['attendance_count'])
+        if actual != expected('batch_year', stats['batch_year']):
+            check(failures, False, f'batch {stats["batch_year"]}: {actual} != {expected("batch_year", stats["batch_year"])}')
+    return len(dept_sql), len(batch_sql)
+
+
+def main():
+    app = create_app()
+    failures = []
+
+    seed(0, 3)
+    small = run_checks(app, failures, 3)
+    seed(3, 47)
+    large = run_checks(app, failures, 50)
+
+    check(failures, small == large,
+          f'statements per call stay constant: departments {small[0]} -> {large[0]}, batches {small[1]} -> {large[1]}')
+    check(failures, large == (1, 1), 'each page is served by a single grouped query')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
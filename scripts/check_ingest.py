@@ -0,0 +1,115 @@
+"""
+Write-behind ingestion check
+
+Drives an AttendanceWriter against a scratch database and checks that:
+  - queued scans are committed and flush() makes them visible
+  - a batch that keeps failing is not counted as committed: it is counted as
+    dropped, saved to the spill file, and inserted once writes succeed again
+  - an unexpected error in the writer thread does not stop later scans from
+    being written
+  - SIGTERM writes out scans still waiting in the queue
+
+Usage: python scripts/check_ingest.py
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Point the app at a scratch database before anything reads Config
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE'] = os.path.join(scratch, 'ingest_check.db')
+os.environ['INGEST_MAX_RETRIES'] = '2'
+
+from app import ingest
+from app.db import connect
+from app.models import init_db
+
+# Run by the SIGTERM case below: queue scans that would otherwise wait a minute, then wait to be killed
+CHILD = '''
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from app import create_app
+from app.models import log_attendance
+create_app()
+for i in range(5):
+    log_attendance('Term', f'T{i}')
+print('queued', flush=True)
+time.sleep(60)
+'''
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def count(reg_prefix):
+    conn = connect()
+    n = conn.execute('SELECT COUNT(*) FROM attendance WHERE reg_no LIKE ?', (reg_prefix + '%',)).fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    failures = []
+    init_db()
+    writer = ingest.AttendanceWriter(max_latency_ms=20)
+
+    for i in range(10):
+        writer.submit(('Ok', f'OK{i}', '2024-01-01 09:00:00'))
+    check(failures, writer.flush(5) and count('OK') == 10 and writer.pending() == 0, 'queued scans are committed')
+
+    # Every insert fails until the trigger is dropped
+    conn = connect()
+    conn.execute("CREATE TRIGGER fail_insert BEFORE INSERT ON attendance BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    conn.commit()
+    for i in range(3):
+        writer.submit(('Fail', f'FAIL{i}', '2024-01-01 09:00:00'))
+    check(failures, writer.flush(5), 'flush returns once the failing batch is given up on')
+    check(failures, writer.dropped() == 3 and writer.pending() == 0 and writer._committed == 10,
+          f'failed rows are dropped, not committed ({writer.dropped()} dropped, {writer._committed} committed)')
+    check(failures, os.path.exists(writer.spill_file), 'dropped rows are saved to the spill file')
+
+    conn.execute('DROP TRIGGER fail_insert')
+    conn.commit()
+    conn.close()
+    writer.submit(('Ok', 'OK10', '2024-01-01 09:00:00'))
+    writer.flush(5)
+    check(failures, count('FAIL') == 3 and not os.path.exists(writer.spill_file),
+          'saved rows are inserted once writes succeed again')
+
+    # An error the writer does not expect ends its thread; the next scan starts a new one
+    def broken_bump(*args):
+        raise RuntimeError('cache is broken')
+
+    real_bump, ingest.bump = ingest.bump, broken_bump
+    writer.submit(('Ok', 'OK11', '2024-01-01 09:00:00'))
+    writer.flush(5)
+    ingest.bump = real_bump
+    deadline = time.time() + 5
+    while writer._thread is not None and time.time() < deadline:
+        time.sleep(0.01)
+    writer.submit(('Ok', 'OK12', '2024-01-01 09:00:00'))
+    check(failures, writer.flush(5) and count('OK') == 13, 'the writer restarts after an unexpected error')
+    writer.stop(5)
+
+    env = dict(os.environ, INGEST_MAX_LATENCY_MS='60000', INGEST_WRITE_BEHIND='true')
+    child = subprocess.Popen([sys.executable, '-c', CHILD, ROOT], env=env, stdout=subprocess.PIPE, text=True)
+    child.stdout.readline()
+    child.send_signal(signal.SIGTERM)
+    child.wait(10)
+    check(failures, count('T') == 5, f'SIGTERM writes out the queue ({count("T")} of 5, exit {child.returncode})')
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
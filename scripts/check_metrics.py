@@ -0,0 +1,144 @@
+"""
+Request metrics check
+
+Sends a mix of requests through the test client and checks that /metrics:
+  - is refused without an admin session or the bearer token
+  - counts requests per route rule and status, with unknown paths under one
+    series, and returns the in-flight gauge to just the scrape itself
+  - reports the statements each request ran, matching what the pooled
+    connection executed
+  - renders well-formed Prometheus text whose histogram buckets are
+    cumulative and end at the request count
+Then it times requests with metrics on and off to show the overhead.
+
+Usage: python scripts/check_metrics.py
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'metrics_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+os.environ['CACHE_ENABLED'] = 'false'
+os.environ['METRICS_TOKEN'] = 'scrape-secret'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+from app.metrics import get_metrics, BUCKETS
+
+SAMPLE = re.compile(r'^[a-z_]+(\{([a-z_]+="([^"\\]|\\.)*",?)*\})? -?[0-9.e+-]+$')
+OVERHEAD_REQUESTS = 2000
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+    return client
+
+
+def per_request_us(client, path, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    failures = []
+    app = create_app()
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password, finger_id) VALUES (?, ?, 'student', '', ?)",
+                     [(f'Student {n}', f'R{n:04d}', n) for n in range(1, 51)])
+    conn.commit()
+    conn.close()
+
+    anonymous = app.test_client()
+    check(failures, anonymous.get('/metrics').status_code == 401, 'refused without logging in')
+    check(failures, anonymous.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401,
+          'refused with the wrong token')
+    check(failures, anonymous.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200,
+          'served to the bearer token')
+
+    get_metrics().reset()
+    client = admin_client(app)
+    for n in range(1, 21):
+        client.get(f'/profile/R{n:04d}')
+    for _ in range(5):
+        client.get('/get_mode')
+        client.get('/no/such/page')
+    client.post('/verify', json={'finger_id': 999})
+
+    data = client.get('/metrics?format=json').get_json()
+    endpoints = data['endpoints']
+    profile = endpoints.get('GET /profile/<reg_no>', {})
+    check(failures, profile.get('requests') == 20, f"one series for /profile/<reg_no> ({profile.get('requests')} requests)")
+    check(failures, endpoints.get('GET /get_mode', {}).get('statuses') == {'200': 5}, 'status counts for /get_mode')
+    check(failures, endpoints.get('GET <unmatched>', {}).get('statuses') == {'404': 5},
+          'unknown paths share the <unmatched> series')
+    check(failures, endpoints.get('POST /verify', {}).get('requests') == 1, 'POST is its own series')
+    check(failures, data['in_flight'] == 1, f"in flight is just this scrape ({data['in_flight']})")
+    recent = profile.get('recent', {})
+    check(failures, recent.get('requests') == 20 and recent['p50_ms'] <= recent['p95_ms'] <= recent['p99_ms'],
+          f"recent percentiles {recent.get('p50_ms')} / {recent.get('p95_ms')} / {recent.get('p99_ms')} ms")
+    check(failures, 'ingest_pending' in data and 'ingest_dropped' in data and 'cache_hits' in data,
+          'cache and ingest gauges included')
+
+    # Statements counted for a request equal the ones its connection ran
+    with app.test_request_context('/'):
+        conn = get_db_connection()
+        conn.execute('SELECT 1').fetchone()
+        cursor = conn.cursor()
+        cursor.execute('SELECT count(*) FROM users')
+        cursor.fetchall()
+        cursor.executemany('UPDATE users SET mac_address = ? WHERE id = ?', [(None, 1), (None, 2)])
+        check(failures, conn.queries == 3 and conn.query_seconds > 0,
+              f'execute, cursor.execute and executemany are counted ({conn.queries} statements)')
+        conn.rollback()
+    per_request = profile.get('db_queries_per_request', 0)
+    check(failures, per_request >= 1, f'profile requests ran {per_request} statements each')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    lines = [line for line in text.splitlines() if line and not line.startswith('#')]
+    malformed = [line for line in lines if not SAMPLE.match(line)]
+    check(failures, not malformed, f'{len(lines)} well-formed samples' + (f'; bad: {malformed[:3]}' if malformed else ''))
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('http_request_duration_seconds_bucket{method="GET",endpoint="/profile/<reg_no>"')]
+    check(failures, len(buckets) == len(BUCKETS) + 1 and buckets == sorted(buckets) and buckets[-1] == 20,
+          'histogram buckets are cumulative and +Inf holds every request')
+    check(failures, 'http_requests_total{method="GET",endpoint="<unmatched>",status="404"} 5' in text,
+          'status counter in Prometheus text')
+
+    # Overhead: the same requests with metrics on and off
+    timed = admin_client(app)
+    Config.METRICS_ENABLED = False
+    bare = admin_client(create_app())
+    Config.METRICS_ENABLED = True
+    # Interleaved rounds, best of each, so drift on the machine hits both sides
+    with_metrics = without = float('inf')
+    for _ in range(5):
+        with_metrics = min(with_metrics, per_request_us(timed, '/profile/R0001', OVERHEAD_REQUESTS))
+        without = min(without, per_request_us(bare, '/profile/R0001', OVERHEAD_REQUESTS))
+    overhead = with_metrics - without
+    print(f"      {without:.0f} us per request without metrics, {with_metrics:.0f} us with")
+    check(failures, overhead < max(100, without * 0.1), f'overhead {overhead:.0f} us per request')
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
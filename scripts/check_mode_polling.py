@@ -0,0 +1,167 @@
+"""
+/get_mode request-rate check
+
+Runs the app on a local port and simulates scanners asking for the mode, first
+the way old firmware does (a plain GET every 500 ms) and then with the ETag
+long-poll, while an admin flips enrollment on and off. Prints server requests
+per device-minute for both and exits non-zero if a long-polling device misses
+a mode change or asks more than once per change or wait timeout. It also
+checks that a long-poll whose wait runs out with no mode change gets a 304
+with no body and the same ETag.
+
+Usage: python scripts/check_mode_polling.py [devices] [seconds]
+"""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'mode_check.db')
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+from app import create_app
+from app.config import HardwareState
+
+LEGACY_INTERVAL_S = 0.5
+LONGPOLL_WAIT_S = 25
+TOGGLE_EVERY_S = 5
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Device:
+    """One simulated scanner polling /get_mode"""
+
+    def __init__(self, port, longpoll):
+        self.port = port
+        self.longpoll = longpoll
+        self.requests = 0
+        self.not_modified = 0
+        self.seen = []
+        self.etag = None
+
+    def run(self, stop):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=LONGPOLL_WAIT_S + 5)
+        while not stop.is_set():
+            if self.longpoll:
+                headers = {'If-None-Match': self.etag} if self.etag else {}
+                conn.request('GET', f'/get_mode?wait={LONGPOLL_WAIT_S}', headers=headers)
+            else:
+                conn.request('GET', '/get_mode')
+            response = conn.getresponse()
+            body = response.read()
+            self.requests += 1
+            if response.status == 304:
+                self.not_modified += 1
+            else:
+                self.etag = response.getheader('ETag')
+                action = json.loads(body)['action']
+                if not self.seen or self.seen[-1] != action:
+                    self.seen.append(action)
+            if not self.longpoll:
+                stop.wait(LEGACY_INTERVAL_S)
+        conn.close()
+
+
+def simulate(port, devices, seconds, longpoll):
+    """Run the devices for `seconds` while the mode toggles; returns the devices"""
+    HardwareState.set_attendance_mode()
+    stop = threading.Event()
+    fleet = [Device(port, longpoll) for _ in range(devices)]
+    threads = [threading.Thread(target=d.run, args=(stop,), daemon=True) for d in fleet]
+    for t in threads:
+        t.start()
+
+    toggles = 0
+    deadline = time.monotonic() + seconds
+    while not stop.wait(min(TOGGLE_EVERY_S, max(deadline - time.monotonic(), 0))):
+        if time.monotonic() >= deadline:
+            break
+        toggles += 1
+        if toggles % 2:
+            HardwareState.set_enroll_mode(toggles)
+        else:
+            HardwareState.set_attendance_mode()
+
+    stop.set()
+    # Release any long-poll still parked on the server with one last change
+    if HardwareState.get_mode()[0]['action'] == 'attendance':
+        HardwareState.set_enroll_mode(0)
+    HardwareState.set_attendance_mode()
+    for t in threads:
+        t.join(LONGPOLL_WAIT_S + 5)
+    return fleet, toggles
+
+
+def unchanged_wait(port, wait=0.3):
+    """(status, body, etag sent, etag returned, seconds held) for a long-poll with no mode change"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=wait + 5)
+    conn.request('GET', '/get_mode')
+    response = conn.getresponse()
+    response.read()
+    etag = response.getheader('ETag')
+    started = time.monotonic()
+    conn.request('GET', f'/get_mode?wait={wait}', headers={'If-None-Match': etag})
+    response = conn.getresponse()
+    body = response.read()
+    held = time.monotonic() - started
+    conn.close()
+    return response.status, body, etag, response.getheader('ETag'), held
+
+
+def report(label, fleet, seconds):
+    total = sum(d.requests for d in fleet)
+    per_minute = total / len(fleet) / (seconds / 60)
+    print(f'{label:<10} {total:>6} requests  {per_minute:>7.1f} per device-minute  '
+          f'{sum(d.not_modified for d in fleet):>5} x 304')
+    return per_minute
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f'{devices} devices, {seconds:.0f}s per mode, mode changes every {TOGGLE_EVERY_S}s\n')
+    legacy, _ = simulate(server.port, devices, seconds, longpoll=False)
+    legacy_rate = report('legacy', legacy, seconds)
+    longpoll, toggles = simulate(server.port, devices, seconds, longpoll=True)
+    longpoll_rate = report('long-poll', longpoll, seconds)
+    status, body, sent_etag, etag, held = unchanged_wait(server.port)
+    server.shutdown()
+
+    failures = []
+    if status != 304 or body or etag != sent_etag:
+        failures.append(f'an unchanged long-poll got {status} with {len(body)} bytes and ETag {etag} '
+                        f'(sent {sent_etag}), expected 304, no body and the same ETag')
+    elif held < 0.25:
+        failures.append(f'an unchanged long-poll returned after {held * 1000:.0f} ms instead of waiting')
+    expected = ['attendance', 'enroll'] * (toggles // 2 + 1)
+    for i, d in enumerate(longpoll):
+        # Every toggle must be delivered (the final reset may or may not be observed)
+        if d.seen[:toggles + 1] != expected[:toggles + 1]:
+            failures.append(f'device {i} saw {d.seen}, expected {expected[:toggles + 1]}')
+        # One request per mode change or expired wait, plus the first and the final release
+        allowed = toggles + seconds // LONGPOLL_WAIT_S + 2
+        if d.requests > allowed:
+            failures.append(f'device {i} made {d.requests} requests, expected at most {allowed:.0f}')
+
+    if failures:
+        print('\n' + '\n'.join(failures))
+        sys.exit(1)
+    print(f'\nLong-poll cuts /get_mode traffic {legacy_rate / longpoll_rate:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Network scan check
+
+Replaces ping and the ARP source with stand-ins and checks that:
+  - read_arp_table skips the /proc/net/arp header and incomplete entries
+    (flags 0x0 or an all-zero MAC) and normalises the MACs it keeps, and
+    parses `arp -a` output where there is no /proc/net/arp
+  - resolve_devices lists hosts in address order, with 'Unknown' for a host
+    missing from the ARP table
+  - iter_live_hosts never runs more pings at once than `concurrency`, and
+    yields each host as it answers rather than in sweep order
+  - an invalid CIDR is rejected, by iter_live_hosts and by /api/network-scan
+  - /api/network-scan streams each live host, then the resolved devices
+
+Usage: python scripts/check_network_scan.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'network_scan_check.db')
+
+import wake_on_lan
+from app import create_app
+
+PROC_NET_ARP = """\
+IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.10     0x1         0x2         aa:bb:cc:dd:ee:01     *        eth0
+192.168.1.2      0x1         0x2         AA:BB:CC:DD:EE:02     *        eth0
+192.168.1.3      0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.1.4      0x1         0x2         00:00:00:00:00:00     *        eth0
+192.168.1.5      0x1         0x0         aa:bb:cc:dd:ee:05     *        eth0
+"""
+ARP_A = """\
+Interface: 192.168.1.100 --- 0xb
+  Internet Address      Physical Address      Type
+  192.168.1.1           a-b-c-d-e-f           dynamic
+  192.168.1.20          00-1a-2b-3c-4d-5e     dynamic
+  192.168.1.255         ff-ff-ff-ff-ff-ff     static
+"""
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+class StubPing:
+    """Stands in for ping_host: records how many pings overlap, and answers
+    every host but `silent` after `delay(ip)` seconds"""
+
+    def __init__(self, delay, silent=()):
+        self.delay = delay
+        self.silent = set(silent)
+        self.active = self.peak = 0
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def __call__(self, ip, timeout=1):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay(ip))
+        with self._lock:
+            self.active -= 1
+            self.finished.append(ip)
+        return ip not in self.silent
+
+
+def check_arp_table(failures):
+    path = os.path.join(tempfile.mkdtemp(), 'arp')
+    with open(path, 'w') as f:
+        f.write(PROC_NET_ARP)
+    table = wake_on_lan.read_arp_table(path)
+    check(failures, table == {'192.168.1.10': 'AA:BB:CC:DD:EE:01', '192.168.1.2': 'AA:BB:CC:DD:EE:02'},
+          f'/proc/net/arp keeps only resolved neighbours: {table}')
+
+    real_run = subprocess.run
+    subprocess.run = lambda *args, **kwargs: subprocess.CompletedProcess(args, 0, stdout=ARP_A)
+    try:
+        table = wake_on_lan.read_arp_table(os.path.join(tempfile.mkdtemp(), 'missing'))
+    finally:
+        subprocess.run = real_run
+    check(failures, table == {'192.168.1.1': '0A:0B:0C:0D:0E:0F', '192.168.1.20': '00:1A:2B:3C:4D:5E',
+                              '192.168.1.255': 'FF:FF:FF:FF:FF:FF'},
+          f'`arp -a` output is parsed without /proc/net/arp: {table}')
+
+    real_read = wake_on_lan.read_arp_table
+    wake_on_lan.read_arp_table = lambda: {'192.168.1.10': 'AA:BB:CC:DD:EE:01', '192.168.1.2': 'AA:BB:CC:DD:EE:02'}
+    try:
+        devices = wake_on_lan.resolve_devices(['192.168.1.10', '192.168.1.9', '192.168.1.2'])
+    finally:
+        wake_on_lan.read_arp_table = real_read
+    check(failures, [(d['ip'], d['mac']) for d in devices] == [
+        ('192.168.1.2', 'AA:BB:CC:DD:EE:02'), ('192.168.1.9', 'Unknown'), ('192.168.1.10', 'AA:BB:CC:DD:EE:01')],
+        'resolve_devices lists hosts in address order with Unknown MACs')
+
+
+def check_sweep(failures):
+    # The first host is slow, so every other answer should overtake it; the rest
+    # take distinct times so the order they finish in is unambiguous
+    ping = StubPing(lambda ip: 1.0 if ip == '10.0.0.1' else 0.02 + int(ip.split('.')[-1]) * 0.01,
+                    silent={'10.0.0.7', '10.0.0.8'})
+    wake_on_lan.ping_host = ping
+    started = time.perf_counter()
+    yielded = []
+    first_after = None
+    for ip in wake_on_lan.iter_live_hosts('10.0.0.0/28', concurrency=4, timeout=1):
+        if first_after is None:
+            first_after = time.perf_counter() - started
+        yielded.append(ip)
+
+    hosts = [f'10.0.0.{n}' for n in range(1, 15)]
+    check(failures, sorted(yielded) == sorted(set(hosts) - ping.silent),
+          f'{len(yielded)} of {len(hosts)} hosts answer, the silent ones are left out')
+    check(failures, ping.peak == 4, f'at most 4 pings run at once (peak {ping.peak})')
+    check(failures, yielded == [ip for ip in ping.finished if ip not in ping.silent],
+          'hosts are yielded in the order they answer')
+    check(failures, yielded[0] != '10.0.0.1' and yielded[-1] == '10.0.0.1',
+          f'the slow first host comes last, not in sweep order ({yielded[0]} first)')
+    check(failures, first_after < 0.5, f'the first host is yielded after {first_after * 1000:.0f} ms, '
+                                       'before the slow ping finishes')
+
+    for cidr in ('10.0.0.300/24', 'not-a-network'):
+        try:
+            next(wake_on_lan.iter_live_hosts(cidr))
+            rejected = False
+        except ValueError:
+            rejected = True
+        check(failures, rejected, f'iter_live_hosts rejects {cidr!r}')
+
+
+def check_api(failures):
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'Check admin'
+        session['role'] = 'admin'
+
+    for cidr, error in (('10.0.0.300/24', 'Invalid CIDR'), ('10.0.0.0/16', 'too large')):
+        response = client.get(f'/api/network-scan?cidr={cidr}')
+        check(failures, response.status_code == 400 and error in response.get_json()['error'],
+              f'/api/network-scan refuses {cidr} ({response.status_code})')
+
+    wake_on_lan.ping_host = StubPing(lambda ip: 0.01, silent={f'10.0.0.{n}' for n in range(3, 15)})
+    wake_on_lan.read_arp_table = lambda: {'10.0.0.2': 'AA:BB:CC:DD:EE:02'}
+    response = client.get('/api/network-scan?cidr=10.0.0.0/28')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    check(failures, lines[:-1] in ([{'ip': '10.0.0.1', 'status': 'online'}, {'ip': '10.0.0.2', 'status': 'online'}],
+                                   [{'ip': '10.0.0.2', 'status': 'online'}, {'ip': '10.0.0.1', 'status': 'online'}]),
+          'each live host is streamed as a line of its own')
+    check(failures, lines[-1] == {'done': True, 'devices': [
+        {'ip': '10.0.0.1', 'mac': 'Unknown', 'status': 'online'},
+        {'ip': '10.0.0.2', 'mac': 'AA:BB:CC:DD:EE:02', 'status': 'online'}]},
+        'the last line lists the devices with their MACs')
+
+
+def main():
+    failures = []
+    check_arp_table(failures)
+    check_sweep(failures)
+    check_api(failures)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Query plan check
+
+Runs the queries issued by models.py and the analytics, profile and search
+routes against a scratch database, captures every SELECT through SQLite's
+trace callback and runs EXPLAIN QUERY PLAN on it. Exits non-zero if any of
+them falls back to a full scan of a table.
+
+Usage: python scripts/check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'plan_check.db')
+
+from flask import session
+from app import create_app, models
+from app.db import get_db_connection
+from app.routes import analytics, profile, search
+from app import stats
+
+# Tiny lookup tables where a scan is cheaper than any index
+SMALL_TABLES = {'departments', 'schema_version', 'sqlite_master'}
+
+# Scenarios that read every row on purpose, with the reason
+KNOWN_SCANS = {
+    'models.get_all_users': 'dashboard lists every user',
+    'models.get_all_attendance': 'returns every row by design',
+    'models.get_total_users': 'COUNT(*) over users',
+    'stats.get_department_stats_all': 'one grouped pass over students for every department',
+    'analytics.get_attendance_stats': 'role list from users; top performers padded from users on a quiet system',
+    'profile.student_directory': 'directory lists every student',
+    'search.api_search_attendance?name': 'a two-character name is too short for the trigram index; LIKE',
+    'search.api_export_search': ('role-only export reads all attendance in timestamp order; the workbook is '
+                                 'built in a spooled temporary file and sent once complete'),
+}
+
+SCAN_STEP = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+# Subqueries SQLite evaluates into a temporary result; scanning one reads no table
+SUBQUERY_STEP = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+
+def seed():
+    """Insert a few rows so every code path issues its queries"""
+    conn = get_db_connection()
+    conn.execute("INSERT INTO departments (name, hod_name) VALUES ('CS', 'Dr. HOD')")
+    conn.commit()
+    conn.close()
+    models.add_user('Alice', 'R001', 'student', 'pw', 'CS', '2024')
+    models.add_user('Bob', 'R002', 'student', 'pw', 'CS', '2023')
+    models.add_user('Carol', 'S001', 'staff', 'pw', 'CS', None)
+    models.log_attendance('Alice', 'R001')
+    models.log_attendance('Bob', 'R002')
+
+
+def view(app, endpoint):
+    """Call a view function directly inside the current request context"""
+    return lambda: app.view_functions[endpoint]()
+
+
+def scenarios(app):
+    """(label, request path, callable) for every query site covered by the check"""
+    return [
+        ('models.get_all_departments', '/', models.get_all_departments),
+        ('models.get_department_stats', '/', lambda: models.get_department_stats('CS')),
+        ('models.get_batch_stats', '/', models.get_batch_stats),
+        ('stats.get_department_stats_all', '/', stats.get_department_stats_all),
+        ('stats.get_batch_stats_all', '/', stats.get_batch_stats_all),
+        ('models.get_users_by_department', '/', lambda: models.get_users_by_department('CS')),
+        ('models.get_users_by_batch', '/', lambda: models.get_users_by_batch('2024')),
+        ('models.get_all_users', '/', models.get_all_users),
+        ('models.get_user_by_credentials', '/', lambda: models.get_user_by_credentials('Alice', 'pw')),
+        ('models.get_user_by_finger_id', '/', lambda: models.get_user_by_finger_id(1)),
+        ('models.get_next_finger_id', '/', models.get_next_finger_id),
+        ('models.get_total_users', '/', models.get_total_users),
+        ('models.get_all_attendance', '/', models.get_all_attendance),
+        ('models.get_recent_attendance', '/', lambda: models.get_recent_attendance(10)),
+        ('models.get_attendance_page', '/', lambda: models.get_attendance_page()),
+        ('models.get_attendance_page?filters', '/',
+         lambda: models.get_attendance_page(('2024-06-01 00:00:00', 10), date_from='2024-01-01',
+                                            department='CS', batch_year='2024')),
+        ('models.get_batch_years', '/', models.get_batch_years),
+        ('models.iter_attendance?dates', '/',
+         lambda: list(models.iter_attendance(date_from='2024-01-01', date_to='2024-12-31',
+                                             department='CS', batch_year='2024'))),
+        ('models.get_today_attendance_count', '/', models.get_today_attendance_count),
+        ('analytics.get_attendance_stats', '/', analytics.get_attendance_stats),
+        ('analytics.get_monthly_trends', '/', analytics.get_monthly_trends),
+        ('profile.get_student_details', '/', lambda: profile.get_student_details('R001')),
+        ('profile.search_students', '/search-students?q=Al', view(app, 'profile.search_students')),
+        ('profile.search_students?fts', '/search-students?q=Ali', view(app, 'profile.search_students')),
+        ('profile.student_directory', '/student-directory', view(app, 'profile.student_directory')),
+        ('search.api_search_attendance', '/api/search-attendance',
+         view(app, 'search.api_search_attendance')),
+        ('search.api_search_attendance?cursor', '/api/search-attendance?cursor=' + search.encode_cursor(
+            {'timestamp': '2030-01-01 00:00:00', 'log_id': 1 << 40}, 'next'),
+         view(app, 'search.api_search_attendance')),
+        ('search.api_search_attendance?name', '/api/search-attendance?name=Al',
+         view(app, 'search.api_search_attendance')),
+        ('search.api_search_attendance?fts', '/api/search-attendance?name=Ali&reg_no=R00',
+         view(app, 'search.api_search_attendance')),
+        ('search.api_search_attendance?dates', '/api/search-attendance?date_from=2024-01-01&date_to=2024-12-31',
+         view(app, 'search.api_search_attendance')),
+        ('search.api_export_search', '/api/export-search?role=student',
+         view(app, 'search.api_export_search')),
+    ]
+
+
+def capture(app, path, func):
+    """Run func in a request context and return the SELECTs it executed"""
+    statements = []
+    with app.test_request_context(path):
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+        conn = get_db_connection()
+        conn.set_trace_callback(statements.append)
+        try:
+            func()
+        finally:
+            conn.set_trace_callback(None)
+        plans = [(sql, explain(conn, sql)) for sql in statements
+                 if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+    return plans
+
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def full_scans(sql, plan):
+    """Plan steps that read a whole table (an index-ordered scan stopped by LIMIT is fine)"""
+    bad = []
+    subqueries = {match.group(1) for match in map(SUBQUERY_STEP.match, plan) if match}
+    for step in plan:
+        match = SCAN_STEP.match(step)
+        if not match or match.group(1) in SMALL_TABLES or match.group(1) in subqueries:
+            continue
+        if 'INDEX' in step and re.search(r'\bLIMIT\b', sql, re.IGNORECASE):
+            continue
+        bad.append(step)
+    return bad
+
+
+def main():
+    app = create_app()
+    seed()
+
+    failures = 0
+    for label, path, func in scenarios(app):
+        plans = capture(app, path, func)
+        scans = [(sql, step) for sql, plan in plans for step in full_scans(sql, plan)]
+        if not scans:
+            print(f'ok    {label} ({len(plans)} queries)')
+        elif label in KNOWN_SCANS:
+            print(f'known {label}: {KNOWN_SCANS[label]}')
+        else:
+            failures += 1
+            print(f'FAIL  {label}')
+            for sql, step in scans:
+                print(f'        {step}')
+                print(f'        {" ".join(sql.split())}')
+
+    if failures:
+        print(f'\n{failures} scenario(s) fall back to a full table scan')
+        sys.exit(1)
+    print('\nNo unexpected full table scans')
+
+
+if __name__ == '__main__':
+    main()
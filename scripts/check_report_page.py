@@ -0,0 +1,132 @@
+"""
+Attendance report page check
+
+Renders /attendance_report over a small history and again after it has grown
+many times over, and checks that:
+  - the page holds one page of rows, and its size and render time do not
+    grow with the history, with or without filters that match few people
+  - "Load older records" through /api/attendance-report continues exactly
+    where the page stopped, with no gaps or repeats
+  - the date, department, batch and name filters select the expected rows
+
+Usage: python scripts/check_report_page.py [small_rows] [large_rows]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'report_page_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+
+STUDENTS = 400
+SMALL_GROUP = 4
+# Filters that match few people: their pages must not get slower as the history grows either
+SELECTIVE = ['?department=MECH', '?batch_year=2022', '?name=Student 7', '?name=Nobody']
+START = datetime(2020, 1, 1, 8, 0, 0)
+ROW = re.compile(r'<tr class="hover:bg-gray-50')
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def seed(start, rows):
+    """Append `rows` scans, one a minute, after the first `start`"""
+    conn = get_db_connection()
+    if start == 0:
+        conn.executemany("INSERT INTO departments (name) VALUES (?)", [('CS',), ('EEE',), ('MECH',)])
+        # The first few students make up a small department and batch, for the selective filters
+        conn.executemany("INSERT INTO users (name, reg_no, role, password, department, batch_year) "
+                         "VALUES (?, ?, 'student', '', ?, ?)",
+                         [(f'Student {n}', f'R{n:04d}',
+                           'MECH' if n < SMALL_GROUP else ('CS', 'EEE')[n % 2],
+                           '2022' if n < SMALL_GROUP else ('2023', '2024')[n // 200])
+                          for n in range(STUDENTS)])
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     ((f'Student {i % STUDENTS}', f'R{i % STUDENTS:04d}',
+                       (START + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'))
+                      for i in range(start, start + rows)))
+    conn.commit()
+    conn.close()
+
+
+def render(client, query=''):
+    """(bytes, best-of-five seconds) for the report page"""
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        body = client.get('/attendance_report' + query).data
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return body, best
+
+
+def main():
+    small = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    large = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+    failures = []
+
+    seed(0, small)
+    small_body, small_time = render(client)
+    small_selective = [render(client, query)[1] for query in SELECTIVE]
+    seed(small, large - small)
+    large_body, large_time = render(client)
+    large_selective = [render(client, query)[1] for query in SELECTIVE]
+
+    table = large_body.decode().split('id="reportRows"')[1].split('</tbody>')[0]
+    rows = len(ROW.findall(table))
+    check(failures, rows == Config.REPORT_PAGE_SIZE, f'the page holds {rows} rows')
+    check(failures, abs(len(large_body) - len(small_body)) < 1024,
+          f'page size {len(small_body)} bytes at {small} rows, {len(large_body)} bytes at {large}')
+    check(failures, large_time < small_time * 2 + 0.005,
+          f'render time {small_time * 1000:.1f} ms at {small} rows, {large_time * 1000:.1f} ms at {large}')
+    for query, before, after in zip(SELECTIVE, small_selective, large_selective):
+        check(failures, after < before * 2 + 0.005,
+              f'{query} renders in {before * 1000:.1f} ms at {small} rows, {after * 1000:.1f} ms at {large}')
+
+    # Walk ten pages through the JSON endpoint and compare with the full ordering
+    cursor = re.search(r'data-cursor="([^"]+)"', large_body.decode()).group(1)
+    ids = [int(i) for i in re.findall(r'<td class="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">(\d+)</td>',
+                                      large_body.decode())]
+    for _ in range(10):
+        data = client.get(f'/api/attendance-report?cursor={cursor}').get_json()
+        ids.extend(log['log_id'] for log in data['logs'])
+        cursor = data['next_cursor']
+    check(failures, ids == list(range(large, large - len(ids), -1)), f'load more continues in order ({len(ids)} rows)')
+
+    day = client.get('/api/attendance-report?date_from=2020-01-02&date_to=2020-01-02').get_json()['logs']
+    check(failures, day and all(log['timestamp'].startswith('2020-01-02') for log in day), 'date filter')
+    cs = client.get('/api/attendance-report?department=CS').get_json()['logs']
+    check(failures, cs and all(int(log['reg_no'][1:]) % 2 == 0 for log in cs), 'department filter')
+    mech = client.get('/api/attendance-report?department=MECH').get_json()['logs']
+    check(failures, mech and all(int(log['reg_no'][1:]) < SMALL_GROUP for log in mech), 'small department filter')
+    batch = client.get('/api/attendance-report?batch_year=2023').get_json()['logs']
+    check(failures, batch and all(SMALL_GROUP <= int(log['reg_no'][1:]) < 200 for log in batch), 'batch filter')
+    named = client.get('/api/attendance-report?name=Student 7').get_json()['logs']
+    check(failures, named and all('Student 7' in log['name'] for log in named), 'name filter')
+    empty, _ = render(client, '?date_from=2030-01-01')
+    check(failures, b'No records match these filters' in empty, 'an empty result says the filters matched nothing')
+    check(failures, client.get('/attendance_report?cursor=junk').status_code == 400, 'a malformed cursor is rejected')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
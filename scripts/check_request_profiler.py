@@ -0,0 +1,140 @@
+"""
+Request profiler check
+
+Over generated data, checks that:
+  - ?_profile=1 and X-Profile: 1 profile a request only for admins, and the
+    saved profile has the route, arguments, status and stacks reaching into
+    the view
+  - PROFILER_SAMPLE_RATE profiles requests nobody asked about
+  - /profiles lists the profiles, /profiles/<id> draws the call tree and the
+    collapsed stacks download in the usual format; unknown or malformed
+    ids are 404s
+  - only the newest PROFILE_MAX_COUNT profiles are kept
+Then it times the profiler's request hook on a request that is not
+profiled, to show that the idle profiler costs next to nothing.
+
+Usage: python scripts/check_request_profiler.py [attendance_rows]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database and profile store before anything reads Config
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE'] = os.path.join(scratch, 'request_profiler_check.db')
+os.environ['PROFILE_DIR'] = os.path.join(scratch, 'profiles')
+os.environ['PROFILE_MAX_COUNT'] = '3'
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+os.environ['CACHE_ENABLED'] = 'false'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+from app.request_profiler import load_profile, _begin_request
+from generate_data import generate
+
+HOOK_CALLS = 100_000
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def client_for(app, role=None):
+    client = app.test_client()
+    if role:
+        with client.session_transaction() as session:
+            session['username'] = f'Check {role}'
+            session['role'] = role
+    return client
+
+
+def saved(profile_id, timeout=5):
+    """The profile once the sampler thread has written it"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        profile = load_profile(profile_id)
+        if profile is not None:
+            return profile
+        time.sleep(0.01)
+    return None
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    failures = []
+    app = create_app()
+    conn = get_db_connection()
+    generate(conn, users=1000, attendance=rows, seed=1, today=date.today())
+    conn.close()
+
+    staff = client_for(app, 'staff')
+    response = staff.get('/analytics?_profile=1')
+    check(failures, response.status_code == 200 and 'X-Profile-Id' not in response.headers,
+          'a non-admin asking for a profile is served without one')
+
+    admin = client_for(app, 'admin')
+    response = admin.get('/api/attendance-trends?days=30&_profile=1')
+    profile_id = response.headers.get('X-Profile-Id')
+    profile = saved(profile_id) if profile_id else None
+    check(failures, profile is not None, f'?_profile=1 saved profile {profile_id}')
+    if profile is None:
+        sys.exit(1)
+    check(failures, profile['route'] == '/api/attendance-trends' and profile['args'] == {'days': '30'}
+          and profile['status'] == 200 and profile['trigger'] == 'admin',
+          f"route, arguments and status recorded ({profile['route']} {profile['args']} {profile['status']})")
+    check(failures, profile['samples'] > 0 and any('app/routes/analytics.py' in stack for stack in profile['stacks']),
+          f"{profile['samples']} samples over {profile['duration_ms']} ms reach into the view")
+    check(failures, all(stack.split(';')[0].startswith('Flask.wsgi_app') for stack in profile['stacks']),
+          'stacks start at the WSGI entry')
+
+    by_header = admin.get('/dashboard', headers={'X-Profile': '1'}).headers.get('X-Profile-Id')
+    check(failures, by_header is not None and saved(by_header) is not None, 'X-Profile: 1 header also profiles')
+
+    Config.PROFILER_SAMPLE_RATE = 1
+    sampled = client_for(app).get('/get_mode').headers.get('X-Profile-Id')
+    Config.PROFILER_SAMPLE_RATE = 0
+    sampled_profile = saved(sampled) if sampled else None
+    check(failures, sampled_profile is not None and sampled_profile['trigger'] == 'sampled',
+          'PROFILER_SAMPLE_RATE profiles anonymous requests')
+
+    listing = admin.get('/profiles').get_data(as_text=True)
+    check(failures, profile_id in listing and '/api/attendance-trends' in listing, '/profiles lists the profile')
+    detail = admin.get(f'/profiles/{profile_id}')
+    check(failures, detail.status_code == 200 and 'get_monthly_trends' in detail.get_data(as_text=True),
+          '/profiles/<id> draws the call tree down to the view')
+    collapsed = admin.get(f'/profiles/{profile_id}/collapsed.txt').get_data(as_text=True).splitlines()
+    check(failures, collapsed and all(re.match(r'^\S.* \d+$', line) for line in collapsed),
+          f'{len(collapsed)} collapsed stack lines')
+    check(failures, admin.get('/profiles/20200101-000000-000000-beef').status_code == 404, 'unknown id is a 404')
+    check(failures, admin.get('/profiles/..%2Fprofiles').status_code == 404, 'malformed id is a 404')
+    check(failures, staff.get('/profiles').status_code == 302, 'non-admins are sent away from /profiles')
+
+    for _ in range(4):
+        last = admin.get('/home?_profile=1').headers['X-Profile-Id']
+        saved(last)
+    kept = sorted(os.listdir(Config.PROFILE_DIR))
+    check(failures, len(kept) == Config.PROFILE_MAX_COUNT and f'{last}.json' in kept,
+          f'only the newest {Config.PROFILE_MAX_COUNT} profiles are kept ({len(kept)} files)')
+
+    # Idle cost: the hooks themselves, run on a request nobody asked to profile
+    with app.test_request_context('/get_mode'):
+        started = time.perf_counter()
+        for _ in range(HOOK_CALLS):
+            _begin_request()
+        idle_us = (time.perf_counter() - started) / HOOK_CALLS * 1e6
+    check(failures, idle_us < 5, f'idle profiler costs {idle_us:.2f} us per request')
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Search pagination check
+
+Seeds a scratch database with synthetic attendance, then walks
+/api/search-attendance page by page with the cursor tokens and checks that:
+  - the pages concatenate to exactly the rows an ORDER BY over the whole
+    result gives, with no gaps or repeats, including when timestamps tie
+  - Previous returns the same rows as the page that was left
+  - page 500 takes about as long as page 1 (it would grow with OFFSET)
+  - the total is exact under the cap, and an estimate or a floor above it
+  - a malformed cursor or date is rejected
+
+Usage: python scripts/check_search_paging.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'search_paging_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+
+STUDENTS = 400
+START = datetime(2020, 1, 1, 8, 0, 0)
+PER_PAGE = 20
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def seed(rows):
+    """One scan every 30 seconds, stamped to the minute so pairs of rows share a timestamp"""
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password) VALUES (?, ?, ?, '')",
+                     [(f'Student {n}', f'R{n:04d}', 'staff' if n < 10 else 'student') for n in range(STUDENTS)])
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     ((f'Student {i % STUDENTS}', f'R{i % STUDENTS:04d}',
+                       (START + timedelta(minutes=i // 2)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def get(client, query):
+    started = time.perf_counter()
+    data = client.get(f'/api/search-attendance?per_page={PER_PAGE}&{query}').get_json()
+    return data, time.perf_counter() - started
+
+
+def best_of(client, query, runs=20):
+    return min(get(client, query)[1] for _ in range(runs))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    app = create_app()
+    seed(rows)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+
+    failures = []
+    conn = get_db_connection()
+    expected = [row[0] for row in conn.execute('''
+        SELECT a.log_id FROM attendance a JOIN users u ON a.reg_no = u.reg_no
+        ORDER BY a.timestamp DESC, a.log_id DESC LIMIT ?
+    ''', (PER_PAGE * 500,))]
+    conn.close()
+
+    seen = []
+    cursors = {}
+    page, _ = get(client, '')
+    first_total = (page['total_count'], page['total_kind'])
+    for number in range(1, 501):
+        seen.extend(row['log_id'] for row in page['results'])
+        cursors[number] = page
+        if number < 500:
+            page, _ = get(client, f"cursor={page['next_cursor']}")
+    check(failures, seen == expected, f'500 pages match ORDER BY timestamp, log_id ({len(seen)} rows)')
+
+    back, _ = get(client, f"cursor={cursors[251]['prev_cursor']}")
+    check(failures, back['results'] == cursors[250]['results'], 'Previous from page 251 returns page 250')
+    check(failures, cursors[1]['prev_cursor'] is None, 'page 1 has no Previous')
+    check(failures, 'total_count' not in cursors[2], 'later pages do not recount the total')
+
+    page_1 = best_of(client, '')
+    page_500 = best_of(client, f"cursor={cursors[499]['next_cursor']}")
+    check(failures, page_500 < page_1 * 2,
+          f'page 500 costs about what page 1 does ({page_500 * 1000:.2f} ms vs {page_1 * 1000:.2f} ms)')
+    conn = get_db_connection()
+    started = time.perf_counter()
+    conn.execute('''
+        SELECT a.log_id FROM attendance a JOIN users u ON a.reg_no = u.reg_no
+        ORDER BY a.timestamp DESC LIMIT ? OFFSET ?
+    ''', (PER_PAGE, PER_PAGE * 499)).fetchall()
+    conn.close()
+    print(f'      (the same page by OFFSET: {(time.perf_counter() - started) * 1000:.2f} ms)')
+
+    check(failures, first_total == (rows, 'estimate'),
+          f'unfiltered total past the cap comes from the rollup ({first_total[0]} {first_total[1]})')
+    exact, _ = get(client, 'count=exact')
+    check(failures, (exact['total_count'], exact['total_kind']) == (rows, 'exact'), 'count=exact counts every row')
+    named, _ = get(client, 'name=Student 1')
+    check(failures, named['total_kind'] == 'at_least' and named['total_count'] == Config.SEARCH_COUNT_CAP,
+          'a name filter past the cap reports the cap as a floor')
+    small, _ = get(client, 'role=staff&date_from=2020-01-01&date_to=2020-01-01')
+    check(failures, small['total_kind'] == 'exact', f"a small result is counted exactly ({small['total_count']})")
+
+    bad = client.get('/api/search-attendance?cursor=not-a-cursor')
+    check(failures, bad.status_code == 400, 'a malformed cursor is rejected')
+    for path in ('/api/search-attendance', '/api/export-search'):
+        bad = client.get(f'{path}?date_from=2020-13-45')
+        check(failures, bad.status_code == 400 and 'date_from' in bad.get_json()['error'],
+              f'{path} rejects a malformed date')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
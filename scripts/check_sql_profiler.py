@@ -0,0 +1,126 @@
+"""
+SQL profiler check
+
+With SQL_PROFILER on, over generated data, checks that:
+  - statement shapes ignore literals, whitespace and IN-list length
+  - a route that runs one query per row is flagged in X-SQL-Repeated and
+    in the log, while the summary headers count every statement
+  - slow statements are logged with their EXPLAIN QUERY PLAN
+Then it requests every GET route as an admin and lists each route's
+statements, shapes and repeated shapes, so an N+1 pattern that creeps into
+a page shows up here.
+
+Usage: python scripts/check_sql_profiler.py [attendance_rows]
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'sql_profiler_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+os.environ['CACHE_ENABLED'] = 'false'
+os.environ['SQL_PROFILER'] = 'true'
+
+from app import create_app
+from app.config import Config
+from app.db import get_db_connection
+from app.sql_profiler import normalize
+from bench_suite import endpoint_paths, sample_values
+from generate_data import generate
+
+PER_ROW_USERS = 20
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def per_row_lookups():
+    """Test route: one query for a list, then one more per row"""
+    conn = get_db_connection()
+    ids = [row['id'] for row in conn.execute('SELECT id FROM users ORDER BY id LIMIT ?', (PER_ROW_USERS,))]
+    names = [conn.execute('SELECT name FROM users WHERE id = ?', (user_id,)).fetchone()['name'] for user_id in ids]
+    conn.close()
+    return {'names': names}
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    failures = []
+    app = create_app()
+    app.add_url_rule('/_check/per-row', 'check_per_row', per_row_lookups)
+    today = date.today()
+    conn = get_db_connection()
+    generate(conn, users=500, attendance=rows, seed=1, today=today)
+    values = sample_values(conn, today)
+    conn.close()
+
+    check(failures, normalize("SELECT * FROM users WHERE id = 7 AND name = 'O''Neil'")
+          == normalize('SELECT *  FROM users\n WHERE id = ? AND name = ?'), 'literals and whitespace normalize away')
+    check(failures, normalize('SELECT 1 FROM t WHERE id IN (?, ?, ?)') == normalize('SELECT 1 FROM t WHERE id IN (?,?)'),
+          'IN lists of different lengths share a shape')
+    check(failures, normalize('SELECT * FROM t2 WHERE x = 1.5') == 'SELECT * FROM t2 WHERE x = ?',
+          'numbers inside identifiers are kept')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'System Admin'
+        session['role'] = 'admin'
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        response = client.get('/_check/per-row')
+    profile = response.headers.get('X-SQL-Profile', '')
+    repeated = response.headers.getlist('X-SQL-Repeated')
+    check(failures, f'statements={PER_ROW_USERS + 1};' in profile, f'summary counts every statement ({profile})')
+    check(failures, len(repeated) == 1 and repeated[0].startswith(f'{PER_ROW_USERS}x ')
+          and 'WHERE id = ?' in repeated[0], f'per-row query flagged ({repeated})')
+    check(failures, f'GET /_check/per-row ran {PER_ROW_USERS}x' in log.getvalue(), 'per-row query logged with its route')
+    check(failures, response.headers.get('Server-Timing', '').startswith('db;dur='), 'Server-Timing header')
+
+    single = client.get(f"/profile/{values['reg_no']}")
+    check(failures, single.status_code == 200 and not single.headers.getlist('X-SQL-Repeated'),
+          'a page of distinct lookups is not flagged')
+
+    Config.SQL_SLOW_MS = 0
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        client.get(f"/api/search-attendance?name={values['surname']}")
+    Config.SQL_SLOW_MS = 100
+    plans = re.findall(r'\[SQL PROFILER\]\s{5}(.*)', log.getvalue())
+    check(failures, 'Slow statement in GET /api/search-attendance' in log.getvalue()
+          and any(re.match(r'\s*(SEARCH|SCAN|USE|CO-ROUTINE|MATERIALIZE)', p) for p in plans),
+          f'slow statements logged with their plans ({len(plans)} plan lines)')
+
+    print(f"\n{'route':<55} {'statements':>10} {'shapes':>7} {'ms':>8}  repeated")
+    paths, _ = endpoint_paths(app, values)
+    flagged = []
+    paths.pop('GET /_check/per-row')
+    for label, path in sorted(paths.items()):
+        # Log lines and error tracebacks would break up the table
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            response = client.get(path)
+            response.close()
+        fields = dict(part.split('=') for part in response.headers.get('X-SQL-Profile', '').split('; ') if part)
+        repeats = response.headers.getlist('X-SQL-Repeated')
+        if repeats:
+            flagged.append(label)
+        print(f"{label:<55} {fields.get('statements', '-'):>10} {fields.get('shapes', '-'):>7} {fields.get('ms', '-'):>8}"
+              f"  {'; '.join(r[:80] for r in repeats) or '-'}")
+    print(f"\n{len(flagged)} route(s) with repeated statement shapes" + (f": {', '.join(flagged)}" if flagged else ''))
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Per-student statistics check
+
+Feeds a scratch database attendance in the orders the triggers have to
+handle: in time order, late scans for earlier days, deletes, and edits that
+move a scan to another day or person. After each phase it checks that
+student_stats matches a full rebuild from the raw rows, and that a streak
+agrees with one counted day by day in Python. It then checks that
+top performers match the old GROUP BY over all attendance and are read off the
+total_sessions index, and times both.
+
+Usage: python scripts/check_student_stats.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'student_stats_check.db')
+os.environ['INGEST_WRITE_BEHIND'] = 'false'
+
+from app import create_app
+from app.db import get_db_connection
+from app.migrations import rebuild_student_stats
+from app.student_stats import get_top_performers, get_student_stats
+
+STUDENTS = 300
+STATS_QUERY = 'SELECT * FROM student_stats ORDER BY reg_no'
+OLD_TOP_QUERY = '''
+    SELECT u.name, u.reg_no, COUNT(a.log_id) as attendance_count
+    FROM users u
+    LEFT JOIN attendance a ON u.reg_no = a.reg_no
+    WHERE u.role = 'student'
+    GROUP BY u.reg_no, u.name
+    ORDER BY attendance_count DESC
+    LIMIT 10
+'''
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def stamp(day, minute):
+    return (datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def matches_rebuild(conn):
+    """Whether the trigger-maintained table equals a fresh rebuild (left unchanged)"""
+    stored = [tuple(row) for row in conn.execute(STATS_QUERY)]
+    conn.execute('SAVEPOINT rebuild')
+    rebuild_student_stats(conn)
+    rebuilt = [tuple(row) for row in conn.execute(STATS_QUERY)]
+    conn.execute('ROLLBACK TO rebuild')
+    conn.execute('RELEASE rebuild')
+    return stored == rebuilt, len(stored)
+
+
+def python_streak(conn, reg_no):
+    days = sorted({row[0] for row in conn.execute('SELECT day FROM attendance WHERE reg_no = ?', (reg_no,))})
+    streak = 1
+    for previous, day in zip(reversed(days[:-1]), reversed(days)):
+        if date.fromisoformat(day) - date.fromisoformat(previous) != timedelta(days=1):
+            break
+        streak += 1
+    return streak if days else 0
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    app = create_app()
+    rng = random.Random(20)
+    failures = []
+    today = date.today()
+    first_day = today - timedelta(days=rows // STUDENTS)
+
+    conn = get_db_connection()
+    conn.executemany("INSERT INTO users (name, reg_no, role, password) VALUES (?, ?, ?, '')",
+                     [(f'Student {n}', f'R{n:04d}', 'staff' if n < 5 else 'student') for n in range(STUDENTS)])
+
+    # In time order: each day a random subset of students scans one to three times
+    scans = []
+    day = first_day
+    while len(scans) < rows and day <= today:
+        for n in rng.sample(range(STUDENTS), STUDENTS // 2):
+            for minute in range(rng.randint(1, 3)):
+                scans.append((f'Student {n}', f'R{n:04d}', stamp(day, minute * 60 + n % 60)))
+        day += timedelta(days=1)
+    started = time.perf_counter()
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')", scans)
+    conn.commit()
+    print(f'      inserted {len(scans)} scans in time order in {time.perf_counter() - started:.1f} s')
+    same, people = matches_rebuild(conn)
+    check(failures, same, f'in-order inserts match a rebuild ({people} people)')
+
+    # A long streak up to today, then a late scan filling a gap in it
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES ('Late Joiner', 'L0001', ?, 'Present')",
+                     [(stamp(today - timedelta(days=d), 600),) for d in range(12) if d != 5])
+    conn.commit()
+    before = get_student_stats('L0001')['current_streak']
+    conn.execute("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES ('Late Joiner', 'L0001', ?, 'Present')",
+                 (stamp(today - timedelta(days=5), 600),))
+    conn.commit()
+    after = get_student_stats('L0001')
+    check(failures, before == 5 and after['current_streak'] == python_streak(conn, 'L0001') == 12,
+          f"a late scan joins two streaks ({before} -> {after['current_streak']} days)")
+
+    # Late scans for random earlier days
+    conn.executemany("INSERT INTO attendance (name, reg_no, timestamp, status) VALUES (?, ?, ?, 'Present')",
+                     [(f'Student {n}', f'R{n:04d}', stamp(first_day + timedelta(days=rng.randrange((today - first_day).days)), 700))
+                      for n in (rng.randrange(STUDENTS) for _ in range(200))])
+    conn.commit()
+    same, _ = matches_rebuild(conn)
+    check(failures, same, 'out-of-order inserts match a rebuild')
+
+    # Deletes, including every scan of one student
+    ids = [row[0] for row in conn.execute('SELECT log_id FROM attendance ORDER BY random() LIMIT 200')]
+    conn.executemany('DELETE FROM attendance WHERE log_id = ?', [(i,) for i in ids])
+    conn.execute("DELETE FROM attendance WHERE reg_no = 'R0011'")
+    conn.commit()
+    same, _ = matches_rebuild(conn)
+    check(failures, same and get_student_stats('R0011')['total_sessions'] == 0, 'deletes match a rebuild')
+
+    # Edits moving scans to another day or another person
+    ids = [row[0] for row in conn.execute('SELECT log_id FROM attendance ORDER BY random() LIMIT 100')]
+    conn.executemany("UPDATE attendance SET timestamp = datetime(timestamp, '-3 days') WHERE log_id = ?", [(i,) for i in ids[:50]])
+    conn.executemany("UPDATE attendance SET reg_no = 'R0020' WHERE log_id = ?", [(i,) for i in ids[50:]])
+    conn.commit()
+    same, _ = matches_rebuild(conn)
+    check(failures, same, 'edits match a rebuild')
+
+    streaks_ok = all(get_student_stats(f'R{n:04d}')['streak'] == python_streak(conn, f'R{n:04d}')
+                     for n in range(0, STUDENTS, 7))
+    check(failures, streaks_ok, 'stored streaks agree with a day-by-day count')
+
+    # Top performers: same answer as the old query, off the index
+    with app.app_context():
+        started = time.perf_counter()
+        new_top = get_top_performers(10)
+        new_ms = (time.perf_counter() - started) * 1000
+        statements = []
+        traced = get_db_connection()
+        traced.set_trace_callback(statements.append)
+        get_top_performers(10)
+        traced.set_trace_callback(None)
+        plan = ' '.join(row['detail'] for sql in statements for row in traced.execute('EXPLAIN QUERY PLAN ' + sql))
+    started = time.perf_counter()
+    old_top = [dict(row) for row in conn.execute(OLD_TOP_QUERY)]
+    old_ms = (time.perf_counter() - started) * 1000
+    check(failures, [p['attendance_count'] for p in new_top] == [p['attendance_count'] for p in old_top],
+          f'top performers match the old GROUP BY ({new_ms:.2f} ms vs {old_ms:.2f} ms)')
+    check(failures, 'idx_student_stats_total' in plan and 'TEMP B-TREE' not in plan,
+          'top performers are read off idx_student_stats_total')
+    conn.close()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
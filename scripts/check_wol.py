@@ -0,0 +1,138 @@
+"""
+Wake-on-LAN dispatcher check
+
+Points a WakeDispatcher at a UDP listener on the loopback interface and
+checks that:
+  - submit() returns at once and the worker sends `burst` packets, each six
+    0xFF bytes followed by the MAC sixteen times
+  - the outcome is stored in wake_events and served by /api/wake-events
+  - a socket that keeps failing is recorded as a failure after 1 + `retries`
+    attempts, and an invalid MAC as invalid without any sending
+  - an explicit retries=0 means one attempt, and burst below 1 or negative
+    retries are rejected
+  - bulk wake pacing out of range is refused alike by /api/wake/bulk and
+    scripts/bulk_wake.py
+
+Usage: python scripts/check_wol.py
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Point the app at a scratch database before anything reads Config
+os.environ['DATABASE'] = os.path.join(tempfile.mkdtemp(), 'wol_check.db')
+
+from app import create_app
+from app.config import Config
+from app.wol import WakeDispatcher
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAC = 'AA:BB:CC:DD:EE:0F'
+EXPECTED_PACKET = b'\xff' * 6 + bytes.fromhex(MAC.replace(':', '')) * 16
+
+
+class FailingSocket:
+    """Stands in for the UDP socket when the network is down"""
+
+    def sendto(self, packet, address):
+        raise OSError('Network is unreachable')
+
+    def close(self):
+        pass
+
+
+def check(failures, condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def receive(sock, count, timeout=2):
+    """Up to `count` datagrams arriving within `timeout` seconds"""
+    packets = []
+    deadline = time.monotonic() + timeout
+    while len(packets) < count and time.monotonic() < deadline:
+        sock.settimeout(max(deadline - time.monotonic(), 0.01))
+        try:
+            packets.append(sock.recv(1024))
+        except socket.timeout:
+            break
+    return packets
+
+
+def main():
+    failures = []
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'Check admin'
+        session['role'] = 'admin'
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+
+    dispatcher = WakeDispatcher('127.0.0.1', port, burst=3, interval_ms=20, retries=2)
+    started = time.perf_counter()
+    dispatcher.submit(MAC, name='Alice', reg_no='R001')
+    submitted = time.perf_counter() - started
+    check(failures, submitted < 0.01, f'submit() returned in {submitted * 1000:.2f} ms')
+
+    packets = receive(listener, dispatcher.burst + 1, timeout=1)
+    dispatcher.join()
+    check(failures, len(packets) == dispatcher.burst, f'{len(packets)} packets arrived for a burst of {dispatcher.burst}')
+    check(failures, packets and all(packet == EXPECTED_PACKET for packet in packets),
+          'each packet is 6 x 0xFF followed by the MAC 16 times')
+
+    events = client.get('/api/wake-events?reg_no=R001').get_json()
+    sent = events[0] if events else {}
+    check(failures, len(events) == 1 and sent['mac_address'] == MAC and sent['name'] == 'Alice'
+          and sent['status'] == 'sent' and sent['attempts'] == 1 and sent['packets_sent'] == 3
+          and sent['completed_at'],
+          f"wake_events row served by /api/wake-events ({sent.get('status')}, {sent.get('packets_sent')} packets)")
+
+    # Every send fails: the outcome is a failure after the first attempt and two retries
+    dispatcher._socket = lambda: FailingSocket()
+    dispatcher.submit(MAC, name='Bob', reg_no='R002')
+    dispatcher.join()
+    failed = client.get('/api/wake-events?reg_no=R002').get_json()
+    failed = failed[0] if failed else {}
+    check(failures, failed.get('status') == 'failed' and failed.get('attempts') == 3
+          and failed.get('packets_sent') == 0 and 'unreachable' in failed.get('message', ''),
+          f"a failing socket is recorded as failed after {failed.get('attempts')} attempts")
+    dispatcher.stop(5)
+
+    once = WakeDispatcher('127.0.0.1', port, burst=1, interval_ms=0, retries=0)
+    once._socket = lambda: FailingSocket()
+    check(failures, once.send(MAC)['attempts'] == 1, 'retries=0 makes a single attempt')
+    invalid = once.send('not-a-mac')
+    check(failures, invalid['status'] == 'invalid' and invalid['attempts'] == 0, 'an invalid MAC is not sent')
+    for kwargs in ({'burst': 0}, {'retries': -1}):
+        try:
+            WakeDispatcher('127.0.0.1', port, **kwargs)
+            rejected = False
+        except ValueError:
+            rejected = True
+        check(failures, rejected, f'{kwargs} is rejected')
+    check(failures, WakeDispatcher().retries == Config.WOL_RETRIES, 'retries default to WOL_RETRIES')
+
+    for key, flag, value in (('wave_size', '--wave-size', 0), ('wave_size', '--wave-size', -3),
+                             ('packets_per_second', '--pps', -1), ('wave_pause', '--wave-pause', -1)):
+        api = client.post('/api/wake/bulk', json={'scope': 'lab', key: value})
+        cli = subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'bulk_wake.py'), '--all', '--dry-run',
+                              flag, str(value)], capture_output=True, text=True)
+        check(failures, api.status_code == 400 and cli.returncode == 2
+              and api.get_json()['error'] in cli.stderr, f'{key}={value} is refused by the API and the CLI')
+
+    listener.close()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
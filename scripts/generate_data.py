@@ -0,0 +1,206 @@
+"""
+Synthetic data generator
+
+Fills an empty database with departments, batches and users, plus months of
+attendance shaped like a working lab:
+  - scans on weekdays only, clustered around the 09:00, 11:00 and 14:00
+    sessions, with most people a few minutes early and a tail running late
+  - each student has their own attendance rate, from steady to rarely seen
+  - about a third of visits also scan on the way out, 1.5 to 2 hours later
+
+The same seed and end day always produce the same data (--today pins the
+end day; by default history runs up to now). Rows are inserted in time order
+with executemany in large transactions. The rollup, student stats and search
+triggers run as they do in production.
+
+Usage:
+    python scripts/generate_data.py --database lab.db --users 2000 --months 12
+    python scripts/generate_data.py --database lab.db --attendance 1000000 --seed 7 --fresh
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+DEPARTMENTS = [
+    ('Computer Science', 'CS'), ('Electronics', 'EC'), ('Mechanical', 'ME'), ('Civil', 'CE'),
+    ('Electrical', 'EE'), ('Information Technology', 'IT'), ('Biotechnology', 'BT'), ('Chemical', 'CH'),
+    ('Aeronautical', 'AE'), ('Automobile', 'AU'), ('Mathematics', 'MA'), ('Physics', 'PH'),
+]
+FIRST_NAMES = [
+    'Aarav', 'Diya', 'Ishaan', 'Kavya', 'Rohan', 'Ananya', 'Vikram', 'Meera', 'Arjun', 'Priya',
+    'Karthik', 'Lakshmi', 'Nikhil', 'Sneha', 'Rahul', 'Divya', 'Siddharth', 'Pooja', 'Aditya', 'Nisha',
+    'Buvanesh', 'Deepika', 'Arun', 'Swathi', 'Harish', 'Keerthana', 'Vignesh', 'Janani', 'Surya', 'Revathi',
+]
+LAST_NAMES = [
+    'Sharma', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Menon', 'Rao', 'Kumar', 'Das',
+    'Pillai', 'Joshi', 'Verma', 'Bose', 'Khan', 'Singh', 'Mehta', 'Chopra', 'Bhat', 'Raja',
+]
+# (hour, minute, share of visits)
+SESSIONS = [(9, 0, 0.45), (11, 0, 0.35), (14, 0, 0.20)]
+CHECKOUT_SHARE = 0.3
+COMMIT_ROWS = 50_000
+
+
+def _departments(count):
+    """`count` (name, code) pairs, numbering repeats once the list runs out"""
+    result = []
+    for n in range(count):
+        name, code = DEPARTMENTS[n % len(DEPARTMENTS)]
+        if n >= len(DEPARTMENTS):
+            name, code = f'{name} {n // len(DEPARTMENTS) + 1}', f'{code}{n // len(DEPARTMENTS) + 1}'
+        result.append((name, code))
+    return result
+
+
+def _batches(count, today):
+    """The `count` most recent academic years, e.g. '2023-2024', newest last"""
+    start = today.year if today.month >= 7 else today.year - 1
+    return [f'{year}-{year + 1}' for year in range(start - count + 1, start + 1)]
+
+
+def _mac(rng):
+    return '-'.join(f'{rng.randrange(256):02X}' for _ in range(6))
+
+
+def _users(rng, departments, batches, students):
+    """(users rows, students as (name, reg_no, rate))"""
+    users = [('System Admin', 'ADMIN001', 'admin', None, None, None, None, 'admin123')]
+    for index, (department, code) in enumerate(departments):
+        users.append((f'Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'HOD{index + 1:03d}',
+                      'hod', department, None, None, None, 'hod123'))
+        for n in range(2):
+            users.append((f'Prof. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'STAFF{code}{n + 1:02d}',
+                          'staff', department, None, None, None, 'staff123'))
+
+    roster = []
+    for n in range(students):
+        department, code = departments[n % len(departments)]
+        batch = batches[(n // len(departments)) % len(batches)]
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        reg_no = f'{batch[2:4]}{code}{n + 1:05d}'
+        mac = _mac(rng) if rng.random() < 0.8 else None
+        users.append((name, reg_no, 'student', department, batch, n + 1, mac, 'student123'))
+        # Attendance rates skew high with a long tail of rare visitors
+        roster.append((name, reg_no, rng.betavariate(5, 2)))
+    return users, roster
+
+
+def _scans_for_day(rng, roster, day):
+    """One weekday's scans, in time order"""
+    scans = []
+    midnight = datetime.combine(day, datetime.min.time())
+    for name, reg_no, rate in roster:
+        if rng.random() >= rate:
+            continue
+        hour, minute, _ = rng.choices(SESSIONS, weights=[share for *_, share in SESSIONS])[0]
+        # Mostly a few minutes early; lognormal lateness gives the tail
+        offset = rng.gauss(-6, 4) if rng.random() < 0.8 else rng.lognormvariate(2.3, 0.6)
+        arrival = midnight + timedelta(hours=hour, minutes=minute + offset, seconds=rng.randrange(60))
+        scans.append((name, reg_no, arrival))
+        if rng.random() < CHECKOUT_SHARE:
+            scans.append((name, reg_no, arrival + timedelta(minutes=rng.uniform(90, 120))))
+    scans.sort(key=lambda scan: scan[2])
+    return [(name, reg_no, moment.strftime('%Y-%m-%d %H:%M:%S')) for name, reg_no, moment in scans]
+
+
+def generate(conn, departments=6, batches=4, users=2000, months=6, attendance=None, seed=1, today=None):
+    """
+    Fill an empty database through `conn`. History ends today and goes back
+    `months`; given `attendance` instead, it goes back as far as that many rows
+    are expected to need (the exact count varies by a percent or so). `today`
+    is the last day of history, by default the real one. Returns
+    the counts inserted.
+    """
+    from app.ingest import INSERT_ATTENDANCE
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    # Nothing later than now when the history runs up to today
+    cutoff = min(datetime.now(), datetime.combine(today, datetime.max.time())).strftime('%Y-%m-%d %H:%M:%S')
+    if conn.execute('SELECT 1 FROM users LIMIT 1').fetchone():
+        raise ValueError('the database already has users; generate into an empty one')
+
+    department_list = _departments(departments)
+    user_rows, roster = _users(rng, department_list, _batches(batches, today), users)
+    with conn:
+        conn.executemany('INSERT INTO departments (name, hod_name, description) VALUES (?, ?, ?)',
+                         [(name, next(u[0] for u in user_rows if u[2] == 'hod' and u[3] == name),
+                           f'{name} department') for name, _ in department_list])
+        conn.executemany('''
+            INSERT INTO users (name, reg_no, role, department, batch_year, finger_id, mac_address, password)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', user_rows)
+
+    if attendance is not None:
+        per_weekday = sum(rate for *_, rate in roster) * (1 + CHECKOUT_SHARE)
+        span = math.ceil(attendance / max(per_weekday, 1) * 7 / 5)
+    else:
+        span = round(months * 30.44)
+    day = today - timedelta(days=span - 1)
+
+    inserted = pending = 0
+    while day <= today:
+        if day.weekday() < 5:
+            scans = [scan for scan in _scans_for_day(rng, roster, day) if scan[2] <= cutoff]
+            conn.executemany(INSERT_ATTENDANCE, scans)
+            inserted += len(scans)
+            pending += len(scans)
+            if pending >= COMMIT_ROWS:
+                conn.commit()
+                pending = 0
+        day += timedelta(days=1)
+    conn.commit()
+    return {'departments': len(department_list), 'users': len(user_rows), 'students': len(roster),
+            'attendance': inserted, 'days': span}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a database with synthetic users and attendance')
+    parser.add_argument('--database', help='database file (default: DATABASE from the environment/config)')
+    parser.add_argument('--departments', type=int, default=6, help='number of departments')
+    parser.add_argument('--batches', type=int, default=4, help='number of batch years')
+    parser.add_argument('--users', type=int, default=2000, help='number of students')
+    history = parser.add_mutually_exclusive_group()
+    history.add_argument('--months', type=int, default=6, help='months of attendance up to today')
+    history.add_argument('--attendance', type=int, help='about this many attendance rows instead of --months')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    parser.add_argument('--today', type=date.fromisoformat, help='last day of history, YYYY-MM-DD (default: today)')
+    parser.add_argument('--fresh', action='store_true', help='delete the database first')
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ['DATABASE'] = os.path.abspath(args.database)
+    from app.config import Config
+    from app.db import get_db_connection, close_pool
+    from app.models import init_db
+
+    if args.fresh:
+        for path in (Config.DATABASE, Config.DATABASE + '-wal', Config.DATABASE + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+    init_db()
+
+    started = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        counts = generate(conn, args.departments, args.batches, args.users, args.months, args.attendance, args.seed,
+                          args.today)
+    except ValueError as e:
+        print(f"❌ {e} (or pass --fresh)")
+        sys.exit(1)
+    finally:
+        conn.close()
+        close_pool()
+    print(f"✓ {counts['departments']} departments, {counts['users']} users ({counts['students']} students)")
+    print(f"✓ {counts['attendance']} attendance rows over {counts['days']} days")
+    print(f"✅ Generated in {time.perf_counter() - started:.1f} s into {Config.DATABASE}")
+
+
+if __name__ == '__main__':
+    main()
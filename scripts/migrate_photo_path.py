@@ -1,21 +1,25 @@
-import sqlite3
+"""
+Apply pending schema migrations (photo_path and everything else) to the database.
+Kept for existing instructions - the app also runs these on startup.
+"""
 import os
+import sys
 
-db_path = 'attendance.db'
-if os.path.exists(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.db import get_db_connection
+from app.migrations import run_migrations
+
+if os.path.exists(Config.DATABASE):
+    conn = get_db_connection()
     try:
-        print("Adding photo_path column to users table...")
-        cursor.execute('ALTER TABLE users ADD COLUMN photo_path TEXT')
-        conn.commit()
-        print("Success!")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
-            print("Column photo_path already exists.")
+        applied = run_migrations(conn)
+        if applied:
+            print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
         else:
-            print(f"Error: {e}")
+            print("Schema already up to date.")
     finally:
         conn.close()
 else:
-    print(f"Database {db_path} not found.")
+    print(f"Database {Config.DATABASE} not found.")
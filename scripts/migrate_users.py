@@ -2,11 +2,19 @@
 Database migration script to update existing users with department information
 """
 import sqlite3
-from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.models import init_db
 
 def migrate_existing_users():
-    """Update existing users to have department and class information"""
-    conn = sqlite3.connect('attendance.db')
+    """Update existing users to have department and batch information"""
+    # Make sure the schema (department/batch_year columns) is current first
+    init_db()
+    conn = sqlite3.connect(Config.DATABASE)
     cursor = conn.cursor()
     
     # Check if users have department info
@@ -20,27 +28,21 @@ def migrate_existing_users():
         cursor.execute('''
             UPDATE users 
             SET department = 'Computer Science',
-                class_name = 'CS-A',
-                batch_year = '2023-2024',
-                semester = '3'
+                batch_year = '2023-2024'
             WHERE role = 'student' AND department IS NULL
         ''')
         
         cursor.execute('''
             UPDATE users 
             SET department = 'Computer Science',
-                class_name = 'Staff',
-                batch_year = NULL,
-                semester = NULL
+                batch_year = NULL
             WHERE role = 'staff' AND department IS NULL
         ''')
         
         cursor.execute('''
             UPDATE users 
             SET department = 'Computer Science',
-                class_name = 'HOD',
-                batch_year = NULL,
-                semester = NULL
+                batch_year = NULL
             WHERE role = 'hod' AND department IS NULL
         ''')
         
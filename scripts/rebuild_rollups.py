@@ -0,0 +1,54 @@
+"""
+Rebuild the attendance rollups
+
+The daily rollup (attendance_daily, attendance_daily_people) and the
+per-student running statistics (student_stats) are kept current by triggers
+on the attendance table. Run this after bulk edits made with the triggers
+dropped, after restoring an old backup into the table, or whenever the
+analytics totals look off, to recompute them from the raw attendance rows.
+
+Usage: python scripts/rebuild_rollups.py [--check]
+  --check   only compare the stored rollups with a fresh rebuild
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.db import connect
+from app.migrations import run_migrations, rebuild_attendance_rollup, rebuild_student_stats
+
+ROLLUP_QUERY = 'SELECT * FROM attendance_daily ORDER BY day, department, batch_year, role'
+STUDENT_STATS_QUERY = 'SELECT * FROM student_stats ORDER BY reg_no'
+
+
+def main():
+    check_only = '--check' in sys.argv[1:]
+    conn = connect(Config.DATABASE)
+    run_migrations(conn)
+
+    before = [tuple(row) for row in conn.execute(ROLLUP_QUERY)]
+    stats_before = [tuple(row) for row in conn.execute(STUDENT_STATS_QUERY)]
+    with conn:
+        rebuild_attendance_rollup(conn)
+        rebuild_student_stats(conn)
+        after = [tuple(row) for row in conn.execute(ROLLUP_QUERY)]
+        stats_after = [tuple(row) for row in conn.execute(STUDENT_STATS_QUERY)]
+        if check_only:
+            conn.rollback()
+
+    changed = len(set(before) ^ set(after))
+    stats_changed = len(set(stats_before) ^ set(stats_after))
+    days = len({row[0] for row in after})
+    print(f"📊 {len(after)} rollup rows over {days} days; {changed} row(s) differed from the stored rollup")
+    print(f"📊 {len(stats_after)} student stats rows; {stats_changed} row(s) differed from the stored stats")
+    if check_only:
+        conn.close()
+        sys.exit(1 if changed or stats_changed else 0)
+    print("✅ Rollups rebuilt")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
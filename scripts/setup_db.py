@@ -5,47 +5,35 @@ Creates fresh database with sample data for testing
 
 import sqlite3
 import os
+import sys
 
-DATABASE = 'attendance.db'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.config import Config
+from app.db import close_pool
+from app.models import init_db
+
+DATABASE = Config.DATABASE
 
 def setup_database():
     """Wipe and recreate database with sample data"""
     
     # Remove existing database
     if os.path.exists(DATABASE):
-        os.remove(DATABASE)
+        for path in (DATABASE, DATABASE + '-wal', DATABASE + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
         print("✓ Removed existing database")
     
+    # Create the schema through the same migrations the app runs
+    init_db()
+    close_pool()
+    print("✓ Created schema")
+    
     # Create connection
     conn = sqlite3.connect(DATABASE)
     cursor = conn.cursor()
     
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            reg_no TEXT UNIQUE NOT NULL,
-            role TEXT NOT NULL,
-            finger_id INTEGER UNIQUE,
-            mac_address TEXT,
-            password TEXT NOT NULL
-        )
-    ''')
-    print("✓ Created users table")
-    
-    # Create attendance table
-    cursor.execute('''
-        CREATE TABLE attendance (
-            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            reg_no TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            status TEXT DEFAULT 'Present'
-        )
-    ''')
-    print("✓ Created attendance table")
-    
     # Insert sample users
     sample_users = [
         ('System Admin', 'ADMIN001', 'admin', None, None, 'admin123'),
@@ -1,10 +1,14 @@
-`"""
+"""
 Network Wake on LAN functionality for attendance system
 """
+import ipaddress
+import os
+import re
 import socket
 import subprocess
 import platform
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def get_local_ip():
     """Get the local IP address of the machine"""
@@ -18,16 +22,24 @@ def get_local_ip():
     except Exception:
         return "127.0.0.1"
 
+def build_magic_packet(mac_address):
+    """
+    Build the 102-byte Wake-on-LAN magic packet for a MAC address.
+    Accepts AA:BB:CC:DD:EE:FF, AA-BB-CC-DD-EE-FF, AABB.CCDD.EEFF or bare hex.
+    Raises ValueError for anything that is not 6 bytes of hex.
+    """
+    digits = mac_address.strip().replace(":", "").replace("-", "").replace(".", "")
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac_address!r}")
+    mac_bytes = bytes.fromhex(digits)
+    return b'\xff' * 6 + mac_bytes * 16
+
 def wake_on_lan(mac_address, broadcast_ip="255.255.255.255", port=9):
     """
     Send Wake-on-LAN magic packet to wake up a device
     """
     try:
-        # Create the Wake-on-LAN magic packet
-        mac_bytes = bytes.fromhex(mac_address.replace(":", "").replace("-", ""))
-        
-        # Build the packet
-        packet = b'\xff' * 6 + mac_bytes * 16
+        packet = build_magic_packet(mac_address)
         
         # Send the packet
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
@@ -44,11 +56,7 @@ def wake_on_lan_with_ip(mac_address, target_ip, port=9):
     Send Wake-on-LAN magic packet to a specific IP address
     """
     try:
-        # Create the Wake-on-LAN magic packet
-        mac_bytes = bytes.fromhex(mac_address.replace(":", "").replace("-", ""))
-        
-        # Build the packet
-        packet = b'\xff' * 6 + mac_bytes * 16
+        packet = build_magic_packet(mac_address)
         
         # Send the packet to specific IP
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
@@ -112,60 +120,93 @@ def get_network_interfaces():
     except Exception as e:
         return []
 
-def scan_network_for_devices():
+def default_scan_cidr():
+    """The /24 around this machine's LAN address"""
+    return f"{get_local_ip()}/24"
+
+def ping_host(ip, timeout=1):
+    """Return True if a single ping to ip is answered within timeout seconds"""
+    if platform.system() == "Windows":
+        command = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), ip]
+    else:
+        command = ['ping', '-c', '1', '-W', str(max(1, int(timeout))), ip]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                timeout=timeout + 2)
+        return result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+def iter_live_hosts(cidr=None, concurrency=64, timeout=1):
     """
-    Scan the network to find devices that might be wakeable
+    Ping every host address in cidr concurrently and yield each IP as soon as it
+    answers (in completion order, not address order)
     """
-    devices = []
-    
+    network = ipaddress.ip_network(cidr or default_scan_cidr(), strict=False)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
     try:
-        local_ip = get_local_ip()
-        network = local_ip.rsplit('.', 1)[0] + '.0'
-        
-        # Scan common IP range
-        for i in range(1, 255):
-            ip = f"{network}.{i}"
-            
-            # Try to ping the IP
-            try:
-                if platform.system() == "Windows":
-                    result = subprocess.run(['ping', '-n', '1', '-w', '1000', ip], 
-                                          capture_output=True, text=True)
-                else:
-                    result = subprocess.run(['ping', '-c', '1', '-W', '1', ip], 
-                                          capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    # Try to get MAC address using ARP
-                    try:
-                        if platform.system() == "Windows":
-                            arp_result = subprocess.run(['arp', '-a', ip], 
-                                                      capture_output=True, text=True)
-                        else:
-                            arp_result = subprocess.run(['arp', '-n', ip], 
-                                                      capture_output=True, text=True)
-                        
-                        mac_address = "Unknown"
-                        for line in arp_result.stdout.split('\n'):
-                            if ip in line:
-                                parts = line.split()
-                                for part in parts:
-                                    if part.strip() and len(part.strip()) == 17:
-                                        mac_address = part.strip()
-                        
-                        devices.append({
-                            'ip': ip,
-                            'mac': mac_address,
-                            'status': 'online'
-                        })
-                        
-            except Exception:
-                pass
-                
+        futures = {pool.submit(ping_host, str(ip), timeout): str(ip) for ip in network.hosts()}
+        for future in as_completed(futures):
+            if future.result():
+                yield futures[future]
+    finally:
+        # Stop pinging if the caller abandons the generator early
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def normalize_mac(mac_address):
+    """AA:BB:CC:DD:EE:FF form of a MAC written with - or : and optional leading zeros"""
+    parts = re.split(r'[:-]', mac_address.strip())
+    return ':'.join(part.zfill(2) for part in parts).upper()
+
+def read_arp_table(proc_path='/proc/net/arp'):
+    """
+    Map IP -> MAC for every resolved neighbour, from a single read of
+    proc_path (/proc/net/arp on Linux) or a single `arp -a` call elsewhere
+    """
+    table = {}
+    if os.path.exists(proc_path):
+        with open(proc_path) as f:
+            next(f, None)  # header
+            for line in f:
+                parts = line.split()
+                # IP address, HW type, Flags, HW address, Mask, Device; flags 0x0 = incomplete
+                if len(parts) >= 4 and parts[2] != '0x0' and parts[3] != '00:00:00:00:00:00':
+                    table[parts[0]] = normalize_mac(parts[3])
+        return table
+
+    try:
+        result = subprocess.run(['arp', '-a'], capture_output=True, text=True)
+    except OSError:
+        return table
+    for line in result.stdout.split('\n'):
+        ip = re.search(r'\b(\d{1,3}(?:\.\d{1,3}){3})\b', line)
+        mac = re.search(r'\b([0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})\b', line)
+        if ip and mac:
+            table[ip.group(1)] = normalize_mac(mac.group(1))
+    return table
+
+def resolve_devices(ips):
+    """Device dicts for live IPs, with MACs from one ARP table read"""
+    arp = read_arp_table()
+    return [{'ip': ip, 'mac': arp.get(ip, 'Unknown'), 'status': 'online'}
+            for ip in sorted(ips, key=ipaddress.ip_address)]
+
+def scan_network_for_devices(cidr=None, concurrency=64, timeout=1, on_host=None):
+    """
+    Scan the network to find devices that might be wakeable.
+    Hosts are pinged concurrently; on_host(ip) is called as each one answers,
+    and MAC addresses are resolved once the sweep has finished.
+    """
+    alive = []
+    try:
+        for ip in iter_live_hosts(cidr, concurrency, timeout):
+            alive.append(ip)
+            if on_host:
+                on_host(ip)
     except Exception as e:
         print(f"Network scan error: {str(e)}")
     
-    return devices
+    return resolve_devices(alive)
 
 def create_wake_up_script():
     """